@@ -7,27 +7,41 @@ from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
 import sys
 import os
+import time
 from dotenv import load_dotenv
 
 # Charger .env
 load_dotenv()
 
-# Verifier API key
-if not os.environ.get('ANTHROPIC_API_KEY'):
+# Verifier API key (inutile avec le modele hors-ligne LLM_PROVIDER=fake)
+if os.environ.get('LLM_PROVIDER', 'anthropic') != 'fake' and not os.environ.get('ANTHROPIC_API_KEY'):
     print("ERREUR: ANTHROPIC_API_KEY non definie dans .env")
     sys.exit(1)
 
 print("Initialisation du serveur...")
 
 # Import Claude
-from langchain_anthropic import ChatAnthropic
+from typing import Literal
+from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, HumanMessage
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from structured_output import read_structured
+from chat_model import create_chat_model
+from metrics import metrics, REQUESTS, REQUEST_LATENCY, PROMETHEUS_CONTENT_TYPE
+
 # Initialiser Claude
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.3
-)
+llm = create_chat_model(temperature=0.3)
+
+
+class DemoReply(BaseModel):
+    """Intention et reponse produites en un seul appel"""
+    intent: Literal['medication', 'symptom', 'emergency', 'general'] = Field(description="Categorie du message")
+    reply: str = Field(description="Reponse au patient")
+
+
+# Un seul appel LLM par message: intention + reponse
+reply_llm = llm.with_structured_output(DemoReply, include_raw=True)
 
 print("Claude AI initialise avec succes!\n")
 
@@ -52,12 +66,18 @@ class APIHandler(BaseHTTPRequestHandler):
             self.end_headers()
             response = {'status': 'ok', 'service': 'SmartDoc Assistant'}
             self.wfile.write(json.dumps(response).encode('utf-8'))
+        elif self.path == '/metrics':
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(metrics.render_prometheus().encode('utf-8'))
         else:
             self.send_response(404)
             self.end_headers()
 
     def do_POST(self):
         if self.path == '/chat':
+            start = time.perf_counter()
             try:
                 # Lire requete
                 content_length = int(self.headers['Content-Length'])
@@ -69,37 +89,17 @@ class APIHandler(BaseHTTPRequestHandler):
 
                 print(f"\n[USER] {user_message}")
 
-                # Classifier intention
-                system_prompt_intent = """
-Tu es un classificateur d'intention pour un assistant medical.
+                # Classifier et repondre en un seul appel
+                system_prompt = """
+Tu es SmartDoc, un assistant medical bienveillant pour Muhammad Ehab.
 
-Analyse le message et retourne UNE categorie parmi:
+1. Classe le message dans "intent", UNE categorie parmi:
 - medication: Questions sur medicaments
 - symptom: Symptomes de sante, douleurs
 - emergency: Urgence, aide, chute
 - general: Conversation generale, salutations
 
-Reponds UNIQUEMENT avec le mot-cle.
-"""
-
-                intent_response = llm.invoke([
-                    SystemMessage(content=system_prompt_intent),
-                    HumanMessage(content=user_message)
-                ])
-
-                intent = intent_response.content.strip().lower()
-                if intent not in ['medication', 'symptom', 'emergency', 'general']:
-                    intent = 'general'
-
-                print(f"[INTENT] {intent}")
-
-                # Generer reponse
-                system_prompt_response = f"""
-Tu es SmartDoc, un assistant medical bienveillant pour Muhammad Ehab.
-
-Intention detectee: {intent}
-
-Reponds de maniere:
+2. Redige la reponse dans "reply", de maniere:
 - Simple et claire (phrases courtes)
 - Chaleureuse et rassurante
 - En francais
@@ -111,14 +111,29 @@ Si medication: donne des conseils generaux
 Si general: sois chaleureux et disponible
 """
 
-                response_obj = llm.invoke([
-                    SystemMessage(content=system_prompt_response),
+                result = reply_llm.invoke([
+                    SystemMessage(content=system_prompt),
                     HumanMessage(content=user_message)
                 ])
+                parsed, method, _ = read_structured(result, DemoReply)
+
+                if parsed is not None:
+                    intent = parsed.intent
+                    assistant_response = parsed.reply
+                else:
+                    # Sortie illisible: reponse libre, intention par defaut
+                    print(f"[INTENT] Sortie structuree illisible ({method})")
+                    intent = 'general'
+                    assistant_response = llm.invoke([
+                        SystemMessage(content=system_prompt),
+                        HumanMessage(content=user_message)
+                    ]).content
 
-                assistant_response = response_obj.content
+                print(f"[INTENT] {intent}")
 
                 print(f"[CLAUDE] {assistant_response[:100]}...")
+                REQUESTS.inc(intent=intent, agent='demo', status='ok')
+                REQUEST_LATENCY.observe((time.perf_counter() - start) * 1000, intent=intent)
 
                 # Envoyer reponse
                 response_data = {
@@ -136,6 +151,7 @@ Si general: sois chaleureux et disponible
 
             except Exception as e:
                 print(f"[ERREUR] {str(e)}")
+                REQUESTS.inc(intent='unknown', agent='demo', status='exception')
                 self.send_response(500)
                 self.send_header('Content-Type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
@@ -159,6 +175,7 @@ def run_server(port=3000):
     print(f"\nServeur demarre: http://localhost:{port}")
     print(f"Endpoint chat: POST http://localhost:{port}/chat")
     print(f"Health check: GET http://localhost:{port}/health")
+    print(f"Metriques: GET http://localhost:{port}/metrics")
     print("\nPOUR TESTER LE FRONTEND:")
     print("  1. Ouvrir: frontend/index.html dans le navigateur")
     print(f"  2. Cliquer sur l'icone parametres (engrenage)")
@@ -8,14 +8,20 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage
 from typing import TypedDict, List, Dict
 from datetime import datetime
+import time
 
-from database import db
-from utils import sns_helper, generate_id
+from lazy import Lazy, preload
+from chat_model import create_chat_model
+from utils import sns_helper, SNSHelper
+from outbox import outbox, make_idempotency_key, emergency_id_for, DONE, FAILED
+from emergency_correlator import correlator, max_severity, SEVERITY_RANK
+from keywords import KeywordMatcher, normalize
+from logger import get_logger
+
+log = get_logger('emergency')
 
 
 # ===== ÉTAT DE L'AGENT =====
@@ -25,6 +31,12 @@ class EmergencyState(TypedDict):
     user_id: str
     message: str
     context: dict
+    idempotency_key: str
+    emergency_id: str
+    follow_up: bool  # Message rattaché à une urgence déjà ouverte
+    retry: bool  # Même requête renvoyée par le client (idempotency_key fournie)
+    repeated: bool  # Suivi au texte identique à un message déjà évalué de l'urgence
+    escalated: bool
     severity: str  # "critical", "high", "medium", "low"
     emergency_type: str  # "fall", "pain", "breathing", "other"
     actions_taken: List[str]
@@ -36,25 +48,19 @@ class EmergencyState(TypedDict):
 
 # ===== INITIALISATION LLM =====
 
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.2,  # Plus déterministe pour urgences
-    api_key=os.environ.get('ANTHROPIC_API_KEY')
-)
-
-
-# ===== NŒUDS DU GRAPH =====
+# Client construit au premier appel (LLM_PROVIDER=fake: modèle hors-ligne)
+llm = Lazy(lambda: create_chat_model(temperature=0.2), 'llm')  # Plus déterministe pour urgences
 
-def assess_severity(state: EmergencyState) -> EmergencyState:
-    """
-    Nœud 1: Évalue la gravité de l'urgence
-    """
-    print("[EMERGENCY] Évaluation de la gravité...")
 
-    message = state["message"].lower()
+# ===== MOTS-CLÉS =====
 
+EMERGENCY_KEYWORDS = KeywordMatcher({
+    # Type d'urgence
+    "fall": ["tombé", "chute", "tombe"],
+    "pain": ["poitrine", "coeur", "douleur"],
+    "breathing": ["respirer", "souffle"],
     # Mots-clés critiques (urgence immédiate)
-    critical_keywords = [
+    "critical": [
         "douleur poitrine", "mal poitrine", "coeur",
         "respirer", "souffle", "respiration",
         "tombé", "chute", "tombe",
@@ -63,33 +69,105 @@ def assess_severity(state: EmergencyState) -> EmergencyState:
         "paralysie", "bras engourdi", "jambe engourdie",
         "confusion", "tête qui tourne",
         "crise", "convulsion"
-    ]
-
+    ],
     # Mots-clés haute priorité
-    high_keywords = [
+    "high": [
         "aide", "urgent", "mal", "douleur forte",
         "peur", "angoisse", "aide-moi"
     ]
+})
+
+
+# ===== NŒUDS DU GRAPH =====
+
+def correlate_emergency(state: EmergencyState) -> EmergencyState:
+    """
+    Nœud 1: Cherche une urgence déjà ouverte pour cet utilisateur
+    """
+    log.debug("Recherche d'une urgence en cours")
+
+    try:
+        record = correlator.open_emergency(state["user_id"])
+    except Exception as e:
+        log.warning("Erreur corrélation", error=str(e))
+        record = None
+
+    # Retry client seulement si la clé vient de la requête: une clé dérivée est la même
+    # pour chaque "Aide!" répété dans la fenêtre, qui doit passer par le suivi
+    key = state.get("idempotency_key")
+    if record and key and record.get('idempotency_key') == key:
+        # Chemin doublon de l'outbox, avec l'évaluation déjà enregistrée (pas d'appel LLM)
+        state["retry"] = True
+        state["severity"] = record.get('severity', 'medium')
+        state["emergency_type"] = record.get('emergency_type', 'other')
+        log.info("Retry de l'urgence en cours", emergency_id=record['emergency_id'])
+    elif record:
+        state["follow_up"] = True
+        state["idempotency_key"] = record['idempotency_key']
+        state["emergency_id"] = record['emergency_id']
+        state["severity"] = record.get('severity', 'medium')
+        state["emergency_type"] = record.get('emergency_type', 'other')
+        known = [record.get('message', '')] + list(record.get('follow_ups', []))
+        state["repeated"] = normalize(state["message"]) in {normalize(m) for m in known}
+        log.info("Message rattaché à l'urgence", emergency_id=record['emergency_id'])
+
+    return state
+
+
+def assess_severity(state: EmergencyState) -> EmergencyState:
+    """
+    Nœud 2: Évalue la gravité de l'urgence
+    """
+    log.debug("Évaluation de la gravité")
+
+    if state.get("retry"):
+        log.info("Gravité déjà évaluée (retry)", severity=state['severity'])
+        return state
+
+    hits = EMERGENCY_KEYWORDS.scan(state["message"])
 
     # Détecter le type d'urgence
-    if any(k in message for k in ["tombé", "chute", "tombe"]):
-        state["emergency_type"] = "fall"
-    elif any(k in message for k in ["poitrine", "coeur", "douleur"]):
-        state["emergency_type"] = "pain"
-    elif any(k in message for k in ["respirer", "souffle"]):
-        state["emergency_type"] = "breathing"
+    if "fall" in hits:
+        emergency_type = "fall"
+    elif "pain" in hits:
+        emergency_type = "pain"
+    elif "breathing" in hits:
+        emergency_type = "breathing"
     else:
-        state["emergency_type"] = "other"
+        emergency_type = "other"
 
     # Évaluation de base par mots-clés
-    if any(keyword in message for keyword in critical_keywords):
+    if "critical" in hits:
         severity_guess = "critical"
-    elif any(keyword in message for keyword in high_keywords):
+    elif "high" in hits:
         severity_guess = "high"
     else:
         severity_guess = "medium"
 
-    # Demander à Claude pour confirmer
+    # Message de suivi: les mots-clés seuls ne comparent pas avec la gravité LLM
+    # enregistrée ("tombé" est critique par mots-clés): réévaluation LLM seulement
+    # s'ils suggèrent une escalade, sans appel sinon (ni pour un message déjà évalué)
+    if state["follow_up"]:
+        if emergency_type != "other":
+            state["emergency_type"] = emergency_type
+        if not state.get("repeated") and \
+                SEVERITY_RANK.get(severity_guess, 0) > SEVERITY_RANK.get(state["severity"], 0):
+            severity = llm_severity(state, severity_guess)
+            state["severity"] = max_severity(severity, state["severity"])
+        log.info("Gravité (suivi)", severity=state['severity'])
+        return state
+
+    state["emergency_type"] = emergency_type
+    state["severity"] = llm_severity(state, severity_guess)
+    log.warning("Gravité évaluée", severity=state['severity'], type=state['emergency_type'])
+
+    return state
+
+
+def llm_severity(state: EmergencyState, severity_guess: str) -> str:
+    """
+    Gravité du message selon le LLM (évaluation par mots-clés en cas d'erreur)
+    """
     system_prompt = """
 Tu es un médecin urgentiste expert.
 
@@ -115,100 +193,199 @@ Réponds UNIQUEMENT avec un mot: critical, high, medium ou low
         if severity not in ["critical", "high", "medium", "low"]:
             severity = severity_guess
 
-        state["severity"] = severity
-        print(f"[EMERGENCY] Gravité évaluée: {severity} (type: {state['emergency_type']})")
+        return severity
+
+    except Exception as e:
+        log.error("Erreur évaluation", error=str(e))
+        state["error"] = str(e)
+        return severity_guess
+
+
+def log_emergency(state: EmergencyState) -> EmergencyState:
+    """
+    Nœud 3: Enregistre l'urgence puis met les notifications en file (outbox)
+    """
+    log.debug("Enregistrement de l'urgence")
+
+    if state["follow_up"]:
+        state = attach_follow_up(state)
+        if state["follow_up"]:
+            return state
+
+    if not state.get("idempotency_key"):
+        state["idempotency_key"] = make_idempotency_key(state["user_id"], state["message"])
+    key = state["idempotency_key"]
+
+    user_profile = state["context"].get("user_profile", {})
+    emergency_contacts = user_profile.get("emergency_contacts", [])
+    user_name = user_profile.get("name", "Utilisateur")
+
+    try:
+        emergency_data = {
+            'emergency_id': emergency_id_for(key),
+            'idempotency_key': key,
+            'user_id': state['user_id'],
+            'timestamp': datetime.utcnow().isoformat(),
+            'severity': state['severity'],
+            'emergency_type': state['emergency_type'],
+            'message': state['message'],
+            'contacts': [c['name'] for c in emergency_contacts],
+            'follow_ups': [],
+            'last_seen_at': int(time.time()),
+            'version': 0,
+            'resolved': False
+        }
+
+        record, created = outbox.record_emergency(emergency_data)
+        state["emergency_id"] = record['emergency_id']
+        correlator.remember(record)
+
+        if created:
+            state["actions_taken"].append("📝 Urgence enregistrée dans le système")
+            log.info("Urgence enregistrée", emergency_id=record['emergency_id'])
+        else:
+            # Retry: on garde l'évaluation déjà enregistrée pour rester cohérent
+            state["severity"] = record.get('severity', state["severity"])
+            state["emergency_type"] = record.get('emergency_type', state["emergency_type"])
+            state["actions_taken"].append("📝 Urgence déjà enregistrée dans le système")
+            log.info("Urgence existante reprise", emergency_id=record['emergency_id'])
+
+        if emergency_contacts and state["severity"] in ["critical", "high"]:
+            sms_text = SNSHelper.format_emergency_message(user_name, state["message"], state["severity"])
+            queued = outbox.enqueue_sms(key, emergency_contacts, sms_text, state["severity"])
+            log.info("Notifications mises en file", queued=queued)
 
     except Exception as e:
-        print(f"[EMERGENCY] Erreur évaluation: {e}")
-        state["severity"] = severity_guess
+        log.error("Erreur enregistrement", error=str(e))
         state["error"] = str(e)
 
     return state
 
 
+def attach_follow_up(state: EmergencyState) -> EmergencyState:
+    """
+    Rattache le message à l'urgence ouverte; nouveaux SMS seulement si escalade
+    """
+    user_profile = state["context"].get("user_profile", {})
+    emergency_contacts = user_profile.get("emergency_contacts", [])
+    user_name = user_profile.get("name", "Utilisateur")
+
+    try:
+        record, escalated = correlator.attach(state["user_id"], state["message"], state["severity"])
+    except Exception as e:
+        log.error("Erreur rattachement", error=str(e))
+        record, escalated = None, False
+
+    if record is None:
+        # Fenêtre expirée ou conflit persistant: nouvelle urgence
+        log.warning("Rattachement impossible, création d'une nouvelle urgence")
+        state["follow_up"] = False
+        state["idempotency_key"] = ""
+        state["emergency_id"] = ""
+        return state
+
+    state["severity"] = record['severity']
+    state["escalated"] = escalated
+    state["actions_taken"].append("📝 Message ajouté à l'urgence en cours")
+
+    if escalated and emergency_contacts and state["severity"] in ["critical", "high"]:
+        log.warning("Escalade, nouvelle alerte", severity=state['severity'])
+        sms_text = SNSHelper.format_emergency_message(user_name, state["message"], state["severity"])
+        try:
+            outbox.enqueue_sms(state["idempotency_key"], emergency_contacts, sms_text, state["severity"])
+        except Exception as e:
+            log.error("Erreur mise en file", error=str(e))
+            state["emergency_id"] = ""
+            state["error"] = str(e)
+
+    return state
+
+
+def deliver_sms(payload: dict) -> bool:
+    """Livraison d'une entrée SMS de l'outbox"""
+    return sns_helper.send_sms(payload['phone'], payload['message'])
+
+
+def drain_outbox() -> dict:
+    """Balayage planifié: délivre les SMS restés en attente dans l'outbox"""
+    return outbox.drain_open(deliver_sms)
+
+
 def notify_emergency_contacts(state: EmergencyState) -> EmergencyState:
     """
-    Nœud 2: Notifie les contacts d'urgence
+    Nœud 4: Délivre les notifications en attente dans l'outbox
     """
-    print("[EMERGENCY] Notification des contacts...")
+    log.debug("Notification des contacts")
 
     user_profile = state["context"].get("user_profile", {})
     emergency_contacts = user_profile.get("emergency_contacts", [])
     user_name = user_profile.get("name", "Utilisateur")
-    user_phone = user_profile.get("phone", "")
 
     severity = state["severity"]
     message = state["message"]
 
     if not emergency_contacts:
-        print("[EMERGENCY] Aucun contact d'urgence configuré")
+        log.warning("Aucun contact d'urgence configuré")
         state["actions_taken"].append("⚠️ Aucun contact d'urgence configuré")
         return state
 
     # Envoyer SMS seulement si gravité élevée
     if severity in ["critical", "high"]:
-        print(f"[EMERGENCY] Envoi de {len(emergency_contacts)} SMS...")
-
-        results = sns_helper.send_emergency_sms(
-            contacts=emergency_contacts,
-            user_name=user_name,
-            message=message,
-            severity=severity
-        )
+        if state["follow_up"] and not state["escalated"] and state.get("emergency_id"):
+            # Contacts déjà alertés à ce niveau: on ne livre que ce qui reste en attente
+            outbox.drain(state["idempotency_key"], deliver_sms)
+            log.info("Contacts déjà prévenus pour cette urgence")
+            state["actions_taken"].append("ℹ️ Vos proches ont déjà été prévenus")
+            return state
+
+        if state.get("emergency_id"):
+            log.debug("Drainage de l'outbox", contacts=len(emergency_contacts))
+            entries = outbox.drain(state["idempotency_key"], deliver_sms)
+            results = [
+                {
+                    'contact': entry['payload']['contact'],
+                    'phone': entry['payload']['phone'],
+                    'success': entry['status'] == DONE,
+                    'status': entry['status']
+                }
+                for entry in entries
+                if entry['kind'] == 'sms' and entry['payload'].get('severity') == severity
+            ]
+        else:
+            # Outbox indisponible: la sécurité passe avant l'idempotence
+            log.warning("Outbox indisponible, envoi direct des SMS")
+            results = sns_helper.send_emergency_sms(
+                contacts=emergency_contacts,
+                user_name=user_name,
+                message=message,
+                severity=severity
+            )
 
         state["contacts_notified"] = results
 
         for result in results:
             if result['success']:
                 state["actions_taken"].append(f"✅ SMS envoyé à {result['contact']}")
-                print(f"[EMERGENCY] SMS envoyé à {result['contact']}")
-            else:
+                log.info("SMS envoyé", contact=result['contact'])
+            elif result.get('status', FAILED) == FAILED:
                 state["actions_taken"].append(f"❌ Échec SMS à {result['contact']}")
-                print(f"[EMERGENCY] Échec SMS à {result['contact']}")
+                log.error("Échec SMS", contact=result['contact'])
+            else:
+                state["actions_taken"].append(f"⏳ SMS à {result['contact']} en attente de renvoi")
+                log.warning("SMS en attente de renvoi", contact=result['contact'])
 
     else:
-        print("[EMERGENCY] Gravité faible, pas de notification SMS")
+        log.info("Gravité faible, pas de notification SMS")
         state["actions_taken"].append("ℹ️ Gravité faible, contacts non alertés")
 
     return state
 
 
-def log_emergency(state: EmergencyState) -> EmergencyState:
-    """
-    Nœud 3: Enregistre l'urgence dans DynamoDB
-    """
-    print("[EMERGENCY] Enregistrement de l'urgence...")
-
-    try:
-        emergency_data = {
-            'emergency_id': generate_id('emg'),
-            'user_id': state['user_id'],
-            'timestamp': datetime.utcnow().isoformat(),
-            'severity': state['severity'],
-            'emergency_type': state['emergency_type'],
-            'message': state['message'],
-            'actions_taken': state['actions_taken'],
-            'contacts_notified': [c['contact'] for c in state['contacts_notified']],
-            'resolved': False
-        }
-
-        db.save_emergency(emergency_data)
-
-        state["actions_taken"].append("📝 Urgence enregistrée dans le système")
-        print(f"[EMERGENCY] Urgence enregistrée: {emergency_data['emergency_id']}")
-
-    except Exception as e:
-        print(f"[EMERGENCY] Erreur enregistrement: {e}")
-        state["error"] = str(e)
-
-    return state
-
-
 def provide_immediate_guidance(state: EmergencyState) -> EmergencyState:
     """
-    Nœud 4: Fournit des conseils immédiats
+    Nœud 5: Fournit des conseils immédiats
     """
-    print("[EMERGENCY] Génération des conseils immédiats...")
+    log.debug("Génération des conseils immédiats")
 
     severity = state["severity"]
     emergency_type = state["emergency_type"]
@@ -271,10 +448,10 @@ IMPORTANT: Reste calme et rassurant dans ton ton.
     try:
         response = llm.invoke([SystemMessage(content=system_prompt)])
         state["guidance"] = response.content
-        print("[EMERGENCY] Conseils générés")
+        log.debug("Conseils générés")
 
     except Exception as e:
-        print(f"[EMERGENCY] Erreur génération conseils: {e}")
+        log.warning("Erreur génération conseils", error=str(e))
 
         # Fallback guidance
         if severity == "critical":
@@ -312,9 +489,9 @@ IMPORTANT: Reste calme et rassurant dans ton ton.
 
 def create_final_response(state: EmergencyState) -> EmergencyState:
     """
-    Nœud 5: Crée la réponse finale complète
+    Nœud 6: Crée la réponse finale complète
     """
-    print("[EMERGENCY] Création de la réponse finale...")
+    log.debug("Création de la réponse finale")
 
     severity = state["severity"]
     guidance = state["guidance"]
@@ -358,7 +535,7 @@ def create_final_response(state: EmergencyState) -> EmergencyState:
 
     state["response"] = "\n".join(response_parts)
 
-    print("[EMERGENCY] Réponse finale créée")
+    log.debug("Réponse finale créée")
 
     return state
 
@@ -369,11 +546,13 @@ def create_emergency_graph():
     """
     Crée le graph LangGraph pour l'emergency agent
     """
-    print("[EMERGENCY] Création du graph LangGraph...")
+    log.debug("Création du graph LangGraph")
+    from langgraph.graph import StateGraph, END
 
     workflow = StateGraph(EmergencyState)
 
     # Ajouter les nœuds
+    workflow.add_node("correlate", correlate_emergency)
     workflow.add_node("assess", assess_severity)
     workflow.add_node("notify", notify_emergency_contacts)
     workflow.add_node("log", log_emergency)
@@ -381,17 +560,21 @@ def create_emergency_graph():
     workflow.add_node("create_response", create_final_response)
 
     # Flow séquentiel
-    workflow.set_entry_point("assess")
-    workflow.add_edge("assess", "notify")
-    workflow.add_edge("notify", "log")
-    workflow.add_edge("log", "guidance")
+    workflow.set_entry_point("correlate")
+    workflow.add_edge("correlate", "assess")
+    workflow.add_edge("assess", "log")
+    workflow.add_edge("log", "notify")
+    workflow.add_edge("notify", "guidance")
     workflow.add_edge("guidance", "create_response")
     workflow.add_edge("create_response", END)
 
     return workflow.compile()
 
 
-# Créer l'instance du graph (singleton)
-emergency_agent = create_emergency_graph()
+# Graph compilé au premier usage (requête ou préchauffage), une seule fois
+emergency_agent = Lazy(create_emergency_graph, 'emergency_agent')
+
 
-print("[EMERGENCY] Graph LangGraph créé avec succès!")
+def warm_up() -> dict:
+    """Ping de préchauffage: prépare graph, client LLM et ressources sans exécuter le graph"""
+    return preload(emergency_agent, llm, sns_helper)
@@ -9,8 +9,13 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from agent import emergency_agent
-from utils import create_lambda_response
+from agent import emergency_agent, warm_up, drain_outbox
+from utils import create_lambda_response, is_warmup_event, is_outbox_drain_event, parse_request_body
+from profiling import profiler, correlation_id_for
+from metrics import metrics, AGENT_REQUESTS
+from logger import get_logger, bind, unbind, flush_logs
+
+log = get_logger('emergency.handler')
 
 
 def lambda_handler(event, context):
@@ -22,35 +27,58 @@ def lambda_handler(event, context):
         "body": {
             "user_id": "user_123",
             "message": "Aide! Je suis tombé!",
-            "context": {...}
+            "context": {...},
+            "idempotency_key": "..."  # optionnel, dérivé sinon
         }
     }
     """
-    print("[EMERGENCY HANDLER] ⚠️ URGENCE DÉTECTÉE")
-
+    # Ping de préchauffage: charger graph et clients, sans exécuter le graph
+    if is_warmup_event(event):
+        result = warm_up()
+        log.info("Préchauffage", preloaded=result['preloaded'], duration_ms=result['duration_ms'])
+        return create_lambda_response(200, result)
+
+    # Balayage planifié: SMS restés en attente (invocation tuée, échec SNS)
+    if is_outbox_drain_event(event):
+        try:
+            counts = drain_outbox()
+            log.info("Balayage de l'outbox", **counts)
+            return create_lambda_response(200, counts)
+        finally:
+            flush_logs()
+
+    log.warning("URGENCE DÉTECTÉE")
+    log.debug("Event reçu", event=event)
+
+    token = None
     try:
         # Parser la requête
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
-        else:
-            body = event.get('body', {})
+        body = parse_request_body(event)
+        correlation_id = correlation_id_for(body, context)
+        token = bind(correlation_id=correlation_id)
 
         user_id = body.get('user_id')
         message = body.get('message')
         context = body.get('context', {})
+        idempotency_key = body.get('idempotency_key', '')
 
         # Validation
         if not user_id or not message:
             return create_lambda_response(400, {'error': 'user_id et message requis'})
 
-        print(f"[EMERGENCY HANDLER] User: {user_id}")
-        print(f"[EMERGENCY HANDLER] Message: {message}")
+        log.warning("Requête d'urgence", user_id=user_id, message=message)
 
         # État initial
         initial_state = {
             "user_id": user_id,
             "message": message,
             "context": context,
+            "idempotency_key": idempotency_key,
+            "emergency_id": "",
+            "follow_up": False,
+            "retry": False,
+            "repeated": False,
+            "escalated": False,
             "severity": "",
             "emergency_type": "",
             "actions_taken": [],
@@ -61,17 +89,17 @@ def lambda_handler(event, context):
         }
 
         # Exécuter le graph LangGraph
-        print("[EMERGENCY HANDLER] Exécution du graph d'urgence...")
-        result = emergency_agent.invoke(initial_state)
+        log.debug("Exécution du graph d'urgence")
+        result = profiler.run('emergency-agent', correlation_id, emergency_agent.invoke, initial_state)
 
-        print(f"[EMERGENCY HANDLER] Gravité: {result['severity']}")
-        print(f"[EMERGENCY HANDLER] Type: {result['emergency_type']}")
-        print(f"[EMERGENCY HANDLER] Actions: {len(result['actions_taken'])}")
-        print(f"[EMERGENCY HANDLER] Contacts notifiés: {len(result['contacts_notified'])}")
+        log.warning("Graph d'urgence terminé", severity=result['severity'], type=result['emergency_type'],
+                    actions=len(result['actions_taken']), contacts_notified=len(result['contacts_notified']))
 
         # Réponse
         response_body = {
             'response': result["response"],
+            'emergency_id': result["emergency_id"],
+            'follow_up': result["follow_up"],
             'severity': result["severity"],
             'emergency_type': result["emergency_type"],
             'actions_taken': result["actions_taken"],
@@ -82,15 +110,16 @@ def lambda_handler(event, context):
         if result.get("error"):
             response_body['error'] = result["error"]
 
-        # Log important pour urgences
-        print("[EMERGENCY HANDLER] ✅ Urgence traitée avec succès")
+        AGENT_REQUESTS.inc(agent='emergency', status='error' if result.get("error") else 'ok')
+
+        # Log important pour urgences (WARNING: jamais échantillonné)
+        log.warning("Urgence traitée avec succès", emergency_id=result["emergency_id"])
 
         return create_lambda_response(200, response_body)
 
     except Exception as e:
-        print(f"[EMERGENCY HANDLER] ❌ ERREUR CRITIQUE: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("ERREUR CRITIQUE", error=str(e))
+        AGENT_REQUESTS.inc(agent='emergency', status='exception')
 
         # En cas d'erreur, retourner quand même une réponse d'urgence
         emergency_response = {
@@ -113,6 +142,12 @@ Je rencontre une difficulté technique mais votre sécurité est primordiale.
 
         return create_lambda_response(500, emergency_response)
 
+    finally:
+        if token:
+            unbind(token)
+        metrics.flush_emf(function='emergency-agent')
+        flush_logs()
+
 
 # Pour tests locaux
 if __name__ == "__main__":
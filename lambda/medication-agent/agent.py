@@ -8,14 +8,23 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage
 from typing import TypedDict, List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date, time
+from itertools import combinations
 
+from lazy import Lazy, preload
+from chat_model import create_chat_model
 from database import db
 from utils import sns_helper, get_next_medication_time, format_datetime
+from interactions import interaction_index, fold, NONE, UNKNOWN, LEVEL_LABELS
+from analysis_cache import analysis_cache
+from dose_log import dose_log, TAKEN, SKIPPED, LATE
+from keywords import KeywordMatcher
+from metrics import metrics
+from logger import get_logger
+
+log = get_logger('medication')
 
 
 # ===== ÉTAT DE L'AGENT =====
@@ -26,18 +35,16 @@ class MedicationState(TypedDict):
     message: str
     context: dict
     medications: List[Dict]
-    action: str  # "info", "reminder", "interaction_check", "history"
+    action: str  # "info", "reminder", "interaction_check", "history", "record"
+    llm_used: bool
     response: str
     error: str
 
 
 # ===== INITIALISATION LLM =====
 
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.3,
-    api_key=os.environ.get('ANTHROPIC_API_KEY')
-)
+# Client construit au premier appel (LLM_PROVIDER=fake: modèle hors-ligne)
+llm = Lazy(lambda: create_chat_model(temperature=0.3), 'llm')
 
 
 # ===== FONCTIONS UTILITAIRES =====
@@ -68,27 +75,172 @@ def check_medication_time(medications: List[Dict]) -> List[Dict]:
     return due_meds
 
 
+# Phrases qui signalent une prise (ou un oubli) à noter dans le journal
+TAKEN_PHRASES = ["j'ai pris", "je viens de prendre", "c'est pris", "deja pris"]
+SKIPPED_PHRASES = ["je n'ai pas pris", "pas pu prendre", "j'ai saute"]
+
+# Au-delà de ce délai après le créneau, la prise est notée en retard
+LATE_AFTER_MINUTES = 60
+
+DAY_LABELS = ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim']
+
+STATUS_LABELS = {
+    TAKEN: "✅ pris",
+    LATE: "⏰ pris en retard",
+    SKIPPED: "⏭️ non pris"
+}
+
+
+# Questions de consultation simple: réponse par template, sans LLM
+LIST_PATTERNS = [
+    "quels sont mes medicaments", "quels medicaments", "liste de mes medicaments",
+    "mes medicaments", "mon traitement", "qu'est-ce que je prends", "que dois-je prendre"
+]
+DOSE_PATTERNS = ["dose", "dosage", "combien", "posologie", "c'est quoi mon", "quel est mon"]
+OPEN_QUESTION_WORDS = [
+    "pourquoi", "comment", "effet", "danger", "risque", "peut", "puis-je", "conseil",
+    "alcool", "remplacer", "arreter", "oublie", "double"
+]
+
+# Mots-clés du routage des actions
+REMINDER_WORDS = ["rappel", "quand", "heure", "prochain", "prendre"]
+INTERACTION_WORDS = ["interaction", "ensemble", "danger", "mélanger"]
+# Formulations au passé: prioritaires sur les rappels ("ai-je oublié de prendre ... hier?")
+HISTORY_WORDS = ["historique", "hier", "cette semaine", "semaine dernière", "oublié de",
+                 "oublié mon", "oublié ma", "oublié mes", "ai-je oublié", "ai-je pris", "ai-je bien pris"]
+# "pris" est aussi le début de "prise" ("prochaine prise?"): indice faible, après les rappels
+PAST_WORDS = ["pris"]
+
+# Toutes les catégories compilées dans un seul automate
+MEDICATION_KEYWORDS = KeywordMatcher({
+    "taken": TAKEN_PHRASES,
+    "skipped": SKIPPED_PHRASES,
+    "reminder": REMINDER_WORDS,
+    "interaction": INTERACTION_WORDS,
+    "history": HISTORY_WORDS,
+    "past": PAST_WORDS,
+    "list": LIST_PATTERNS,
+    "dose": DOSE_PATTERNS,
+    "open_question": OPEN_QUESTION_WORDS
+})
+
+# Part du trafic médicaments servie sans LLM (par conteneur)
+ANSWER_STATS = {'structured': 0, 'llm': 0}
+metrics.register_stats('smartdoc_medication_answers_total', ANSWER_STATS, "Réponses médicaments par origine", 'source')
+
+
+def record_answer(llm_used: bool) -> float:
+    """Comptabilise une réponse et retourne la part servie sans LLM"""
+    ANSWER_STATS['llm' if llm_used else 'structured'] += 1
+    total = ANSWER_STATS['llm'] + ANSWER_STATS['structured']
+    return ANSWER_STATS['structured'] / total
+
+
+def match_named_medications(medications: List[Dict], message: str) -> List[Dict]:
+    """Médicaments cités par leur nom dans le message (noms vides ignorés)"""
+    folded = fold(message)
+    named = [(m, fold(m.get('name') or '').split()) for m in medications]
+    return [m for m, words in named if words and words[0] in folded]
+
+
+def format_medication_card(med: Dict) -> str:
+    """Fiche d'un médicament (nom, dose, horaires, consignes)"""
+    schedules = ", ".join(s.get('time', '') for s in med.get('schedules', []))
+    lines = [f"💊 {med['name']}", f"   📏 Dose: {med['dosage']}"]
+    if schedules:
+        lines.append(f"   ⏰ Horaires: {schedules}")
+    if med.get('instructions'):
+        lines.append(f"   ℹ️ {med['instructions']}")
+    return "\n".join(lines)
+
+
+def structured_info_answer(medications: List[Dict], message: str, user_name: str):
+    """Réponse par template aux questions de consultation, None si question ouverte"""
+    hits = MEDICATION_KEYWORDS.scan(message)
+    if "open_question" in hits:
+        return None
+
+    named = match_named_medications(medications, message)
+    if named and ("dose" in hits or "list" in hits):
+        cards = "\n\n".join(format_medication_card(m) for m in named)
+        return f"{user_name}, voici les informations:\n\n{cards}\n\n💙 En cas de doute, demandez à votre médecin ou pharmacien."
+
+    if "list" in hits:
+        cards = "\n\n".join(format_medication_card(m) for m in medications)
+        count = len(medications)
+        return f"{user_name}, voici vos {count} médicament{'s' if count > 1 else ''}:\n\n{cards}\n\n" \
+               "💙 En cas de doute, demandez à votre médecin ou pharmacien."
+
+    return None
+
+
+def find_dose_slot(medications: List[Dict], message: str, now: datetime):
+    """Médicament et créneau prévu le plus proche de maintenant (nommé en priorité)"""
+    named = match_named_medications(medications, message)
+
+    best = None
+    for med in named or medications:
+        for schedule in med.get('schedules', []):
+            hour, minute = map(int, schedule.get('time', '00:00').split(':'))
+            for day_offset in (0, -1):
+                slot = datetime.combine(now.date() + timedelta(days=day_offset), time(hour, minute))
+                # Tolérance d'une heure pour une prise en avance
+                if slot > now + timedelta(hours=1):
+                    continue
+                delta = abs(now - slot)
+                if best is None or delta < best[2]:
+                    best = (med, slot, delta)
+
+    return best
+
+
+def expected_slots(medications: List[Dict], start: date, end: date, now: datetime) -> List[Dict]:
+    """Créneaux prévus (déjà passés) de la plage [start, end]"""
+    slots = []
+    day = start
+    while day <= end:
+        for med in medications:
+            for schedule in med.get('schedules', []):
+                hour, minute = map(int, schedule.get('time', '00:00').split(':'))
+                slot = datetime.combine(day, time(hour, minute))
+                if slot <= now:
+                    slots.append({
+                        'day': day.isoformat(),
+                        'slot': slot.strftime('%H:%M'),
+                        'medication_id': med.get('medication_id', med['name']),
+                        'medication_name': med['name']
+                    })
+        day += timedelta(days=1)
+    return sorted(slots, key=lambda s: (s['day'], s['slot']))
+
+
 # ===== NŒUDS DU GRAPH =====
 
 def determine_action(state: MedicationState) -> MedicationState:
     """
     Nœud 1: Détermine quelle action effectuer
     """
-    print("[MEDICATION] Détermination de l'action...")
+    log.debug("Détermination de l'action")
 
-    message = state["message"].lower()
+    # Toutes les catégories de mots-clés en un seul parcours
+    hits = MEDICATION_KEYWORDS.scan(state["message"])
 
-    # Mots-clés pour chaque action
-    if any(word in message for word in ["rappel", "quand", "heure", "prochain", "prendre"]):
+    is_question = "?" in state["message"] or any(
+        word in hits.get("history", []) for word in ("hier", "cette semaine"))
+    if not is_question and ("taken" in hits or "skipped" in hits):
+        state["action"] = "record"
+    elif "history" in hits:
+        state["action"] = "history"
+    elif "reminder" in hits:
         state["action"] = "reminder"
-    elif any(word in message for word in ["interaction", "ensemble", "danger", "mélanger"]):
+    elif "interaction" in hits:
         state["action"] = "interaction_check"
-    elif any(word in message for word in ["historique", "pris", "oublié", "hier"]):
+    elif "past" in hits:
         state["action"] = "history"
     else:
         state["action"] = "info"
 
-    print(f"[MEDICATION] Action déterminée: {state['action']}")
+    log.debug("Action déterminée", action=state['action'])
 
     return state
 
@@ -97,14 +249,14 @@ def load_medications(state: MedicationState) -> MedicationState:
     """
     Nœud 2: Charge les médicaments de l'utilisateur
     """
-    print("[MEDICATION] Chargement des médicaments...")
+    log.debug("Chargement des médicaments")
 
     try:
         medications = db.get_user_medications(state["user_id"], active_only=True)
         state["medications"] = medications
-        print(f"[MEDICATION] {len(medications)} médicaments chargés")
+        log.debug("Médicaments chargés", count=len(medications))
     except Exception as e:
-        print(f"[MEDICATION] Erreur chargement médicaments: {e}")
+        log.warning("Erreur chargement médicaments", error=str(e))
         state["medications"] = []
         state["error"] = str(e)
 
@@ -115,7 +267,7 @@ def provide_medication_info(state: MedicationState) -> MedicationState:
     """
     Nœud 3: Fournit des informations sur les médicaments
     """
-    print("[MEDICATION] Génération d'informations médicaments...")
+    log.debug("Génération d'informations médicaments")
 
     medications = state["medications"]
     message = state["message"]
@@ -125,6 +277,13 @@ def provide_medication_info(state: MedicationState) -> MedicationState:
         state["response"] = f"{user_name}, vous n'avez pas de médicaments enregistrés actuellement. Voulez-vous que je vous aide à en ajouter?"
         return state
 
+    # Questions de consultation: rendu direct depuis les données
+    structured = structured_info_answer(medications, message, user_name)
+    if structured:
+        state["response"] = structured
+        log.debug("Réponse structurée (sans LLM)")
+        return state
+
     # Construire le contexte des médicaments
     meds_context = []
     for med in medications:
@@ -153,13 +312,14 @@ Si l'utilisateur demande ses médicaments, liste-les de façon claire avec emoji
 Utilise des emojis appropriés: 💊 pour médicament, ⏰ pour horaire, ℹ️ pour info.
 """
 
+    state["llm_used"] = True
     try:
         response = llm.invoke([SystemMessage(content=system_prompt)])
         state["response"] = response.content
-        print("[MEDICATION] Réponse générée avec succès")
+        log.debug("Réponse générée avec succès")
 
     except Exception as e:
-        print(f"[MEDICATION] Erreur génération réponse: {e}")
+        log.warning("Erreur génération réponse", error=str(e))
         state["response"] = f"Voici vos {len(medications)} médicaments:\n\n" + meds_text
         state["error"] = str(e)
 
@@ -170,7 +330,7 @@ def check_next_dose(state: MedicationState) -> MedicationState:
     """
     Nœud 4: Vérifie le prochain médicament à prendre
     """
-    print("[MEDICATION] Vérification prochaine dose...")
+    log.debug("Vérification prochaine dose")
 
     medications = state["medications"]
     user_name = state["context"].get("user_profile", {}).get("name", "")
@@ -179,11 +339,11 @@ def check_next_dose(state: MedicationState) -> MedicationState:
         state["response"] = f"{user_name}, vous n'avez pas de médicaments enregistrés."
         return state
 
-    # Trouver le prochain médicament
+    # Trouver le prochain médicament (celui cité, s'il y en a un)
     next_meds = []
     now = datetime.now()
 
-    for med in medications:
+    for med in match_named_medications(medications, state["message"]) or medications:
         for schedule in med.get('schedules', []):
             time_str = schedule.get('time', '00:00')
             hour, minute = map(int, time_str.split(':'))
@@ -245,7 +405,7 @@ Je vous rappellerai quand ce sera l'heure! 😊
         response = f"Bravo {user_name}! Vous avez pris tous vos médicaments pour aujourd'hui! 🎉"
 
     state["response"] = response
-    print("[MEDICATION] Prochain médicament calculé")
+    log.debug("Prochain médicament calculé")
 
     return state
 
@@ -254,7 +414,7 @@ def check_interactions(state: MedicationState) -> MedicationState:
     """
     Nœud 5: Vérifie les interactions médicamenteuses
     """
-    print("[MEDICATION] Vérification des interactions...")
+    log.debug("Vérification des interactions")
 
     medications = state["medications"]
     user_name = state["context"].get("user_profile", {}).get("name", "")
@@ -266,13 +426,54 @@ def check_interactions(state: MedicationState) -> MedicationState:
     med_names = [m['name'] for m in medications]
     meds_text = ", ".join(med_names)
 
+    # Base locale d'abord: le LLM n'est appelé que pour les paires inconnues ou signalées
+    try:
+        pairs = interaction_index.check(med_names)
+    except Exception as e:
+        log.warning("Base d'interactions indisponible", error=str(e))
+        pairs = [{'a': a, 'b': b, 'level': UNKNOWN, 'fact': ''} for a, b in combinations(med_names, 2)]
+
+    to_explain = [p for p in pairs if p['level'] != NONE]
+
+    if not to_explain:
+        log.debug("Paires sans interaction connue (base locale)", pairs=len(pairs))
+        lines = "\n".join(f"• {p['a']} + {p['b']}" for p in pairs)
+        state["response"] = f"""
+✅ {user_name}, bonne nouvelle!
+
+Il n'y a pas d'interaction connue entre vos médicaments aux doses habituelles:
+{lines}
+
+💊 Continuez à les prendre comme prescrit.
+
+ℹ️ Consultez toujours votre médecin ou pharmacien pour confirmation, surtout avant d'ajouter un nouveau médicament.
+"""
+        return state
+
+    known_facts = "\n".join(
+        f"- {p['a']} + {p['b']}: {LEVEL_LABELS[p['level']]}. {p['fact']}"
+        for p in to_explain if p['level'] != UNKNOWN
+    ) or "Aucun"
+    unknown_pairs = ", ".join(
+        f"{p['a']} + {p['b']}" for p in to_explain if p['level'] == UNKNOWN
+    ) or "Aucune"
+    safe_pairs = ", ".join(
+        f"{p['a']} + {p['b']}" for p in pairs if p['level'] == NONE
+    ) or "Aucune"
+
     system_prompt = f"""
 Tu es un pharmacien expert mais qui parle simplement.
 
-{user_name} prend actuellement ces médicaments:
+Le patient prend actuellement ces médicaments:
 {meds_text}
 
-Analyse les interactions potentielles entre ces médicaments.
+Faits connus (base de référence):
+{known_facts}
+
+Associations sans interaction connue: {safe_pairs}
+Associations à analyser (absentes de la base): {unknown_pairs}
+
+Explique les interactions signalées et analyse les associations absentes de la base.
 
 Réponds de manière:
 - Très simple et rassurante
@@ -285,17 +486,26 @@ IMPORTANT: Termine toujours en rappelant de consulter un professionnel de santé
 """
 
     try:
-        response = llm.invoke([SystemMessage(content=system_prompt)])
-        state["response"] = response.content
-        print("[MEDICATION] Analyse des interactions terminée")
+        # Le prompt ne dépend que des médicaments: analyse partagée entre utilisateurs
+        analysis, cached = analysis_cache.get_or_compute(
+            'interactions', med_names, (),
+            lambda: llm.invoke([SystemMessage(content=system_prompt)]).content
+        )
+        state["llm_used"] = not cached
+        state["response"] = analysis
+        log.debug("Analyse des interactions terminée", cached=cached)
 
     except Exception as e:
-        print(f"[MEDICATION] Erreur analyse interactions: {e}")
+        log.warning("Erreur analyse interactions", error=str(e))
+        state["llm_used"] = True
         state["response"] = f"""
 Je ne peux pas analyser les interactions pour le moment.
 
 Vos médicaments: {meds_text}
 
+Points déjà connus:
+{known_facts}
+
 Je vous recommande de consulter votre pharmacien ou médecin pour vérifier qu'il n'y a pas d'interactions.
 """
         state["error"] = str(e)
@@ -305,44 +515,134 @@ Je vous recommande de consulter votre pharmacien ou médecin pour vérifier qu'i
 
 def check_history(state: MedicationState) -> MedicationState:
     """
-    Nœud 6: Affiche l'historique de prise
+    Nœud 6: Affiche l'historique de prise depuis le journal des prises
     """
-    print("[MEDICATION] Consultation historique...")
+    log.debug("Consultation historique")
 
-    # Pour MVP, on affiche juste la liste actuelle
-    # Dans une vraie app, on trackrait les prises
     medications = state["medications"]
+    user_name = state["context"].get("user_profile", {}).get("name", "")
+    now = datetime.now()
+    today = now.date()
 
-    response = f"""
-📋 Historique de vos médicaments:
+    if "hier" in fold(state["message"]):
+        start = end = today - timedelta(days=1)
+        period = "hier"
+    else:
+        start, end = today - timedelta(days=6), today
+        period = "ces 7 derniers jours"
 
-Médicaments actifs actuellement: {len(medications)}
+    try:
+        events = dose_log.events(state["user_id"], start, end)
+        counters = dose_log.daily_adherence(state["user_id"], start, end)
+    except Exception as e:
+        log.warning("Erreur lecture journal des prises", error=str(e))
+        state["response"] = f"Désolé {user_name}, je ne peux pas consulter votre historique pour le moment."
+        state["error"] = str(e)
+        return state
 
-"""
+    recorded = {(e['day'], e['slot'], e['medication_id']): e['status'] for e in events}
+    expected = expected_slots(medications, start, end, now)
+    missing = [s for s in expected if (s['day'], s['slot'], s['medication_id']) not in recorded]
 
-    for med in medications:
-        schedules = ", ".join([s.get('time', '') for s in med.get('schedules', [])])
-        response += f"""
-💊 {med['name']}
-   Dose: {med['dosage']}
-   Horaires: {schedules}
-   Depuis: {med.get('start_date', 'Date inconnue')}
+    taken = sum(c[TAKEN] + c[LATE] for c in counters)
+    skipped = sum(c[SKIPPED] for c in counters)
 
-"""
+    response = f"📋 Vos prises {period}:\n\n"
 
-    response += "\nℹ️ Pour un historique détaillé des prises, consultez votre médecin ou pharmacien."
+    if start == end:
+        # Détail créneau par créneau
+        for slot in expected:
+            status = recorded.get((slot['day'], slot['slot'], slot['medication_id']))
+            label = STATUS_LABELS.get(status, "❓ non noté")
+            response += f"  {slot['slot']} 💊 {slot['medication_name']}: {label}\n"
+        if not expected:
+            response += "  Aucune prise prévue.\n"
+    else:
+        by_day = {c['day']: c for c in counters}
+        day = start
+        while day <= end:
+            key = day.isoformat()
+            planned = sum(1 for s in expected if s['day'] == key)
+            done = by_day.get(key, {TAKEN: 0, LATE: 0})
+            response += f"  {DAY_LABELS[day.weekday()]} {day.day:02d}/{day.month:02d}: " \
+                        f"{done[TAKEN] + done[LATE]}/{planned} prise(s)\n"
+            day += timedelta(days=1)
+
+    response += f"\n✅ {taken} prise(s) notée(s)"
+    if skipped:
+        response += f", ⏭️ {skipped} non prise(s)"
+    response += "\n"
+
+    if missing:
+        response += f"\n❓ {len(missing)} prise(s) non notée(s)"
+        if start == end:
+            response += ". Si vous les avez prises, dites-le-moi: \"J'ai pris mon ...\""
+        response += "\n"
+    elif expected:
+        response += f"\n🎉 Bravo {user_name}, tout est noté!\n"
 
     state["response"] = response
     return state
 
 
+def record_dose(state: MedicationState) -> MedicationState:
+    """
+    Nœud 7: Enregistre une prise (ou un oubli) dans le journal
+    """
+    log.debug("Enregistrement d'une prise")
+
+    medications = state["medications"]
+    user_name = state["context"].get("user_profile", {}).get("name", "")
+    now = datetime.now()
+
+    found = find_dose_slot(medications, state["message"], now)
+    if not found:
+        state["response"] = f"{user_name}, je n'ai pas trouvé de prise prévue correspondante. Pouvez-vous préciser le médicament?"
+        return state
+
+    med, slot, delta = found
+    if "skipped" in MEDICATION_KEYWORDS.scan(state["message"]):
+        status = SKIPPED
+    elif delta > timedelta(minutes=LATE_AFTER_MINUTES):
+        status = LATE
+    else:
+        status = TAKEN
+
+    try:
+        added = dose_log.record(
+            state["user_id"],
+            {'medication_id': med.get('medication_id', med['name']), 'name': med['name']},
+            slot,
+            status,
+            recorded_at=now
+        )
+    except Exception as e:
+        log.warning("Erreur enregistrement prise", error=str(e))
+        state["response"] = "Désolé, je n'ai pas pu noter cette prise. Pouvez-vous réessayer?"
+        state["error"] = str(e)
+        return state
+
+    if not added:
+        state["response"] = f"ℹ️ {user_name}, la prise de {med['name']} de {slot.strftime('%H:%M')} était déjà notée."
+    elif status == SKIPPED:
+        state["response"] = f"📝 C'est noté: {med['name']} de {slot.strftime('%H:%M')} non pris.\n\n" \
+                            "⚠️ Ne doublez pas la dose suivante sans l'avis de votre médecin ou pharmacien."
+    else:
+        state["response"] = f"✅ C'est noté, {user_name}!\n\n💊 {med['name']} ({slot.strftime('%H:%M')}): " \
+                            f"{STATUS_LABELS[status]} à {now.strftime('%H:%M')}"
+
+    log.info("Prise enregistrée", medication_id=med.get('medication_id'), slot=slot.strftime('%H:%M'), status=status, added=added)
+    return state
+
+
 # ===== CONSTRUCTION DU GRAPH LANGGRAPH =====
 
 def create_medication_graph():
     """
     Crée le graph LangGraph pour le medication agent
     """
-    print("[MEDICATION] Création du graph LangGraph...")
+    log.debug("Création du graph LangGraph")
+    from langgraph.graph import StateGraph, END
 
     workflow = StateGraph(MedicationState)
 
@@ -353,6 +653,7 @@ def create_medication_graph():
     workflow.add_node("reminder", check_next_dose)
     workflow.add_node("interaction", check_interactions)
     workflow.add_node("history", check_history)
+    workflow.add_node("record", record_dose)
 
     # Point d'entrée
     workflow.set_entry_point("determine_action")
@@ -368,8 +669,9 @@ def create_medication_graph():
         {
             "info": "info",
             "reminder": "reminder",
-            "interaction": "interaction",
-            "history": "history"
+            "interaction_check": "interaction",
+            "history": "history",
+            "record": "record"
         }
     )
 
@@ -378,11 +680,15 @@ def create_medication_graph():
     workflow.add_edge("reminder", END)
     workflow.add_edge("interaction", END)
     workflow.add_edge("history", END)
+    workflow.add_edge("record", END)
 
     return workflow.compile()
 
 
-# Créer l'instance du graph (singleton)
-medication_agent = create_medication_graph()
+# Graph compilé au premier usage (requête ou préchauffage), une seule fois
+medication_agent = Lazy(create_medication_graph, 'medication_agent')
+
 
-print("[MEDICATION] Graph LangGraph créé avec succès!")
+def warm_up() -> dict:
+    """Ping de préchauffage: prépare graph, client LLM et ressources sans exécuter le graph"""
+    return preload(medication_agent, llm, interaction_index, db, sns_helper)
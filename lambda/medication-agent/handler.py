@@ -9,8 +9,13 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from agent import medication_agent
-from utils import create_lambda_response
+from agent import medication_agent, record_answer, warm_up
+from utils import create_lambda_response, is_warmup_event, parse_request_body
+from profiling import profiler, correlation_id_for
+from metrics import metrics, AGENT_REQUESTS
+from logger import get_logger, bind, unbind, flush_logs
+
+log = get_logger('medication.handler')
 
 
 def lambda_handler(event, context):
@@ -26,14 +31,20 @@ def lambda_handler(event, context):
         }
     }
     """
-    print("[MEDICATION HANDLER] Début du traitement")
+    # Ping de préchauffage: charger graph et clients, sans exécuter le graph
+    if is_warmup_event(event):
+        result = warm_up()
+        log.info("Préchauffage", preloaded=result['preloaded'], duration_ms=result['duration_ms'])
+        return create_lambda_response(200, result)
+
+    log.debug("Début du traitement", event=event)
 
+    token = None
     try:
         # Parser la requête
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
-        else:
-            body = event.get('body', {})
+        body = parse_request_body(event)
+        correlation_id = correlation_id_for(body, context)
+        token = bind(correlation_id=correlation_id)
 
         user_id = body.get('user_id')
         message = body.get('message')
@@ -43,7 +54,7 @@ def lambda_handler(event, context):
         if not user_id or not message:
             return create_lambda_response(400, {'error': 'user_id et message requis'})
 
-        print(f"[MEDICATION HANDLER] User: {user_id}, Message: {message}")
+        log.info("Requête reçue", user_id=user_id, message=message)
 
         # État initial
         initial_state = {
@@ -52,33 +63,38 @@ def lambda_handler(event, context):
             "context": context,
             "medications": [],
             "action": "",
+            "llm_used": False,
             "response": "",
             "error": ""
         }
 
         # Exécuter le graph LangGraph
-        print("[MEDICATION HANDLER] Exécution du graph...")
-        result = medication_agent.invoke(initial_state)
+        log.debug("Exécution du graph")
+        result = profiler.run('medication-agent', correlation_id, medication_agent.invoke, initial_state)
 
-        print(f"[MEDICATION HANDLER] Action: {result['action']}, Médicaments: {len(result['medications'])}")
+        structured_share = record_answer(result["llm_used"])
+        log.info("Graph terminé", action=result['action'], medications_count=len(result['medications']),
+                 llm_used=result['llm_used'], structured_share=round(structured_share, 2))
 
         # Réponse
         response_body = {
             'response': result["response"],
             'action': result["action"],
             'medications_count': len(result["medications"]),
+            'llm_used': result["llm_used"],
             'success': True
         }
 
         if result.get("error"):
             response_body['error'] = result["error"]
 
+        AGENT_REQUESTS.inc(agent='medication', status='error' if result.get("error") else 'ok')
+
         return create_lambda_response(200, response_body)
 
     except Exception as e:
-        print(f"[MEDICATION HANDLER] Erreur: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erreur", error=str(e))
+        AGENT_REQUESTS.inc(agent='medication', status='exception')
 
         return create_lambda_response(500, {
             'error': 'Erreur interne',
@@ -86,6 +102,12 @@ def lambda_handler(event, context):
             'success': False
         })
 
+    finally:
+        if token:
+            unbind(token)
+        metrics.flush_emf(function='medication-agent')
+        flush_logs()
+
 
 # Pour tests locaux
 if __name__ == "__main__":
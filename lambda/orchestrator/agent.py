@@ -8,15 +8,24 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from typing import TypedDict, Annotated, List
+from typing import TypedDict, Annotated, List, Tuple
 import operator
+import time
 from datetime import datetime
 
+from lazy import Lazy, preload
+from chat_model import create_chat_model
 from database import db
-from utils import lambda_helper, generate_id
+from utils import lambda_helper, generate_id, format_appointments_response, upcoming_appointments
+from models import IntentReply
+from structured_output import read_structured
+from response_cache import response_cache
+from intent_cache import intent_cache
+from intent_classifier import intent_classifier
+from logger import get_logger
+
+log = get_logger('orchestrator')
 
 
 # ===== ÉTAT DE L'AGENT =====
@@ -25,33 +34,27 @@ class OrchestratorState(TypedDict):
     """État de l'orchestrator"""
     messages: Annotated[List, operator.add]
     user_id: str
+    correlation_id: str  # Transmis aux agents spécialisés (profils, journaux)
     intent: str
     context: dict
     next_agent: str
     final_response: str
+    response_source: str  # "cache", "fused", "llm" ou "" (agent spécialisé)
     error: str
 
 
 # ===== INITIALISATION LLM =====
 
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.3,
-    api_key=os.environ.get('ANTHROPIC_API_KEY')
-)
-
-
-# ===== NŒUDS DU GRAPH =====
+# Client construit au premier appel (LLM_PROVIDER=fake: modèle hors-ligne)
+llm = Lazy(lambda: create_chat_model(temperature=0.3), 'llm')
 
-def analyze_intent(state: OrchestratorState) -> OrchestratorState:
-    """
-    Nœud 1: Analyse l'intention de l'utilisateur
-    """
-    print("[ORCHESTRATOR] Analyse de l'intention...")
+# Mode fusionné: un seul appel donne l'intention et, si "general", la réponse
+FUSED_INTENT = os.environ.get('ORCHESTRATOR_FUSED', '1') == '1'
+intent_reply_llm = Lazy(lambda: llm.with_structured_output(IntentReply, include_raw=True), 'intent_reply_llm')
 
-    user_message = state["messages"][-1].content if state["messages"] else ""
+VALID_INTENTS = ["medication", "symptom", "appointment", "emergency", "general"]
 
-    system_prompt = """
+INTENT_CATEGORIES = """
 Tu es un classificateur d'intention expert pour un assistant médical senior.
 
 Analyse le message et retourne UNE SEULE catégorie parmi:
@@ -70,41 +73,164 @@ Analyse le message et retourne UNE SEULE catégorie parmi:
 
 - general: Conversation générale, salutations, questions diverses
   Exemples: "Bonjour", "Comment ça va?", "Merci", "Qui es-tu?"
+"""
 
-IMPORTANT: Réponds UNIQUEMENT avec le mot-clé de la catégorie, rien d'autre.
-
+EMERGENCY_RULE = """
 Si le message contient "urgence", "aide", "tombé", "douleur intense" → toujours répondre "emergency"
 """
 
+GENERAL_STYLE = """
+Réponds de manière:
+- Chaleureuse et rassurante
+- Simple et claire (phrases courtes)
+- Empathique et patiente
+- En français
+
+Si c'est une salutation, salue chaleureusement.
+Si c'est un remerciement, réponds poliment.
+Si c'est une question générale, réponds simplement.
+
+Reste toujours positif et encourageant.
+"""
+
+
+# ===== NŒUDS DU GRAPH =====
+
+def analyze_intent(state: OrchestratorState) -> OrchestratorState:
+    """
+    Nœud 2: Analyse l'intention de l'utilisateur
+    """
+    log.debug("Analyse de l'intention")
+
+    user_message = state["messages"][-1].content if state["messages"] else ""
+    user_name = state["context"].get("user_profile", {}).get("name", "")
+
+    # Classifieur local: le LLM seulement en cas de doute
     try:
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Message à classifier: {user_message}")
-        ])
+        local_intent, confidence, confident = intent_classifier.classify(user_message)
+        if confident:
+            state["intent"] = local_intent
+            log.debug("Intent local", intent=local_intent, confidence=round(confidence, 2))
+            # Salutations et remerciements déjà traités: pas de génération.
+            # Seulement après une classification "general" sûre (jamais avant le
+            # contrôle des termes d'urgence fait par le classifieur)
+            if response_cache.enabled(local_intent):
+                cached = response_cache.lookup(user_message, user_name)
+                if cached:
+                    state["final_response"] = cached["reply"]
+                    state["response_source"] = "cache"
+                    log.debug("Réponse en cache", similarity=round(cached['similarity'], 2),
+                              hit_ratio=round(response_cache.hit_ratio(), 2))
+            return state
+    except Exception as e:
+        log.warning("Erreur classifieur local", error=str(e))
+
+    # Message court déjà classé (tous utilisateurs confondus)
+    intent = intent_cache.get(user_message)
+    if intent:
+        state["intent"] = intent
+        log.debug("Intent en cache", intent=intent)
+        return state
+
+    if FUSED_INTENT:
+        return classify_and_answer(state)
 
-        intent = response.content.strip().lower()
+    try:
+        intent, confidence = classify_with_llm(user_message)
 
-        # Validation de l'intent
-        valid_intents = ["medication", "symptom", "appointment", "emergency", "general"]
-        if intent not in valid_intents:
+        # Validation de l'intent (seul un label valide et sûr est mis en cache)
+        if intent in VALID_INTENTS:
+            intent_cache.put(user_message, intent, confidence)
+        else:
             intent = "general"
 
         state["intent"] = intent
-        print(f"[ORCHESTRATOR] Intent détecté: {intent}")
+        log.debug("Intent détecté", intent=intent)
 
     except Exception as e:
-        print(f"[ORCHESTRATOR] Erreur analyse intent: {e}")
+        log.warning("Erreur analyse intent", error=str(e))
         state["intent"] = "general"
         state["error"] = str(e)
 
     return state
 
 
+def classify_with_llm(user_message: str) -> Tuple[str, float]:
+    """
+    Classification par le LLM seul: (label brut à valider, certitude de 0 à 1)
+    """
+    system_prompt = INTENT_CATEGORIES + """
+IMPORTANT: Réponds UNIQUEMENT avec le mot-clé de la catégorie suivi de ta certitude
+de 0 à 1 (exemple: "medication 0.9"), rien d'autre.
+""" + EMERGENCY_RULE
+
+    started = time.perf_counter()
+    response = llm.invoke([
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"Message à classifier: {user_message}")
+    ])
+    intent_cache.record_latency(time.perf_counter() - started)
+
+    # Certitude absente ou illisible: 0, l'intention n'est pas mise en cache
+    parts = response.content.strip().lower().split()
+    intent = parts[0].strip('.,:;"') if parts else ""
+    try:
+        confidence = min(max(float(parts[1]), 0.0), 1.0)
+    except (IndexError, ValueError):
+        confidence = 0.0
+
+    return intent, confidence
+
+
+def classify_and_answer(state: OrchestratorState) -> OrchestratorState:
+    """
+    Mode fusionné: intention structurée + réponse directe si conversation générale
+    """
+    user_message = state["messages"][-1].content if state["messages"] else ""
+    user_name = state["context"].get("user_profile", {}).get("name", "")
+
+    system_prompt = INTENT_CATEGORIES + EMERGENCY_RULE + f"""
+Si la catégorie est "general", rédige aussi dans "reply" la réponse pour {user_name}, une personne âgée.
+{GENERAL_STYLE}
+Pour toute autre catégorie, laisse "reply" vide: un agent spécialisé répondra.
+Indique dans "confidence" ta certitude sur la catégorie, de 0 à 1.
+"""
+
+    try:
+        started = time.perf_counter()
+        result = intent_reply_llm.invoke([
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=f"Message à classifier: {user_message}")
+        ])
+        intent_cache.record_latency(time.perf_counter() - started)
+        parsed, method, _ = read_structured(result, IntentReply)
+    except Exception as e:
+        log.warning("Erreur analyse intent", error=str(e))
+        parsed, method = None, 'error'
+        state["error"] = str(e)
+
+    if parsed is None:
+        # La réponse générale sera générée séparément
+        state["intent"] = "general"
+        log.warning("Intent non lisible, general par défaut", method=method)
+        return state
+
+    state["intent"] = parsed.intent
+    intent_cache.put(user_message, parsed.intent, parsed.confidence)
+    if parsed.intent == "general" and parsed.reply and parsed.reply.strip():
+        state["final_response"] = parsed.reply.strip()
+        state["response_source"] = "fused"
+
+    log.debug("Intent détecté", intent=parsed.intent, fused_reply=bool(state['final_response']))
+
+    return state
+
+
 def load_user_context(state: OrchestratorState) -> OrchestratorState:
     """
-    Nœud 2: Charge le contexte utilisateur depuis DynamoDB
+    Nœud 1: Charge le contexte utilisateur depuis DynamoDB
     """
-    print("[ORCHESTRATOR] Chargement du contexte utilisateur...")
+    log.debug("Chargement du contexte utilisateur")
 
     user_id = state["user_id"]
     state["context"] = {}
@@ -114,23 +240,24 @@ def load_user_context(state: OrchestratorState) -> OrchestratorState:
         user_profile = db.get_user(user_id)
         if user_profile:
             state["context"]["user_profile"] = user_profile
-            print(f"[ORCHESTRATOR] Profil chargé pour {user_profile.get('name', user_id)}")
+            log.debug("Profil chargé", user_id=user_id)
         else:
-            print(f"[ORCHESTRATOR] Aucun profil trouvé pour {user_id}")
+            log.warning("Aucun profil trouvé", user_id=user_id)
             state["context"]["user_profile"] = {"user_id": user_id, "name": "Utilisateur"}
 
         # Récupérer médicaments actifs
         medications = db.get_user_medications(user_id, active_only=True)
         state["context"]["medications"] = medications
-        print(f"[ORCHESTRATOR] {len(medications)} médicaments actifs")
+        log.debug("Médicaments actifs", count=len(medications))
 
         # Récupérer prochains rendez-vous
-        appointments = db.get_user_appointments(user_id, limit=5)
+        # Tous les rendez-vous (les premiers de l'index ne sont pas les prochains), puis les 5 à venir
+        appointments = [appt for _, appt in upcoming_appointments(db.get_user_appointments(user_id, limit=None))[:5]]
         state["context"]["appointments"] = appointments
-        print(f"[ORCHESTRATOR] {len(appointments)} rendez-vous à venir")
+        log.debug("Rendez-vous à venir", count=len(appointments))
 
     except Exception as e:
-        print(f"[ORCHESTRATOR] Erreur chargement contexte: {e}")
+        log.warning("Erreur chargement contexte", error=str(e))
         state["error"] = str(e)
 
     return state
@@ -140,14 +267,14 @@ def route_to_agent(state: OrchestratorState) -> OrchestratorState:
     """
     Nœud 3: Détermine quel agent spécialisé appeler
     """
-    print("[ORCHESTRATOR] Routing vers agent spécialisé...")
+    log.debug("Routing vers agent spécialisé")
 
     intent = state["intent"]
 
     agent_mapping = {
         "medication": "medication-agent",
         "symptom": "symptom-agent",
-        "appointment": "symptom-agent",  # Le symptom agent gère aussi les RDV
+        "appointment": "appointment-response",  # Réponse directe depuis le contexte, sans LLM
         "emergency": "emergency-agent",
         "general": "general-response"
     }
@@ -155,7 +282,7 @@ def route_to_agent(state: OrchestratorState) -> OrchestratorState:
     next_agent = agent_mapping.get(intent, "general-response")
     state["next_agent"] = next_agent
 
-    print(f"[ORCHESTRATOR] Agent sélectionné: {next_agent}")
+    log.debug("Agent sélectionné", agent=next_agent)
 
     return state
 
@@ -166,11 +293,23 @@ def call_specialized_agent(state: OrchestratorState) -> OrchestratorState:
     """
     agent_name = state["next_agent"]
 
-    print(f"[ORCHESTRATOR] Appel de l'agent: {agent_name}")
+    log.debug("Appel de l'agent", agent=agent_name)
 
     if agent_name == "general-response":
-        # Réponse générale directe
-        state["final_response"] = generate_general_response(state)
+        # Réponse générale directe (déjà produite avec l'intention en mode fusionné)
+        if not state["final_response"]:
+            state["final_response"] = generate_general_response(state)
+            state["response_source"] = "llm"
+
+        if state.get("response_source") != "cache" and not state.get("error"):
+            user_message = state["messages"][-1].content if state["messages"] else ""
+            user_name = state["context"].get("user_profile", {}).get("name", "")
+            response_cache.store(state["intent"], user_message, state["final_response"], user_name)
+        return state
+
+    if agent_name == "appointment-response":
+        # Les rendez-vous sont déjà dans le contexte: rendu déterministe
+        state["final_response"] = generate_appointment_response(state)
         return state
 
     try:
@@ -178,7 +317,8 @@ def call_specialized_agent(state: OrchestratorState) -> OrchestratorState:
         payload = {
             "user_id": state["user_id"],
             "message": state["messages"][-1].content if state["messages"] else "",
-            "context": state["context"]
+            "context": state["context"],
+            "correlation_id": state.get("correlation_id", "")
         }
 
         # Appeler l'agent Lambda
@@ -195,10 +335,10 @@ def call_specialized_agent(state: OrchestratorState) -> OrchestratorState:
 
             state["final_response"] = body.get("response", "Désolé, je n'ai pas pu traiter votre demande.")
 
-        print(f"[ORCHESTRATOR] Réponse reçue de {agent_name}")
+        log.debug("Réponse reçue", agent=agent_name)
 
     except Exception as e:
-        print(f"[ORCHESTRATOR] Erreur appel agent: {e}")
+        log.error("Erreur appel agent", agent=agent_name, error=str(e))
         state["final_response"] = "Désolé, je rencontre une difficulté technique. Veuillez réessayer."
         state["error"] = str(e)
 
@@ -209,26 +349,14 @@ def generate_general_response(state: OrchestratorState) -> str:
     """
     Génère une réponse pour conversation générale
     """
-    print("[ORCHESTRATOR] Génération réponse générale...")
+    log.debug("Génération réponse générale")
 
     user_message = state["messages"][-1].content if state["messages"] else ""
     user_name = state["context"].get("user_profile", {}).get("name", "")
 
     system_prompt = f"""
 Tu es un assistant médical bienveillant pour {user_name}, une personne âgée.
-
-Réponds de manière:
-- Chaleureuse et rassurante
-- Simple et claire (phrases courtes)
-- Empathique et patiente
-- En français
-
-Si c'est une salutation, salue chaleureusement.
-Si c'est un remerciement, réponds poliment.
-Si c'est une question générale, réponds simplement.
-
-Reste toujours positif et encourageant.
-"""
+{GENERAL_STYLE}"""
 
     try:
         response = llm.invoke([
@@ -239,15 +367,28 @@ Reste toujours positif et encourageant.
         return response.content
 
     except Exception as e:
-        print(f"[ORCHESTRATOR] Erreur génération réponse: {e}")
+        log.warning("Erreur génération réponse", error=str(e))
+        state["error"] = str(e)
         return "Bonjour! Comment puis-je vous aider aujourd'hui?"
 
 
+def generate_appointment_response(state: OrchestratorState) -> str:
+    """
+    Génère la réponse sur les rendez-vous à partir du contexte (sans LLM)
+    """
+    log.debug("Génération réponse rendez-vous")
+
+    appointments = state["context"].get("appointments", [])
+    user_name = state["context"].get("user_profile", {}).get("name", "")
+
+    return format_appointments_response(appointments, user_name)
+
+
 def save_conversation(state: OrchestratorState) -> OrchestratorState:
     """
     Nœud 5: Sauvegarde la conversation dans DynamoDB
     """
-    print("[ORCHESTRATOR] Sauvegarde de la conversation...")
+    log.debug("Sauvegarde de la conversation")
 
     try:
         conversation_data = {
@@ -261,10 +402,10 @@ def save_conversation(state: OrchestratorState) -> OrchestratorState:
         }
 
         db.save_conversation(conversation_data)
-        print("[ORCHESTRATOR] Conversation sauvegardée")
+        log.debug("Conversation sauvegardée")
 
     except Exception as e:
-        print(f"[ORCHESTRATOR] Erreur sauvegarde conversation: {e}")
+        log.warning("Erreur sauvegarde conversation", error=str(e))
         state["error"] = str(e)
 
     return state
@@ -276,7 +417,8 @@ def create_orchestrator_graph():
     """
     Crée le graph LangGraph orchestrateur
     """
-    print("[ORCHESTRATOR] Création du graph LangGraph...")
+    log.debug("Création du graph LangGraph")
+    from langgraph.graph import StateGraph, END
 
     workflow = StateGraph(OrchestratorState)
 
@@ -288,9 +430,10 @@ def create_orchestrator_graph():
     workflow.add_node("save", save_conversation)
 
     # Définir le flow
-    workflow.set_entry_point("analyze_intent")
-    workflow.add_edge("analyze_intent", "load_context")
-    workflow.add_edge("load_context", "route")
+    # Contexte d'abord: le mode fusionné a besoin du nom pour répondre
+    workflow.set_entry_point("load_context")
+    workflow.add_edge("load_context", "analyze_intent")
+    workflow.add_edge("analyze_intent", "route")
     workflow.add_edge("route", "call_agent")
     workflow.add_edge("call_agent", "save")
     workflow.add_edge("save", END)
@@ -298,7 +441,10 @@ def create_orchestrator_graph():
     return workflow.compile()
 
 
-# Créer l'instance du graph (singleton)
-orchestrator = create_orchestrator_graph()
+# Graph compilé au premier usage (requête ou préchauffage), une seule fois
+orchestrator = Lazy(create_orchestrator_graph, 'orchestrator')
+
 
-print("[ORCHESTRATOR] Graph LangGraph créé avec succès!")
+def warm_up() -> dict:
+    """Ping de préchauffage: prépare graph, client LLM et ressources sans exécuter le graph"""
+    return preload(orchestrator, llm, intent_reply_llm, intent_classifier, db, lambda_helper)
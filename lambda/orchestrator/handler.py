@@ -5,13 +5,19 @@ Lambda Handler pour l'Orchestrator Agent
 import json
 import sys
 import os
+import time
 
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
 from langchain_core.messages import HumanMessage
-from agent import orchestrator
-from utils import create_lambda_response
+from agent import orchestrator, warm_up
+from utils import create_lambda_response, is_warmup_event, parse_request_body
+from profiling import profiler, correlation_id_for
+from metrics import metrics, REQUESTS, REQUEST_LATENCY
+from logger import get_logger, bind, unbind, flush_logs
+
+log = get_logger('orchestrator.handler')
 
 
 def lambda_handler(event, context):
@@ -26,66 +32,79 @@ def lambda_handler(event, context):
         }
     }
     """
-    print("[HANDLER] Début du traitement de la requête")
-    print(f"[HANDLER] Event: {json.dumps(event)}")
+    # Ping de préchauffage: charger graph et clients, sans exécuter le graph
+    if is_warmup_event(event):
+        result = warm_up()
+        log.info("Préchauffage", preloaded=result['preloaded'], duration_ms=result['duration_ms'])
+        return create_lambda_response(200, result)
+
+    start = time.perf_counter()
+    log.debug("Début du traitement de la requête", event=event)
 
+    token = None
     try:
         # Parser la requête
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
-        else:
-            body = event.get('body', {})
+        body = parse_request_body(event)
+        correlation_id = correlation_id_for(body, context)
+        token = bind(correlation_id=correlation_id)
 
         user_id = body.get('user_id')
         message = body.get('message')
 
         # Validation
         if not user_id:
-            print("[HANDLER] Erreur: user_id manquant")
+            log.warning("user_id manquant")
             return create_lambda_response(400, {'error': 'user_id requis'})
 
         if not message:
-            print("[HANDLER] Erreur: message manquant")
+            log.warning("message manquant", user_id=user_id)
             return create_lambda_response(400, {'error': 'message requis'})
 
-        print(f"[HANDLER] User: {user_id}, Message: {message}")
+        log.info("Requête reçue", user_id=user_id, message=message)
 
         # État initial pour LangGraph
         initial_state = {
             "messages": [HumanMessage(content=message)],
             "user_id": user_id,
+            "correlation_id": correlation_id,
             "intent": "",
             "context": {},
             "next_agent": "",
             "final_response": "",
+            "response_source": "",
             "error": ""
         }
 
         # Exécuter l'orchestrator LangGraph
-        print("[HANDLER] Exécution du graph LangGraph...")
-        result = orchestrator.invoke(initial_state)
+        log.debug("Exécution du graph LangGraph")
+        result = profiler.run('orchestrator', correlation_id, orchestrator.invoke, initial_state)
 
-        print(f"[HANDLER] Graph terminé. Intent: {result['intent']}, Agent: {result['next_agent']}")
+        log.info("Graph terminé", intent=result['intent'], agent=result['next_agent'],
+                 source=result.get('response_source') or 'agent')
+
+        REQUESTS.inc(intent=result["intent"], agent=result["next_agent"],
+                     status='error' if result.get("error") else 'ok')
+        REQUEST_LATENCY.observe((time.perf_counter() - start) * 1000, intent=result["intent"])
 
         # Préparer la réponse
         response_body = {
             'response': result["final_response"],
             'intent': result["intent"],
             'agent_used': result["next_agent"],
+            'correlation_id': correlation_id,
             'success': True
         }
 
         if result.get("error"):
             response_body['error'] = result["error"]
 
-        print(f"[HANDLER] Réponse: {response_body['response'][:100]}...")
+        log.debug("Réponse", response=response_body['response'])
 
         return create_lambda_response(200, response_body)
 
     except Exception as e:
-        print(f"[HANDLER] Erreur critique: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erreur critique", error=str(e))
+        REQUESTS.inc(intent='unknown', agent='', status='exception')
 
         return create_lambda_response(500, {
             'error': 'Erreur interne du serveur',
@@ -93,6 +112,12 @@ def lambda_handler(event, context):
             'success': False
         })
 
+    finally:
+        if token:
+            unbind(token)
+        metrics.flush_emf(function='orchestrator')
+        flush_logs()
+
 
 # Pour tests locaux
 if __name__ == "__main__":
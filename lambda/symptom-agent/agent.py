@@ -8,14 +8,23 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage
 from typing import TypedDict, List, Dict
 from datetime import datetime, timedelta
 
+from lazy import Lazy, preload
+from chat_model import create_chat_model
 from database import db
 from utils import format_datetime
+from analysis_cache import analysis_cache
+from side_effects import side_effect_index
+from keywords import KeywordMatcher
+from models import SymptomTriage
+from structured_output import read_structured
+from metrics import metrics
+from logger import get_logger
+
+log = get_logger('symptom')
 
 
 # ===== ÉTAT DE L'AGENT =====
@@ -27,19 +36,44 @@ class SymptomState(TypedDict):
     context: dict
     severity: str  # "mild", "moderate", "severe", "critical"
     symptoms: List[str]
-    recommendations: List[str]
-    appointments: List[Dict]
+    side_effects: List[str]  # Branche check_meds
+    recommendations: List[str]  # Branche recommend
+    appointments: List[Dict]  # Branche check_appts
+    appointment_note: str
     response: str
     error: str
 
 
 # ===== INITIALISATION LLM =====
 
-llm = ChatAnthropic(
-    model="claude-3-haiku-20240307",
-    temperature=0.3,
-    api_key=os.environ.get('ANTHROPIC_API_KEY')
-)
+# Client construit au premier appel (LLM_PROVIDER=fake: modèle hors-ligne)
+llm = Lazy(lambda: create_chat_model(temperature=0.3), 'llm')
+
+# Triage via tool calling: schéma construit une seule fois, au premier triage
+triage_llm = Lazy(lambda: llm.with_structured_output(SymptomTriage, include_raw=True), 'triage_llm')
+
+# Comment le triage a été obtenu (structured / tool_args / extracted / keywords)
+TRIAGE_STATS = {'structured': 0, 'tool_args': 0, 'extracted': 0, 'keywords': 0}
+FALLBACK_REASONS = {'invalid': 0, 'empty': 0, 'error': 0}
+metrics.register_stats('smartdoc_symptom_triage_total', TRIAGE_STATS, "Origine du triage des symptômes", 'source')
+metrics.register_stats('smartdoc_symptom_triage_fallbacks_total', FALLBACK_REASONS,
+                       "Triages repliés sur les mots-clés", 'reason')
+
+
+SEVERITY_KEYWORDS = KeywordMatcher({
+    "critical": ["poitrine", "respirer", "confusion", "inconscient", "paralysie"],
+    "severe": ["douleur forte", "vomissement", "fièvre élevée", "saigne"],
+    "moderate": ["mal", "douleur", "fatigue"]
+})
+
+
+def keyword_severity(message: str) -> str:
+    """Gravité par mots-clés (dernier recours)"""
+    hits = SEVERITY_KEYWORDS.scan(message)
+    for severity in ("critical", "severe", "moderate"):
+        if severity in hits:
+            return severity
+    return "mild"
 
 
 # ===== NŒUDS DU GRAPH =====
@@ -48,7 +82,7 @@ def analyze_symptom(state: SymptomState) -> SymptomState:
     """
     Nœud 1: Analyse les symptômes mentionnés
     """
-    print("[SYMPTOM] Analyse des symptômes...")
+    log.debug("Analyse des symptômes")
 
     message = state["message"]
     user_name = state["context"].get("user_profile", {}).get("name", "")
@@ -62,7 +96,7 @@ Conditions médicales connues: {', '.join(medical_conditions) if medical_conditi
 
 Message du patient: {message}
 
-Analyse les symptômes et réponds avec un JSON structuré:
+Analyse les symptômes. Champs attendus:
 {{
     "severity": "mild|moderate|severe|critical",
     "symptoms": ["symptôme 1", "symptôme 2"],
@@ -75,97 +109,111 @@ Critères de gravité:
 - severe: Symptômes préoccupants nécessitant consultation rapide (ex: douleur forte, vomissements)
 - critical: Urgence médicale immédiate (ex: douleur poitrine, difficulté respirer, confusion)
 
-Réponds UNIQUEMENT avec le JSON, rien d'autre.
+Réponds avec l'outil SymptomTriage.
 """
 
     try:
-        response = llm.invoke([SystemMessage(content=system_prompt)])
-
-        # Parser la réponse JSON
-        import json
-        result = json.loads(response.content)
-
-        state["severity"] = result.get("severity", "mild")
-        state["symptoms"] = result.get("symptoms", [])
-
-        print(f"[SYMPTOM] Gravité: {state['severity']}, Symptômes: {state['symptoms']}")
-
+        result = triage_llm.invoke([SystemMessage(content=system_prompt)])
+        triage, method, data = read_structured(result, SymptomTriage)
     except Exception as e:
-        print(f"[SYMPTOM] Erreur analyse: {e}")
-        # Fallback: analyse simple par mots-clés
-        message_lower = message.lower()
-
-        critical_keywords = ["poitrine", "respirer", "confusion", "inconscient", "paralysie"]
-        severe_keywords = ["douleur forte", "vomissement", "fièvre élevée", "saigne"]
-
-        if any(k in message_lower for k in critical_keywords):
-            state["severity"] = "critical"
-        elif any(k in message_lower for k in severe_keywords):
-            state["severity"] = "severe"
-        elif any(k in message_lower for k in ["mal", "douleur", "fatigue"]):
-            state["severity"] = "moderate"
-        else:
-            state["severity"] = "mild"
+        log.warning("Erreur analyse", error=str(e))
+        triage, method, data = None, 'error', None
+        state["error"] = str(e)
+
+    if triage is not None:
+        TRIAGE_STATS[method] += 1
+        state["severity"] = triage.severity
+        state["symptoms"] = triage.symptoms
+        log.debug("Triage", severity=state['severity'], symptoms=state['symptoms'], method=method)
+        return state
 
+    # Fallback mesuré: gravité par mots-clés, symptômes récupérés si possible
+    TRIAGE_STATS['keywords'] += 1
+    FALLBACK_REASONS[method] += 1
+    state["severity"] = keyword_severity(message)
+    salvaged = data.get("symptoms") if isinstance(data, dict) else None
+    if isinstance(salvaged, list) and salvaged:
+        state["symptoms"] = [str(s) for s in salvaged]
+    else:
         state["symptoms"] = ["Symptôme mentionné dans le message"]
-        state["error"] = str(e)
+
+    total = sum(TRIAGE_STATS.values())
+    log.info("Triage par mots-clés", severity=state['severity'], reason=method,
+             fallbacks=TRIAGE_STATS['keywords'], total=total)
 
     return state
 
 
-def check_medication_side_effects(state: SymptomState) -> SymptomState:
+def check_medication_side_effects(state: SymptomState) -> Dict:
     """
-    Nœud 2: Vérifie si les symptômes peuvent être des effets secondaires
+    Nœud 2 (branche parallèle): Vérifie si les symptômes peuvent être des effets secondaires
     """
-    print("[SYMPTOM] Vérification effets secondaires médicaments...")
+    log.debug("Vérification effets secondaires médicaments")
 
     medications = state["context"].get("medications", [])
     symptoms = state["symptoms"]
 
     if not medications:
-        print("[SYMPTOM] Aucun médicament à vérifier")
-        return state
+        log.debug("Aucun médicament à vérifier")
+        return {}
 
     med_names = [m['name'] for m in medications]
-    symptoms_text = ", ".join(symptoms)
+
+    # Croisement local symptômes x médicaments (sans LLM)
+    found = side_effect_index.match(symptoms + [state["message"]], med_names)
+    matches = found['matches']
+    side_effects = []
+
+    if not matches:
+        log.debug("Aucun effet secondaire connu correspondant")
+        if found['unknown']:
+            side_effects.append(
+                f"ℹ️ Je n'ai pas d'information sur {', '.join(found['unknown'])}: "
+                "demandez à votre pharmacien si ces symptômes peuvent être liés."
+            )
+        return {"side_effects": side_effects}
+
+    for m in matches:
+        side_effects.append(f"💊 {m['symptom']}: effet secondaire {m['frequency']} de {m['medication']}")
+
+    matched_meds = sorted({m['medication'] for m in matches})
+    matched_symptoms = sorted({m['symptom'] for m in matches})
+    matches_text = "\n".join(f"- {m['symptom']}: {m['medication']} ({m['frequency']})" for m in matches)
 
     system_prompt = f"""
 Tu es un pharmacien expert.
 
-Médicaments du patient: {', '.join(med_names)}
-Symptômes rapportés: {symptoms_text}
-
-Ces symptômes pourraient-ils être des effets secondaires de ces médicaments?
+Effets secondaires connus correspondant aux symptômes du patient:
+{matches_text}
 
-Réponds de manière simple:
-- Si possible lien: explique brièvement
-- Si peu probable: rassure
-- Recommande toujours de consulter médecin/pharmacien
+Explique simplement ce lien possible et ce que le patient peut faire.
+Recommande toujours de consulter médecin/pharmacien, sans arrêter le traitement seul.
 
 Sois bref et clair (2-3 phrases max).
 """
 
     try:
-        response = llm.invoke([SystemMessage(content=system_prompt)])
-        side_effects_info = response.content
-
-        # Ajouter à la réponse finale
-        state["recommendations"].append(f"ℹ️ Concernant vos médicaments: {side_effects_info}")
-
-        print("[SYMPTOM] Vérification effets secondaires terminée")
+        # Le prompt ne dépend que des correspondances trouvées
+        explanation, cached = analysis_cache.get_or_compute(
+            'side_effects', matched_meds, matched_symptoms,
+            lambda: llm.invoke([SystemMessage(content=system_prompt)]).content
+        )
+        side_effects.append(f"ℹ️ Concernant vos médicaments: {explanation}")
+        log.debug("Effets secondaires possibles", count=len(matches), cached=cached)
 
     except Exception as e:
-        print(f"[SYMPTOM] Erreur vérification effets: {e}")
-        state["error"] = str(e)
+        log.warning("Erreur explication effets", error=str(e))
+        side_effects.append("ℹ️ Parlez-en à votre médecin ou pharmacien, sans arrêter votre traitement seul.")
 
-    return state
+    # Branche parallèle: ne retourner que les clés de cette branche
+    return {"side_effects": side_effects}
 
 
-def generate_recommendations(state: SymptomState) -> SymptomState:
+def generate_recommendations(state: SymptomState) -> Dict:
     """
-    Nœud 3: Génère des recommandations basées sur la gravité
+    Nœud 3 (branche parallèle): Génère des recommandations basées sur la gravité
     """
-    print("[SYMPTOM] Génération des recommandations...")
+    log.debug("Génération des recommandations")
 
     severity = state["severity"]
     symptoms = state["symptoms"]
@@ -194,21 +242,19 @@ def generate_recommendations(state: SymptomState) -> SymptomState:
         recommendations.append("📊 Surveillez l'évolution")
         recommendations.append("🏥 Si aggravation, consultez un médecin")
 
-    state["recommendations"].extend(recommendations)
+    log.debug("Recommandations générées", count=len(recommendations))
 
-    print(f"[SYMPTOM] {len(recommendations)} recommandations générées")
-
-    return state
+    return {"recommendations": recommendations}
 
 
-def check_appointments(state: SymptomState) -> SymptomState:
+def check_appointments(state: SymptomState) -> Dict:
     """
-    Nœud 4: Vérifie les rendez-vous à venir
+    Nœud 4 (branche parallèle): Vérifie les rendez-vous à venir
     """
-    print("[SYMPTOM] Vérification des rendez-vous...")
+    log.debug("Vérification des rendez-vous")
 
     appointments = state["context"].get("appointments", [])
-    state["appointments"] = appointments
+    appt_info = ""
 
     if appointments:
         next_appt = appointments[0]
@@ -217,24 +263,28 @@ def check_appointments(state: SymptomState) -> SymptomState:
    {next_appt.get('title', 'Rendez-vous')}
    Le {next_appt.get('date', '')} à {next_appt.get('time', '')}
 """
-        state["recommendations"].append(appt_info)
-        print(f"[SYMPTOM] {len(appointments)} rendez-vous trouvés")
+        log.debug("Rendez-vous trouvés", count=len(appointments))
     else:
-        print("[SYMPTOM] Aucun rendez-vous à venir")
+        log.debug("Aucun rendez-vous à venir")
 
-    return state
+    return {"appointments": appointments, "appointment_note": appt_info}
 
 
 def create_response(state: SymptomState) -> SymptomState:
     """
-    Nœud 5: Crée la réponse finale complète
+    Nœud 5: Crée la réponse finale complète (jonction des branches)
     """
-    print("[SYMPTOM] Création de la réponse finale...")
+    log.debug("Création de la réponse finale")
 
     user_name = state["context"].get("user_profile", {}).get("name", "")
     severity = state["severity"]
     symptoms = state["symptoms"]
-    recommendations = state["recommendations"]
+
+    # Même ordre qu'avant la parallélisation: médicaments, recommandations, RDV
+    recommendations = state["side_effects"] + state["recommendations"]
+    if state["appointment_note"]:
+        recommendations.append(state["appointment_note"])
+    state["recommendations"] = recommendations
 
     # En-tête basé sur la gravité
     if severity == "critical":
@@ -268,7 +318,7 @@ def create_response(state: SymptomState) -> SymptomState:
 
     state["response"] = "\n".join(response_parts)
 
-    print("[SYMPTOM] Réponse finale créée")
+    log.debug("Réponse finale créée")
 
     return state
 
@@ -279,7 +329,8 @@ def create_symptom_graph():
     """
     Crée le graph LangGraph pour le symptom agent
     """
-    print("[SYMPTOM] Création du graph LangGraph...")
+    log.debug("Création du graph LangGraph")
+    from langgraph.graph import StateGraph, END
 
     workflow = StateGraph(SymptomState)
 
@@ -290,18 +341,28 @@ def create_symptom_graph():
     workflow.add_node("check_appts", check_appointments)
     workflow.add_node("create_response", create_response)
 
-    # Flow linéaire
+    # Après l'analyse: branches parallèles, jointes dans create_response
+    def fan_out(state: SymptomState) -> List[str]:
+        branches = ["recommend", "check_appts"]
+        # Pas d'appel LLM effets secondaires si gravité légère ou aucun médicament
+        if state["severity"] != "mild" and state["context"].get("medications"):
+            branches.append("check_meds")
+        return branches
+
     workflow.set_entry_point("analyze")
-    workflow.add_edge("analyze", "check_meds")
-    workflow.add_edge("check_meds", "recommend")
-    workflow.add_edge("recommend", "check_appts")
+    workflow.add_conditional_edges("analyze", fan_out, ["check_meds", "recommend", "check_appts"])
+    workflow.add_edge("check_meds", "create_response")
+    workflow.add_edge("recommend", "create_response")
     workflow.add_edge("check_appts", "create_response")
     workflow.add_edge("create_response", END)
 
     return workflow.compile()
 
 
-# Créer l'instance du graph (singleton)
-symptom_agent = create_symptom_graph()
+# Graph compilé au premier usage (requête ou préchauffage), une seule fois
+symptom_agent = Lazy(create_symptom_graph, 'symptom_agent')
+
 
-print("[SYMPTOM] Graph LangGraph créé avec succès!")
+def warm_up() -> dict:
+    """Ping de préchauffage: prépare graph, client LLM et ressources sans exécuter le graph"""
+    return preload(symptom_agent, llm, triage_llm, side_effect_index, db)
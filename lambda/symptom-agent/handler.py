@@ -9,8 +9,13 @@ import os
 # Ajouter le dossier shared au path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
-from agent import symptom_agent
-from utils import create_lambda_response
+from agent import symptom_agent, warm_up
+from utils import create_lambda_response, is_warmup_event, parse_request_body
+from profiling import profiler, correlation_id_for
+from metrics import metrics, AGENT_REQUESTS
+from logger import get_logger, bind, unbind, flush_logs
+
+log = get_logger('symptom.handler')
 
 
 def lambda_handler(event, context):
@@ -26,14 +31,20 @@ def lambda_handler(event, context):
         }
     }
     """
-    print("[SYMPTOM HANDLER] Début du traitement")
+    # Ping de préchauffage: charger graph et clients, sans exécuter le graph
+    if is_warmup_event(event):
+        result = warm_up()
+        log.info("Préchauffage", preloaded=result['preloaded'], duration_ms=result['duration_ms'])
+        return create_lambda_response(200, result)
+
+    log.debug("Début du traitement", event=event)
 
+    token = None
     try:
         # Parser la requête
-        if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
-        else:
-            body = event.get('body', {})
+        body = parse_request_body(event)
+        correlation_id = correlation_id_for(body, context)
+        token = bind(correlation_id=correlation_id)
 
         user_id = body.get('user_id')
         message = body.get('message')
@@ -43,7 +54,7 @@ def lambda_handler(event, context):
         if not user_id or not message:
             return create_lambda_response(400, {'error': 'user_id et message requis'})
 
-        print(f"[SYMPTOM HANDLER] User: {user_id}, Message: {message}")
+        log.info("Requête reçue", user_id=user_id, message=message)
 
         # État initial
         initial_state = {
@@ -52,17 +63,19 @@ def lambda_handler(event, context):
             "context": context,
             "severity": "",
             "symptoms": [],
+            "side_effects": [],
             "recommendations": [],
             "appointments": [],
+            "appointment_note": "",
             "response": "",
             "error": ""
         }
 
         # Exécuter le graph LangGraph
-        print("[SYMPTOM HANDLER] Exécution du graph...")
-        result = symptom_agent.invoke(initial_state)
+        log.debug("Exécution du graph")
+        result = profiler.run('symptom-agent', correlation_id, symptom_agent.invoke, initial_state)
 
-        print(f"[SYMPTOM HANDLER] Gravité: {result['severity']}, Symptômes: {len(result['symptoms'])}")
+        log.info("Graph terminé", severity=result['severity'], symptoms_count=len(result['symptoms']))
 
         # Réponse
         response_body = {
@@ -76,12 +89,13 @@ def lambda_handler(event, context):
         if result.get("error"):
             response_body['error'] = result["error"]
 
+        AGENT_REQUESTS.inc(agent='symptom', status='error' if result.get("error") else 'ok')
+
         return create_lambda_response(200, response_body)
 
     except Exception as e:
-        print(f"[SYMPTOM HANDLER] Erreur: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erreur", error=str(e))
+        AGENT_REQUESTS.inc(agent='symptom', status='exception')
 
         return create_lambda_response(500, {
             'error': 'Erreur interne',
@@ -89,6 +103,12 @@ def lambda_handler(event, context):
             'success': False
         })
 
+    finally:
+        if token:
+            unbind(token)
+        metrics.flush_emf(function='symptom-agent')
+        flush_logs()
+
 
 # Pour tests locaux
 if __name__ == "__main__":
@@ -2,16 +2,136 @@
 """
 Serveur API Mock pour tester le frontend localement
 Lance un serveur HTTP sur localhost:8080 qui simule l'API SmartDoc
+
+Latences et pannes viennent d'un profil (mock_api_profiles.json): latence par
+intention, erreurs HTTP, requêtes sans réponse (timeouts), limitation de débit
+(429) et saturation (503). Les requêtes sont traitées en parallèle.
+
+Usage: python mock_api_server.py [port] [--profile realistic] [--profiles fichier.json] [--seed 42]
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import os
+import sys
 import json
 import time
+import random
+import argparse
+import threading
 from datetime import datetime
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+
+from keywords import KeywordMatcher
+from latency import parse_latency
+from metrics import MetricsRegistry, PROMETHEUS_CONTENT_TYPE
+
+
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_api_profiles.json')
+
+# Métriques propres au mock (GET /metrics): réponses servies, pannes comprises
+mock_metrics = MetricsRegistry()
+MOCK_REQUESTS = mock_metrics.counter('mock_api_requests_total', "Requêtes /chat servies", ('intent', 'status'))
+MOCK_LATENCY = mock_metrics.histogram('mock_api_latency_ms', "Durée de traitement côté serveur (ms)", ('intent',))
+
+
+# Intentions reconnues par mots-clés (un seul parcours du message)
+INTENT_KEYWORDS = KeywordMatcher({
+    'medication': ['médicament', 'medication', 'traitement', 'pilule'],
+    'symptom': ['mal', 'douleur', 'symptom', 'tête', 'fièvre', 'fatigue'],
+    'appointment': ['rendez-vous', 'rdv', 'appointment', 'docteur', 'médecin'],
+    'emergency': ['aide', 'urgence', 'tombé', 'chute', 'danger', 'au secours']
+})
+
+
+# ===== PROFILS DE LATENCE ET DE PANNES =====
+
+class FaultProfile:
+    """Latence par intention, erreurs, timeouts, limitation de débit et saturation"""
+
+    def __init__(self, name: str, config: Dict, seed: Optional[int] = None):
+        self.name = name
+        self.description = config.get('description', '')
+        latency = config.get('latency', {})
+        if not isinstance(latency, dict):
+            latency = {'*': latency}
+        self._latency = {intent: parse_latency(spec) for intent, spec in latency.items()}
+        self.errors = {int(code): rate for code, rate in config.get('errors', {}).items()}
+        self.timeout_rate = config.get('timeout_rate', 0.0)
+        self.timeout_s = config.get('timeout_s', 30)
+
+        throttle = config.get('throttle') or {}
+        self.rps = throttle.get('rps')
+        self.burst = throttle.get('burst', self.rps or 1)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+
+        self.max_in_flight = config.get('max_in_flight')
+        self._in_flight = 0
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, name: str, path: str = PROFILES_PATH, seed: Optional[int] = None) -> 'FaultProfile':
+        with open(path, encoding='utf-8') as f:
+            profiles = json.load(f)
+        if name not in profiles:
+            raise ValueError(f"Profil inconnu: {name} (disponibles: {', '.join(profiles)})")
+        return cls(name, profiles[name], seed)
+
+    def latency_s(self, intent: str) -> float:
+        distribution = self._latency.get(intent, self._latency.get('*'))
+        if distribution is None:
+            return 0.0
+        with self._lock:
+            return distribution(self._rng) / 1000
+
+    def throttled(self) -> bool:
+        """Seau à jetons: True si la requête dépasse le débit autorisé"""
+        if not self.rps:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rps)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def enter(self) -> bool:
+        """Réserve une place; False si l'instance est saturée"""
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def draw_fault(self):
+        """'timeout', un code d'erreur HTTP, ou None (réponse normale)"""
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.timeout_rate:
+            return 'timeout'
+        threshold = self.timeout_rate
+        for code, rate in self.errors.items():
+            threshold += rate
+            if draw < threshold:
+                return code
+        return None
+
 
 class MockAPIHandler(BaseHTTPRequestHandler):
     """Handler pour les requêtes HTTP"""
 
+    profile = FaultProfile('default', {'latency': {'*': '1000'}})
+
     def log_message(self, format, *args):
         """Override pour un meilleur logging"""
         timestamp = datetime.now().strftime('%H:%M:%S')
@@ -25,9 +145,40 @@ class MockAPIHandler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
 
+    def send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        """Réponse JSON avec CORS"""
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        """Métriques au format Prometheus"""
+        if self.path == '/metrics':
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(mock_metrics.render_prometheus().encode('utf-8'))
+        else:
+            self.send_error(404, "Endpoint non trouvé")
+
+    def record(self, start: float, intent: str, status) -> None:
+        MOCK_REQUESTS.inc(intent=intent, status=str(status))
+        MOCK_LATENCY.observe((time.perf_counter() - start) * 1000, intent=intent)
+
     def do_POST(self):
         """Handle POST requests"""
         if self.path == '/chat':
+            start = time.perf_counter()
+            profile = self.profile
+            if not profile.enter():
+                self.record(start, 'unknown', 503)
+                print("🔥 Saturé: 503")
+                self.send_json(503, {'error': 'Service saturé', 'success': False}, {'Retry-After': '2'})
+                return
             try:
                 # Lire le body
                 content_length = int(self.headers['Content-Length'])
@@ -39,33 +190,54 @@ class MockAPIHandler(BaseHTTPRequestHandler):
 
                 print(f"\n📨 Requête de {user_id}: {message[:50]}...")
 
-                # Simuler un délai (comme une vraie API)
-                time.sleep(1)
+                if profile.throttled():
+                    self.record(start, 'unknown', 429)
+                    print("⛔ Limite de débit: 429")
+                    self.send_json(429, {'error': 'Trop de requêtes', 'success': False}, {'Retry-After': '1'})
+                    return
 
                 # Générer la réponse selon le message
                 response = self.generate_response(message, user_id)
 
+                # Délai selon le profil (par intention)
+                time.sleep(profile.latency_s(response['intent']))
+
+                fault = profile.draw_fault()
+                if fault == 'timeout':
+                    # Ne jamais répondre: le client doit gérer son propre timeout
+                    print(f"⏳ Timeout simulé ({profile.timeout_s} s sans réponse)")
+                    time.sleep(profile.timeout_s)
+                    self.record(start, response['intent'], 'timeout')
+                    self.close_connection = True
+                    return
+                if fault:
+                    print(f"💥 Erreur simulée: {fault}")
+                    self.record(start, response['intent'], fault)
+                    self.send_json(fault, {'error': f"Erreur simulée ({fault})", 'success': False})
+                    return
+
                 print(f"✅ Intent: {response['intent']}, Agent: {response['agent_used']}")
 
                 # Envoyer la réponse
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json; charset=utf-8')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+                self.send_json(200, response)
+                self.record(start, response['intent'], 200)
 
             except Exception as e:
                 print(f"❌ Erreur: {str(e)}")
+                self.record(start, 'unknown', 500)
                 self.send_error(500, f"Erreur serveur: {str(e)}")
+            finally:
+                profile.leave()
 
         else:
             self.send_error(404, "Endpoint non trouvé")
 
     def generate_response(self, message, user_id):
         """Génère une réponse mockée basée sur le message"""
+        hits = INTENT_KEYWORDS.scan(message)
 
         # Médicaments
-        if any(word in message for word in ['médicament', 'medication', 'traitement', 'pilule']):
+        if 'medication' in hits:
             return {
                 'response': '''💊 Vos médicaments actuels:
 
@@ -89,7 +261,7 @@ Je vous rappellerai quand ce sera l'heure! 😊''',
             }
 
         # Symptômes
-        elif any(word in message for word in ['mal', 'douleur', 'symptom', 'tête', 'fièvre', 'fatigue']):
+        elif 'symptom' in hits:
             return {
                 'response': '''🌡️ Analyse de vos symptômes
 
@@ -118,7 +290,7 @@ Cardiologue - Dr. Martin demain à 14:30
             }
 
         # Rendez-vous
-        elif any(word in message for word in ['rendez-vous', 'rdv', 'appointment', 'docteur', 'médecin']):
+        elif 'appointment' in hits:
             return {
                 'response': '''📅 Vos prochains rendez-vous:
 
@@ -134,12 +306,12 @@ Cardiologue - Dr. Martin demain à 14:30
 
 Je vous rappellerai la veille de chaque rendez-vous! 😊''',
                 'intent': 'appointment',
-                'agent_used': 'symptom-agent',
+                'agent_used': 'appointment-response',
                 'success': True
             }
 
         # Urgence
-        elif any(word in message for word in ['aide', 'urgence', 'tombé', 'chute', 'danger', 'au secours']):
+        elif 'emergency' in hits:
             return {
                 'response': '''🚨 URGENCE DÉTECTÉE
 
@@ -204,9 +376,11 @@ Comment puis-je vous aider aujourd'hui?''',
                 'success': True
             }
 
-def run_server(port=8080):
-    """Démarre le serveur mock"""
-    server = HTTPServer(('localhost', port), MockAPIHandler)
+def run_server(port=8080, profile='default', profiles_path=PROFILES_PATH, seed=None):
+    """Démarre le serveur mock avec le profil de latence et de pannes choisi"""
+    MockAPIHandler.profile = FaultProfile.load(profile, profiles_path, seed)
+    server = ThreadingHTTPServer(('localhost', port), MockAPIHandler)
+    server.daemon_threads = True
 
     print('''
 ╔══════════════════════════════════════════════════════════════╗
@@ -218,6 +392,7 @@ def run_server(port=8080):
 ✅ Serveur démarré avec succès!
 
 🌐 URL: http://localhost:{port}
+🎛️  Profil: {profile} ({description})
 
 📝 Configuration Frontend:
    1. Ouvrez frontend/index.html dans votre navigateur
@@ -231,6 +406,7 @@ def run_server(port=8080):
    curl -X POST http://localhost:{port}/chat \\
      -H "Content-Type: application/json" \\
      -d '{{"user_id":"test","message":"Bonjour"}}'
+   curl http://localhost:{port}/metrics
 
 💬 Exemples de messages à tester:
    • "Quels sont mes médicaments?"
@@ -240,7 +416,7 @@ def run_server(port=8080):
 
 ⌨️  Appuyez sur Ctrl+C pour arrêter le serveur
 ──────────────────────────────────────────────────────────────
-'''.format(port=port))
+'''.format(port=port, profile=profile, description=MockAPIHandler.profile.description or '-'))
 
     try:
         server.serve_forever()
@@ -250,9 +426,12 @@ def run_server(port=8080):
         print('✅ Serveur arrêté proprement\n')
 
 if __name__ == '__main__':
-    import sys
-
-    # Port par défaut ou depuis argument
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
-
-    run_server(port)
+    parser = argparse.ArgumentParser(description="Serveur API mock SmartDoc")
+    parser.add_argument('port', nargs='?', type=int, default=8080)
+    parser.add_argument('--profile', default=os.environ.get('MOCK_API_PROFILE', 'default'),
+                        help="profil de latence et de pannes")
+    parser.add_argument('--profiles', default=PROFILES_PATH, help="fichier des profils (JSON)")
+    parser.add_argument('--seed', type=int, help="graine des tirages (latence, pannes)")
+    args = parser.parse_args()
+
+    run_server(args.port, args.profile, args.profiles, args.seed)
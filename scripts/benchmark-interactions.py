@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la base locale d'interactions
+
+Génère un jeu de données synthétique (quelques milliers de médicaments),
+puis mesure le chargement de l'index et la vérification des paires.
+
+Usage: python scripts/benchmark-interactions.py [nb_medicaments] [paires_par_medicament]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+from interactions import InteractionIndex, interaction_index
+
+
+N_DRUGS = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+PAIRS_PER_DRUG = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+LOOKUPS = 2000
+
+
+def build_dataset(path: str) -> None:
+    """Écrit un fichier au même format que shared/data/drug_interactions.json"""
+    rng = random.Random(42)
+    drugs = [f"molecule{i:05d}" for i in range(N_DRUGS)]
+    pairs = set()
+    while len(pairs) < N_DRUGS * PAIRS_PER_DRUG:
+        i, j = rng.randrange(N_DRUGS), rng.randrange(N_DRUGS)
+        if i != j:
+            pairs.add((min(i, j), max(i, j)))
+
+    data = {
+        'version': 'bench',
+        'drugs': drugs,
+        'aliases': {f"marque{i:05d}": drugs[i] for i in range(0, N_DRUGS, 3)},
+        'facts': ["Fait de test."] * 50,
+        'pairs': [[i, j, rng.randrange(4), rng.randrange(50)] for i, j in sorted(pairs)]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def main():
+    print(f"📊 Benchmark interactions: {N_DRUGS} médicaments, {N_DRUGS * PAIRS_PER_DRUG} paires")
+    print()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'interactions.json')
+        build_dataset(path)
+        print(f"  Fichier: {os.path.getsize(path) / 1024:.0f} Ko")
+
+        start = time.perf_counter()
+        index = InteractionIndex(path).load()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Mesure mémoire séparée: tracemalloc ralentit fortement le chargement
+        tracemalloc.start()
+        InteractionIndex(path).load()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  Chargement: {load_ms:.1f} ms (pic mémoire {peak / 1024 / 1024:.1f} Mo)")
+        print()
+
+        rng = random.Random(7)
+        for k in (2, 5, 10, 20):
+            meds = [[f"Molecule{rng.randrange(N_DRUGS):05d} 500mg" for _ in range(k)] for _ in range(LOOKUPS)]
+            start = time.perf_counter()
+            for med_names in meds:
+                index.check(med_names)
+            per_call_us = (time.perf_counter() - start) / LOOKUPS * 1_000_000
+            print(f"  k={k:>2} médicaments ({k * (k - 1) // 2:>3} paires): {per_call_us:8.1f} µs / vérification")
+
+    print()
+    start = time.perf_counter()
+    interaction_index.load()
+    print(f"  Base embarquée: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(v{interaction_index.version})")
+    print(f"  Doliprane + Aspégic: {interaction_index.check(['Doliprane 500mg', 'Aspégic 100mg'])}")
+
+
+if __name__ == '__main__':
+    main()
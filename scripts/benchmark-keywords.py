@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la détection de mots-clés
+
+Compare les anciens parcours any(mot in message ...) des agents (routage
+médicaments, gravité urgence, fallback symptômes, serveur mock) avec le
+matcher partagé tel que déployé. Les mots-clés sont ceux des agents
+(MEDICATION_KEYWORDS, EMERGENCY_KEYWORDS, SEVERITY_KEYWORDS...), importés.
+
+Usage: python scripts/benchmark-keywords.py [nb_iterations]
+"""
+
+import os
+import sys
+import time
+import contextlib
+import importlib.util
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'shared'))
+
+import offline
+from keywords import normalize
+
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+MESSAGES = [
+    "Bonjour, quels sont mes médicaments?",
+    "J'ai pris mon Doliprane ce matin",
+    "Est-ce que je peux mélanger l'aspirine et le Voltarène?",
+    "Aidez-moi je suis tombée dans la cuisine et j'ai mal à la hanche",
+    "J'ai une douleur à la poitrine et du mal à respirer",
+    "Mon cœur bat très vite depuis ce matin",
+    "Quand est mon prochain rendez-vous chez le médecin?",
+    "Il fait beau aujourd'hui, je vais me promener",
+    "Je me sens un peu fatiguée et j'ai de la fièvre",
+    "AU SECOURS! Je suis tombe!!",
+]
+
+def load_agent(folder: str):
+    """Charge lambda/<folder>/agent.py sous un nom unique (chaque agent s'appelle agent.py)"""
+    spec = importlib.util.spec_from_file_location(f"bench_{folder.replace('-', '_')}",
+                                                  os.path.join(ROOT, 'lambda', folder, 'agent.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def deployed_matchers() -> dict:
+    """Matchers tels que déployés (importés des agents, jamais recopiés)"""
+    sys.path.insert(0, ROOT)
+    from mock_api_server import INTENT_KEYWORDS
+    return {
+        "medication": load_agent('medication-agent').MEDICATION_KEYWORDS,
+        "emergency": load_agent('emergency-agent').EMERGENCY_KEYWORDS,
+        "symptom": load_agent('symptom-agent').SEVERITY_KEYWORDS,
+        "mock": INTENT_KEYWORDS,
+    }
+
+
+SITE_MATCHERS = {}
+
+
+def legacy_scan(message: str) -> dict:
+    """Ancienne méthode, sur les mêmes mots-clés: message.lower() puis un any() par catégorie"""
+    lowered = message.lower()
+    return {
+        site: {c for c, words in matcher._categories.items() if any(w in lowered for w in words)}
+        for site, matcher in SITE_MATCHERS.items()
+    }
+
+
+def per_site_scan(message: str) -> dict:
+    """Méthode déployée: un matcher par agent (normalisation en cache pendant la requête)"""
+    normalize.cache_clear()  # Nouveau message: pas de résultat d'une itération précédente
+    return {site: set(matcher.scan(message)) for site, matcher in SITE_MATCHERS.items()}
+
+
+def shared_normalization_scan(message: str) -> dict:
+    """Normalisation unique partagée par les matchers (scan_normalized)"""
+    normalize.cache_clear()
+    normalized = normalize(message)
+    return {site: set(matcher.scan_normalized(normalized)) for site, matcher in SITE_MATCHERS.items()}
+
+
+def bench(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS // len(MESSAGES)):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / ITERATIONS * 1_000_000
+
+
+def main():
+    offline.enable()
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        SITE_MATCHERS.update(deployed_matchers())
+
+    print(f"📊 Benchmark mots-clés: {len(MESSAGES)} messages, {ITERATIONS} itérations")
+    print()
+
+    # Premier appel: compilation des expressions
+    start = time.perf_counter()
+    per_site_scan(MESSAGES[0])
+    print(f"  Compilation des matchers: {(time.perf_counter() - start) * 1000:.2f} ms")
+    print()
+
+    for label, fn in [("Anciens any() (4 sites)", legacy_scan),
+                      ("Matcher par agent (déployé)", per_site_scan),
+                      ("Normalisation unique", shared_normalization_scan)]:
+        print(f"  {label:<34} {bench(fn):7.2f} µs / message")
+
+    print()
+    print("  Différences de détection (ancien -> nouveau):")
+    for message in MESSAGES:
+        old, new = legacy_scan(message), per_site_scan(message)
+        for site in SITE_MATCHERS:
+            if old[site] != new[site]:
+                added = sorted(new[site] - old[site])
+                removed = sorted(old[site] - new[site])
+                print(f"    {message[:45]:<45} [{site}] +{added} -{removed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks des chemins chauds des graphs
+
+Mesure, avec LLM et stockage hors-ligne (offline.enable, latence LLM nulle):
+  - le coût d'un invoke de chaque graph (orchestrator et agents),
+  - determine_action, assess_severity (mots-clés, sans LLM),
+  - check_next_dose avec 1, 10 et 50 médicaments,
+  - le rendu des réponses (create_final_response, create_response),
+  - create_lambda_response et parse_request_body,
+  - le coût des métriques (inc, observe, rendu Prometheus).
+
+Chaque cas est chronométré avec timeit (temps par appel, meilleur de --repeat
+séries, trois fois plus sous 10 µs), rapporté à un étalon mesuré juste après
+pour absorber les variations de vitesse de la machine. Les cas sous 10 µs sont
+comparés sur la médiane des séries, sans écart absolu minimal. Le rapport JSON est comparé à scripts/baselines/nodes.json:
+toute régression au-delà de la tolérance fait échouer la commande (code 1).
+
+Usage:
+  python scripts/benchmark-nodes.py [--repeat 5] [--only graph,check_next_dose]
+                                    [--output nodes-report.json] [--update-baseline]
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+import itertools
+import contextlib
+import importlib.util
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_PATH = os.path.join(ROOT, 'scripts', 'baselines', 'nodes.json')
+
+sys.path.insert(0, os.path.join(ROOT, 'shared'))
+
+# Régression si au-delà de la tolérance relative ET de l'écart absolu minimal
+TOLERANCE = 0.30
+MIN_DELTA_US = 2.0
+
+# Sous SMALL_CASE_US, le temps par appel est bimodal d'une série à l'autre
+# (create_lambda_response: 4,8 µs au mieux, 8,3 µs en médiane): plus de séries,
+# et comparaison des médianes (tolérance relative seule, sans écart absolu)
+SMALL_CASE_US = 10.0
+SMALL_REPEAT_FACTOR = 3
+
+# Durée minimale d'une série de mesures
+MIN_SERIES_S = 0.2
+
+PROFILE = {
+    'user_id': 'user_marie_123',
+    'name': 'Marie Dupont',
+    'age': 72,
+    'emergency_contacts': [{'name': 'Sophie Dupont', 'relation': 'Fille', 'phone': '+33698765432'}],
+    'medical_conditions': ['Hypertension', 'Diabète type 2'],
+}
+CONTEXT = {'user_profile': PROFILE, 'medications': [], 'appointments': []}
+
+
+def load_agent(folder: str):
+    """Charge lambda/<folder>/agent.py sous un nom unique (chaque agent s'appelle agent.py)"""
+    spec = importlib.util.spec_from_file_location(f"bench_{folder.replace('-', '_')}",
+                                                  os.path.join(ROOT, 'lambda', folder, 'agent.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_medications(count: int):
+    """count médicaments, 1 à 3 prises par jour réparties sur la journée"""
+    return [{
+        'medication_id': f"med_{i}",
+        'name': f"Médicament{i} {100 + i}mg",
+        'dosage': '1 comprimé',
+        'schedules': [{'time': f"{(6 + i + 5 * k) % 24:02d}:{(i * 7) % 60:02d}"} for k in range(1 + i % 3)],
+        'instructions': 'Pendant le repas',
+        'active': True,
+    } for i in range(count)]
+
+
+# ===== CAS =====
+
+def build_cases():
+    """Nom -> fonction sans argument à chronométrer"""
+    import offline
+    offline.enable(latency='0', error_rate=0)
+
+    from langchain_core.messages import HumanMessage
+    from utils import create_lambda_response, parse_request_body
+    from metrics import MetricsRegistry
+
+    orchestrator = load_agent('orchestrator')
+    medication = load_agent('medication-agent')
+    symptom = load_agent('symptom-agent')
+    emergency = load_agent('emergency-agent')
+    for module in (orchestrator, medication, symptom, emergency):
+        module.warm_up()
+
+    cases = {}
+
+    # Invoke complet de chaque graph (agents spécialisés: appel direct, sans handler)
+    cases['graph.orchestrator'] = lambda: orchestrator.orchestrator.invoke({
+        "messages": [HumanMessage(content="Bonjour, comment allez-vous?")], "user_id": "user_marie_123",
+        "intent": "", "context": {}, "next_agent": "", "final_response": "", "response_source": "", "error": ""
+    })
+    cases['graph.medication'] = lambda: medication.medication_agent.invoke({
+        "user_id": "user_marie_123", "message": "Quels sont mes médicaments?", "context": CONTEXT,
+        "medications": [], "action": "", "llm_used": False, "response": "", "error": ""
+    })
+    cases['graph.symptom'] = lambda: symptom.symptom_agent.invoke({
+        "user_id": "user_marie_123", "message": "J'ai mal à la tête depuis ce matin", "context": CONTEXT,
+        "severity": "", "symptoms": [], "side_effects": [], "recommendations": [], "appointments": [],
+        "appointment_note": "", "response": "", "error": ""
+    })
+    # Un utilisateur par appel: sinon chaque appel serait un suivi de la même urgence
+    users = itertools.count()
+    cases['graph.emergency'] = lambda: emergency.emergency_agent.invoke({
+        "user_id": f"bench_user_{next(users)}", "message": "Je suis tombée dans la cuisine",
+        "context": CONTEXT, "idempotency_key": "", "emergency_id": "", "follow_up": False, "retry": False, "repeated": False,
+        "escalated": False, "severity": "", "emergency_type": "", "actions_taken": [],
+        "contacts_notified": [], "guidance": "", "response": "", "error": ""
+    })
+
+    messages = ["Quels sont mes médicaments?", "J'ai pris mon Doliprane ce matin",
+                "Je peux prendre de l'Aspégic avec le Doliprane?", "Quand est ma prochaine prise?"]
+    action_states = [{"message": m, "action": ""} for m in messages]
+    cases['medication.determine_action'] = lambda: [medication.determine_action(s) for s in action_states]
+
+    # Message de suivi sans escalade: gravité par mots-clés uniquement (pas d'appel LLM)
+    severity_state = {"message": "J'ai une douleur à la poitrine et je n'arrive plus à respirer",
+                      "follow_up": True, "severity": "critical", "emergency_type": "other"}
+    cases['emergency.assess_severity'] = lambda: emergency.assess_severity(severity_state)
+
+    for count in (1, 10, 50):
+        dose_state = {"message": "Quand est ma prochaine prise?", "context": CONTEXT,
+                      "medications": make_medications(count), "response": ""}
+        cases[f"medication.check_next_dose[{count}]"] = (lambda s: lambda: medication.check_next_dose(s))(dose_state)
+
+    final_state = {
+        "severity": "high", "context": CONTEXT,
+        "guidance": "1. Restez calme.\n2. Ne bougez pas.\n3. Gardez votre téléphone près de vous.",
+        "actions_taken": ["📱 SMS envoyé à Sophie Dupont", "📝 Urgence enregistrée"], "response": ""
+    }
+    cases['emergency.create_final_response'] = lambda: emergency.create_final_response(final_state)
+
+    # create_response réécrit recommendations: partir d'un état neuf à chaque appel
+    symptom_state = {
+        "severity": "moderate", "context": CONTEXT, "symptoms": ["mal de tête", "fatigue"],
+        "side_effects": ["💊 Possible effet secondaire du Doliprane"],
+        "recommendations": ["🏥 Consultez votre médecin dans les 24-48h", "💧 Buvez de l'eau"],
+        "appointment_note": "📅 Vous avez rendez-vous demain à 10:00", "response": ""
+    }
+    cases['symptom.create_response'] = lambda: symptom.create_response(dict(symptom_state))
+
+    body = {'response': "💊 Voici vos médicaments:\n" + "\n".join(f"• Médicament {i}" for i in range(10)),
+            'intent': 'medication', 'agent_used': 'medication-agent', 'success': True}
+    cases['utils.create_lambda_response'] = lambda: create_lambda_response(200, body)
+
+    api_event = {'body': json.dumps({'user_id': 'user_marie_123', 'message': 'Quels sont mes médicaments?'})}
+    direct_event = {'user_id': 'user_marie_123', 'message': 'Quels sont mes médicaments?', 'context': CONTEXT}
+    cases['utils.parse_request_body[api]'] = lambda: parse_request_body(api_event)
+    cases['utils.parse_request_body[direct]'] = lambda: parse_request_body(direct_event)
+
+    # Registre séparé: les séries des graphs ne faussent pas le rendu
+    registry = MetricsRegistry()
+    requests = registry.counter('bench_requests_total', "Requêtes", ('intent', 'agent', 'status'))
+    latency = registry.histogram('bench_latency_ms', "Latence (ms)", ('intent',))
+    for intent in ('general', 'medication', 'symptom', 'emergency', 'appointment'):
+        requests.inc(intent=intent, agent=f"{intent}-agent", status='ok')
+        latency.observe(120.0, intent=intent)
+    registry.register_stats('bench_cache_total', {'hits': 3, 'misses': 1, 'stores': 1})
+    cases['metrics.counter_inc'] = lambda: requests.inc(intent='medication', agent='medication-agent', status='ok')
+    cases['metrics.histogram_observe'] = lambda: latency.observe(42.0, intent='medication')
+    cases['metrics.render_prometheus'] = registry.render_prometheus
+
+    return cases
+
+
+def reference_workload():
+    """Travail Python fixe (formatage, dict, tri): étalon de la vitesse de la machine"""
+    items = [{'name': f"Médicament{i}", 'minutes': (i * 37) % 1440} for i in range(50)]
+    items.sort(key=lambda item: item['minutes'])
+    return "\n".join(f"{item['name']} dans {item['minutes'] // 60}h{item['minutes'] % 60:02d}" for item in items)
+
+
+def loops_for(timer: timeit.Timer, duration: float) -> int:
+    number = 1
+    while timer.timeit(number) < duration:
+        number *= 2
+    return number
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Temps par appel (µs): meilleur et médiane de repeat séries d'au moins MIN_SERIES_S
+    (SMALL_REPEAT_FACTOR fois plus de séries sous SMALL_CASE_US).
+
+    Chaque série est suivie d'une mesure de l'étalon: "relative" (temps du cas /
+    temps de l'étalon, minimum et médiane) ne dépend pas des variations de vitesse
+    de la machine (fréquence CPU, voisins bruyants) et sert à la comparaison avec
+    la référence.
+    """
+    timer, reference = timeit.Timer(func), timeit.Timer(reference_workload)
+    number = loops_for(timer, MIN_SERIES_S)
+    reference_number = loops_for(reference, MIN_SERIES_S / 4)
+    if timer.timeit(number) / number * 1_000_000 < SMALL_CASE_US:
+        repeat *= SMALL_REPEAT_FACTOR
+
+    per_call, relative = [], []
+    for _ in range(repeat):
+        case_us = timer.timeit(number) / number * 1_000_000
+        reference_us = reference.timeit(reference_number) / reference_number * 1_000_000
+        per_call.append(case_us)
+        relative.append(case_us / reference_us)
+    per_call.sort()
+    relative.sort()
+    return {'best_us': round(per_call[0], 2), 'median_us': round(per_call[len(per_call) // 2], 2),
+            'relative': round(relative[0], 4), 'relative_median': round(relative[len(relative) // 2], 4),
+            'loops': number, 'series': repeat}
+
+
+def benchmark(names, cases, repeat):
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cases': {},
+    }
+    for name in names:
+        # Sorties restantes (print) hors du terminal pendant la mesure
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            result = measure(cases[name], repeat)
+        report['cases'][name] = result
+        print(f"  {name:<38} {result['best_us']:>11.1f} µs   (médiane {result['median_us']:.1f}, "
+              f"x{result['relative']:.2f} étalon, {result['loops']} boucles)")
+    return report
+
+
+def is_small(reference) -> bool:
+    return reference['best_us'] < SMALL_CASE_US
+
+
+def compared_value(result, small: bool) -> float:
+    """Temps relatif à l'étalon comparé: médiane des séries pour les petits cas, minimum sinon"""
+    return result.get('relative_median', result['relative']) if small else result['relative']
+
+
+def compare(report, baseline):
+    """
+    Régressions (cas, valeur, référence): temps relatif à l'étalon au-delà de TOLERANCE,
+    et écart absolu au-delà de MIN_DELTA_US (sauf petits cas, comparés sur la médiane)
+    """
+    regressions = []
+    for name, result in report['cases'].items():
+        reference = baseline.get('cases', {}).get(name)
+        if not reference:
+            continue
+        value, base = result['best_us'], reference['best_us']
+        small = is_small(reference)
+        if compared_value(result, small) <= compared_value(reference, small) * (1 + TOLERANCE):
+            continue
+        if small or value - base > MIN_DELTA_US:
+            regressions.append((name, value, base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des nœuds des graphs")
+    parser.add_argument('--repeat', type=int, default=5, help="séries de mesures par cas")
+    parser.add_argument('--only', default='', help="préfixes de cas séparés par des virgules")
+    parser.add_argument('--output', default='nodes-report.json', help="rapport JSON")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="référence à comparer")
+    parser.add_argument('--update-baseline', action='store_true', help="écrire le rapport comme référence")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    # Journaux des nœuds coupés (LOG_LEVEL=INFO pour inclure leur coût dans la mesure)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        cases = build_cases()
+
+    prefixes = [p.strip() for p in args.only.split(',') if p.strip()]
+    names = [n for n in cases if not prefixes or any(n.startswith(p) for p in prefixes)]
+    if not names:
+        parser.error(f"aucun cas ne correspond à {args.only} (cas: {', '.join(cases)})")
+
+    print(f"⏱️  Micro-benchmarks: {len(names)} cas, meilleur de {args.repeat} séries")
+    report = benchmark(names, cases, args.repeat)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n  Rapport: {args.output}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"  ✅ Référence mise à jour: {os.path.relpath(args.baseline, ROOT)}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("  Pas de référence: relancer avec --update-baseline pour en créer une")
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline)
+    if regressions:
+        # Bruit de la machine: confirmer par une seconde mesure avant d'échouer
+        print(f"\n  {len(regressions)} régression(s) possible(s), nouvelle mesure:")
+        retry = benchmark([name for name, _, _ in regressions], cases, args.repeat)
+        for name, result in retry['cases'].items():
+            small = is_small(baseline['cases'][name])
+            if compared_value(result, small) < compared_value(report['cases'][name], small):
+                report['cases'][name] = result
+        regressions = compare(report, baseline)
+    if not regressions:
+        print(f"  ✅ Aucune régression (tolérance {TOLERANCE:.0%}) par rapport à la référence "
+              f"du {baseline.get('created_at', '?')}")
+        return
+
+    print(f"  ❌ {len(regressions)} régression(s) par rapport à la référence:")
+    for name, value, base in regressions:
+        small = is_small(baseline['cases'][name])
+        ratio = compared_value(report['cases'][name], small) / compared_value(baseline['cases'][name], small) - 1
+        print(f"     {name}: {value:.1f} µs (référence {base:.1f} µs, +{ratio:.0%} relatif à l'étalon)")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage à froid de chaque point d'entrée
+
+Pour chaque handler Lambda (orchestrator, medication, symptom, emergency) et
+chaque serveur local (server_simple, demo_server, mock_api_server), dans un
+processus neuf:
+  - temps d'import du module (et détail -X importtime par paquet),
+  - temps jusqu'à la première réponse (depuis le lancement du processus),
+  - pic de mémoire (RSS).
+
+LLM et stockage sont remplacés par des bouchons hors-ligne (aucun appel réseau),
+mais langchain_anthropic est bien importé au premier appel, comme en production.
+Le rapport JSON est comparé à scripts/baselines/startup.json: toute régression
+au-delà de la tolérance est signalée (code de sortie 1).
+
+Usage:
+  python scripts/benchmark-startup.py [--runs 3] [--only orchestrator,server_simple]
+                                      [--output startup-report.json] [--update-baseline]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_PATH = os.path.join(ROOT, 'scripts', 'baselines', 'startup.json')
+
+# Point d'entrée -> (type, module, dossier ajouté au path, requête)
+ENTRIES = {
+    'orchestrator': ('handler', 'handler', 'lambda/orchestrator',
+                     {'user_id': 'user_marie_123', 'message': 'Bonjour, comment allez-vous?'}),
+    'medication-agent': ('handler', 'handler', 'lambda/medication-agent',
+                         {'user_id': 'user_marie_123', 'message': 'Quels sont mes médicaments?'}),
+    'symptom-agent': ('handler', 'handler', 'lambda/symptom-agent',
+                      {'user_id': 'user_marie_123', 'message': "J'ai mal à la tête depuis ce matin"}),
+    'emergency-agent': ('handler', 'handler', 'lambda/emergency-agent',
+                        {'user_id': 'user_marie_123', 'message': 'Aide! Je suis tombée dans la cuisine'}),
+    'server_simple': ('server', 'server_simple', '',
+                      {'userId': 'user_marie_123', 'message': 'Bonjour'}),
+    'demo_server': ('server', 'demo_server', '',
+                    {'userId': 'user_marie_123', 'message': 'Bonjour'}),
+    'mock_api_server': ('server', 'mock_api_server', '',
+                        {'user_id': 'user_marie_123', 'message': 'Bonjour'}),
+}
+
+# Réponses entièrement simulées: ni LLM ni stockage à remplacer
+SELF_CONTAINED = {'mock_api_server'}
+
+METRICS = ['import_ms', 'first_response_ms', 'rss_mb']
+
+# Régression si au-delà de la tolérance relative ET de l'écart absolu minimal
+TOLERANCE = 0.25
+MIN_DELTA = {'import_ms': 50, 'first_response_ms': 100, 'rss_mb': 5}
+
+OFFLINE_ENV = {
+    'AWS_REGION': 'us-east-1',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'ANTHROPIC_API_KEY': 'benchmark-offline',
+    'ANALYSIS_CACHE_BACKEND': 'sqlite',
+    'OUTBOX_BACKEND': 'sqlite',
+    'DOSE_LOG_BACKEND': 'sqlite',
+    'INTENT_CACHE_BACKEND': 'memory',
+}
+
+USER = {
+    'user_id': 'user_marie_123',
+    'name': 'Marie Dupont',
+    'age': 72,
+    'emergency_contacts': [{'name': 'Sophie Dupont', 'relation': 'Fille', 'phone': '+33698765432'}],
+    'medical_conditions': ['Hypertension', 'Diabète type 2'],
+}
+MEDICATIONS = [
+    {'medication_id': 'med_1', 'user_id': 'user_marie_123', 'name': 'Aspégic 100mg', 'dosage': '1 sachet',
+     'schedules': [{'time': '08:00'}], 'active': True},
+    {'medication_id': 'med_2', 'user_id': 'user_marie_123', 'name': 'Doliprane 500mg', 'dosage': '1 comprimé',
+     'schedules': [{'time': '12:00'}, {'time': '20:00'}], 'active': True},
+]
+
+
+# ===== PROCESSUS ENFANT =====
+
+def install_stubs():
+    """Bouchons hors-ligne: LLM (au niveau de la classe), DynamoDB, SNS et Lambda"""
+    import database
+    import utils
+
+    database.DynamoDBHelper.get_user = lambda self, user_id: dict(USER, user_id=user_id)
+    database.DynamoDBHelper.get_user_medications = lambda self, user_id, active_only=True: list(MEDICATIONS)
+    database.DynamoDBHelper.get_user_appointments = lambda self, user_id, limit=10: []
+    database.DynamoDBHelper.get_user_emergencies = lambda self, user_id, limit=10: []
+    database.DynamoDBHelper.save_conversation = lambda self, data: True
+    utils.SNSHelper.send_sms = lambda self, phone, message: True
+    utils.LambdaHelper.invoke_agent = lambda self, name, payload: {
+        'statusCode': 200, 'body': json.dumps({'response': f"Réponse de {name}", 'success': True})
+    }
+
+    # Import réel (coût payé en production au premier appel LLM), réseau remplacé
+    from langchain_anthropic import ChatAnthropic
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    def generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(
+            message=AIMessage(content="general\nBonjour Marie, je suis là pour vous aider.")
+        )])
+
+    ChatAnthropic._generate = generate
+
+
+def first_request(kind, module, request):
+    """Première requête: appel direct du handler, ou POST /chat sur le serveur"""
+    if kind == 'handler':
+        result = module.lambda_handler({'body': request}, None)
+        return result.get('statusCode') == 200
+
+    import threading
+    import urllib.request
+
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        port = s.getsockname()[1]
+    threading.Thread(target=module.run_server, args=(port,), daemon=True).start()
+
+    data = json.dumps(request).encode('utf-8')
+    for _ in range(200):
+        try:
+            req = urllib.request.Request(f'http://localhost:{port}/chat', data=data,
+                                         headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status == 200
+        except ConnectionError:
+            time.sleep(0.01)
+        except OSError as e:
+            if 'refused' not in str(e):
+                raise
+            time.sleep(0.01)
+    return False
+
+
+def run_child(name, result_path):
+    """Mesure dans ce processus (lancé à neuf par le parent)"""
+    import importlib
+    import resource
+
+    kind, module_name, path, request = ENTRIES[name]
+    spawned_at = float(os.environ['BENCH_SPAWNED_AT'])
+    os.chdir(ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'shared'))
+    if path:
+        sys.path.insert(0, os.path.join(ROOT, path))
+    sys.path.insert(0, ROOT)
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_ms = (time.perf_counter() - start) * 1000
+
+    if name not in SELF_CONTAINED:
+        install_stubs()
+    ok = first_request(kind, module, request)
+    first_response_ms = (time.time() - spawned_at) * 1000
+
+    with open(result_path, 'w') as f:
+        json.dump({
+            'ok': ok,
+            'import_ms': round(import_ms, 1),
+            'first_response_ms': round(first_response_ms, 1),
+            'rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }, f)
+
+
+# ===== PROCESSUS PARENT =====
+
+def child_env():
+    env = dict(os.environ)
+    env.update(OFFLINE_ENV)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def measure(name):
+    """Un processus neuf: import, première réponse, RSS"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_path = f.name
+    env = child_env()
+    env['BENCH_SPAWNED_AT'] = repr(time.time())
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name, '--result', result_path],
+            env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=300
+        )
+        with open(result_path) as f:
+            content = f.read()
+        if completed.returncode != 0 or not content:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip()
+                               else f"code {completed.returncode}")
+        return json.loads(content)
+    finally:
+        os.unlink(result_path)
+
+
+def import_breakdown(name, top=10):
+    """-X importtime: temps propre cumulé par paquet racine (ms)"""
+    kind, module_name, path, _ = ENTRIES[name]
+    paths = [ROOT, os.path.join(ROOT, 'shared')] + ([os.path.join(ROOT, path)] if path else [])
+    code = f"import sys; sys.path[:0] = {paths!r}; import {module_name}"
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=child_env(), cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=300)
+
+    by_package = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, package = line[len('import time:'):].split('|')
+        by_package[package.strip().split('.')[0]] += int(self_us) / 1000
+
+    ranked = sorted(by_package.items(), key=lambda item: -item[1])
+    return {
+        'total_ms': round(sum(by_package.values()), 1),
+        'packages': [{'package': p, 'self_ms': round(ms, 1)} for p, ms in ranked[:top]],
+    }
+
+
+def benchmark(names, runs):
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': runs,
+        'entries': {},
+    }
+    for name in names:
+        samples, error = [], None
+        for _ in range(runs):
+            try:
+                samples.append(measure(name))
+            except Exception as e:
+                error = str(e)
+                break
+
+        entry = {'kind': ENTRIES[name][0]}
+        if samples:
+            entry.update({m: round(statistics.median(s[m] for s in samples), 1) for m in METRICS})
+            entry['ok'] = all(s['ok'] for s in samples)
+        if error:
+            entry['error'] = error
+        entry['importtime'] = import_breakdown(name)
+        report['entries'][name] = entry
+
+        if error:
+            print(f"  ❌ {name:<17} {error}")
+        else:
+            top = ', '.join(f"{p['package']} {p['self_ms']:.0f}" for p in entry['importtime']['packages'][:3])
+            print(f"  {'✅' if entry['ok'] else '⚠️'} {name:<17} import {entry['import_ms']:>7.0f} ms | "
+                  f"1re réponse {entry['first_response_ms']:>7.0f} ms | RSS {entry['rss_mb']:>5.0f} Mo | {top}")
+    return report
+
+
+def compare(report, baseline):
+    """Régressions (métrique, valeur, référence) par point d'entrée"""
+    regressions = []
+    for name, entry in report['entries'].items():
+        reference = baseline.get('entries', {}).get(name)
+        if not reference:
+            continue
+        if entry.get('error') or not entry.get('ok', True):
+            regressions.append((name, 'ok', False, True))
+            continue
+        for metric in METRICS:
+            value, base = entry.get(metric), reference.get(metric)
+            if value is None or base is None:
+                continue
+            if value > base * (1 + TOLERANCE) and value - base > MIN_DELTA[metric]:
+                regressions.append((name, metric, value, base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage à froid")
+    parser.add_argument('--runs', type=int, default=3, help="processus neufs par point d'entrée (médiane)")
+    parser.add_argument('--only', default='', help="points d'entrée séparés par des virgules")
+    parser.add_argument('--output', default='startup-report.json', help="rapport JSON")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="référence à comparer")
+    parser.add_argument('--update-baseline', action='store_true', help="écrire le rapport comme référence")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.result)
+        return
+
+    names = [n.strip() for n in args.only.split(',') if n.strip()] or list(ENTRIES)
+    unknown = [n for n in names if n not in ENTRIES]
+    if unknown:
+        parser.error(f"points d'entrée inconnus: {', '.join(unknown)} (choix: {', '.join(ENTRIES)})")
+
+    print(f"🚀 Démarrage à froid: {len(names)} point(s) d'entrée, {args.runs} processus chacun")
+    report = benchmark(names, args.runs)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n  Rapport: {args.output}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"  ✅ Référence mise à jour: {os.path.relpath(args.baseline, ROOT)}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("  Pas de référence: relancer avec --update-baseline pour en créer une")
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline)
+    if not regressions:
+        print(f"  ✅ Aucune régression (tolérance {TOLERANCE:.0%}) par rapport à la référence "
+              f"du {baseline.get('created_at', '?')}")
+        return
+
+    print(f"  ❌ {len(regressions)} régression(s) par rapport à la référence:")
+    for name, metric, value, base in regressions:
+        if metric == 'ok':
+            print(f"     {name}: échec de la première requête")
+        else:
+            print(f"     {name}: {metric} {value} (référence {base}, +{(value / base - 1):.0%})")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Test de charge de bout en bout (latences p50/p95/p99)
+
+Rejoue un corpus pondéré de messages en français (toutes les intentions)
+contre une cible:
+  - inprocess:       graph de l'orchestrator dans ce processus (mode hors-ligne,
+                     agents spécialisés appelés localement, latence par nœud),
+  - server_simple:   serveur HTTP local (python server_simple.py),
+  - mock_api:        serveur mock (python mock_api_server.py).
+
+Arrivées en boucle ouverte: les requêtes partent à --rps (Poisson) quelle que
+soit la vitesse de réponse, au plus --concurrency en parallèle. La latence est
+mesurée depuis l'instant d'arrivée prévu: l'attente d'un slot libre compte,
+comme pour un vrai utilisateur.
+
+Le rapport JSON (débit, taux d'erreur, percentiles par intention et par nœud)
+peut être comparé à un run précédent avec --compare.
+
+Usage:
+  python scripts/load-test.py [--target inprocess] [--rps 5] [--duration 30]
+                              [--concurrency 8] [--llm-latency lognormal:400:0.4]
+                              [--output load-report.json] [--compare ancien.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Intention attendue -> (poids, messages)
+CORPUS = {
+    'medication': (30, [
+        "Quels sont mes médicaments?",
+        "À quelle heure je dois prendre mon Doliprane?",
+        "J'ai pris mon Aspégic ce matin",
+        "Est-ce que je peux prendre du Doliprane avec mon Aspégic?",
+        "Pourquoi je prends du Glucophage?",
+    ]),
+    'symptom': (25, [
+        "J'ai mal à la tête depuis ce matin",
+        "Je me sens très fatiguée et j'ai de la fièvre",
+        "J'ai des vertiges quand je me lève",
+        "Je tousse beaucoup depuis deux jours",
+        "J'ai mal au dos",
+    ]),
+    'appointment': (15, [
+        "Quand est mon prochain rendez-vous?",
+        "J'ai rendez-vous chez le médecin quand?",
+        "C'est quand le cardiologue?",
+    ]),
+    'general': (25, [
+        "Bonjour!",
+        "Merci beaucoup",
+        "Bonne journée",
+        "Comment ça va aujourd'hui?",
+    ]),
+    'emergency': (5, [
+        "Aide! Je suis tombée dans la cuisine",
+        "J'ai une douleur intense à la poitrine",
+    ]),
+}
+
+USERS = ['user_marie_123', 'user_jean_456']
+
+DEFAULT_URLS = {
+    'server_simple': 'http://localhost:3000/chat',
+    'mock_api': 'http://localhost:8080/chat',
+}
+
+
+def percentile(values, pct: float) -> float:
+    """Percentile par rang le plus proche (valeurs triées)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def summarize(latencies, errors: int = 0) -> dict:
+    values = sorted(latencies)
+    count = len(values) + errors
+    return {
+        'count': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'mean_ms': round(sum(values) / len(values), 1) if values else 0.0,
+        'p50_ms': round(percentile(values, 50), 1),
+        'p95_ms': round(percentile(values, 95), 1),
+        'p99_ms': round(percentile(values, 99), 1),
+        'max_ms': round(values[-1], 1) if values else 0.0,
+    }
+
+
+def build_workload(count: int, rng: random.Random):
+    """Requêtes tirées selon les poids du corpus: (intention, utilisateur, message)"""
+    intents = list(CORPUS)
+    weights = [CORPUS[intent][0] for intent in intents]
+    workload = []
+    for _ in range(count):
+        intent = rng.choices(intents, weights)[0]
+        workload.append((intent, rng.choice(USERS), rng.choice(CORPUS[intent][1])))
+    return workload
+
+
+# ===== CIBLES =====
+
+class InProcessTarget:
+    """Graph de l'orchestrator exécuté dans ce processus, avec durée de chaque nœud"""
+
+    name = 'inprocess'
+
+    def __init__(self, real_llm: bool = False, llm_latency: str = None, seed: int = None):
+        sys.path.insert(0, os.path.join(ROOT, 'shared'))
+        sys.path.insert(0, os.path.join(ROOT, 'lambda', 'orchestrator'))
+        os.chdir(ROOT)
+
+        import offline
+        self.config = offline.enable(fake_llm=not real_llm, latency=llm_latency, seed=seed)
+
+        from langchain_core.messages import HumanMessage
+        from agent import orchestrator, warm_up
+        self._message_class = HumanMessage
+        self._graph = orchestrator
+        warm_up()
+
+    def send(self, user_id: str, message: str) -> dict:
+        state = {
+            "messages": [self._message_class(content=message)],
+            "user_id": user_id,
+            "intent": "",
+            "context": {},
+            "next_agent": "",
+            "final_response": "",
+            "response_source": "",
+            "error": ""
+        }
+        # Graph séquentiel: chaque mise à jour arrive à la fin de son nœud
+        nodes = []
+        last = time.perf_counter()
+        for update in self._graph.stream(state, stream_mode='updates'):
+            now = time.perf_counter()
+            for node, values in update.items():
+                nodes.append((node, (now - last) * 1000))
+                state.update(values or {})
+            last = now
+        return {'ok': bool(state.get('final_response')), 'intent': state.get('intent', ''), 'nodes': nodes}
+
+
+class HttpTarget:
+    """Serveur local déjà démarré (POST /chat)"""
+
+    def __init__(self, name: str, url: str, timeout: float):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.config = {'url': url}
+
+    def send(self, user_id: str, message: str) -> dict:
+        # server_simple lit userId, mock_api_server user_id
+        payload = json.dumps({'user_id': user_id, 'userId': user_id, 'message': message}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return {'ok': False, 'intent': '', 'nodes': [], 'error': f"HTTP {e.code}"}
+        return {'ok': body.get('success', True) is not False, 'intent': body.get('intent', ''), 'nodes': []}
+
+
+# ===== GÉNÉRATEUR =====
+
+class LoadRun:
+    """Arrivées en boucle ouverte et collecte des mesures"""
+
+    def __init__(self, target, rps: float, concurrency: int, seed: int):
+        self.target = target
+        self.rps = rps
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.by_intent = defaultdict(list)
+        self.errors_by_intent = defaultdict(int)
+        self.by_node = defaultdict(list)
+        self.misrouted = 0
+        self.error_samples = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _execute(self, scheduled: float, intent: str, user_id: str, message: str, record: bool) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            result = self.target.send(user_id, message)
+        except Exception as e:
+            result = {'ok': False, 'intent': '', 'nodes': [], 'error': f"{type(e).__name__}: {e}"}
+        latency_ms = (time.perf_counter() - scheduled) * 1000
+
+        with self._lock:
+            self.in_flight -= 1
+            if not record:
+                return
+            if result['ok']:
+                self.by_intent[intent].append(latency_ms)
+                if result['intent'] and result['intent'] != intent:
+                    self.misrouted += 1
+            else:
+                self.errors_by_intent[intent] += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(result.get('error', 'réponse vide'))
+            for node, duration_ms in result['nodes']:
+                self.by_node[node].append(duration_ms)
+
+    def run(self, workload, warmup: int = 0) -> float:
+        """Envoie la charge, retourne la durée de la phase mesurée (s)"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Préchauffage hors mesure (caches, imports différés)
+            list(pool.map(lambda item: self._execute(time.perf_counter(), *item, record=False),
+                          workload[:warmup]))
+
+            start = time.perf_counter()
+            next_arrival = start
+            futures = []
+            for item in workload[warmup:]:
+                next_arrival += self.rng.expovariate(self.rps)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._execute, next_arrival, *item, record=True))
+            for future in futures:
+                future.result()
+            return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        intents = {intent: summarize(self.by_intent[intent], self.errors_by_intent[intent])
+                   for intent in CORPUS if intent in self.by_intent or intent in self.errors_by_intent}
+        overall = summarize([v for values in self.by_intent.values() for v in values],
+                            sum(self.errors_by_intent.values()))
+        overall['throughput_rps'] = round((overall['count'] - overall['errors']) / elapsed, 2) if elapsed else 0.0
+        overall['duration_s'] = round(elapsed, 2)
+        overall['misrouted'] = self.misrouted
+        overall['max_in_flight'] = self.max_in_flight
+        return {
+            'summary': overall,
+            'intents': intents,
+            'nodes': {node: summarize(values) for node, values in sorted(self.by_node.items())},
+            'error_samples': self.error_samples,
+        }
+
+
+# ===== RAPPORT =====
+
+def print_table(title: str, rows: dict) -> None:
+    print(f"  {title:<22} {'n':>6} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in rows.items():
+        print(f"  {name:<22} {stats['count']:>6} {stats['error_rate'] * 100:>5.1f}% "
+              f"{stats['p50_ms']:>7.0f}ms {stats['p95_ms']:>7.0f}ms {stats['p99_ms']:>7.0f}ms")
+
+
+def print_report(report: dict) -> None:
+    summary = report['summary']
+    print(f"📊 {summary['count']} requêtes en {summary['duration_s']} s: "
+          f"{summary['throughput_rps']} req/s, {summary['error_rate'] * 100:.1f}% d'erreurs, "
+          f"{summary['max_in_flight']} en parallèle au maximum")
+    if summary['misrouted']:
+        print(f"   ⚠️ {summary['misrouted']} réponse(s) avec une autre intention que celle attendue")
+    print()
+    print_table('Intention', {**report['intents'], 'TOTAL': summary})
+    if report['nodes']:
+        print()
+        print_table('Nœud', report['nodes'])
+    if report['error_samples']:
+        print()
+        print("  Exemples d'erreurs:")
+        for error in report['error_samples'][:5]:
+            print(f"    - {error}")
+
+
+def print_comparison(report: dict, previous: dict) -> None:
+    print()
+    print(f"🔁 Comparaison avec {previous['config'].get('started_at', 'le run précédent')}:")
+    for name in ['TOTAL'] + list(report['intents']):
+        current = report['summary'] if name == 'TOTAL' else report['intents'][name]
+        before = previous['summary'] if name == 'TOTAL' else previous['intents'].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ['p50_ms', 'p95_ms', 'p99_ms']:
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            deltas.append(f"{key[:3]} {before[key]:.0f}→{current[key]:.0f}ms ({change:+.0f}%)")
+        print(f"  {name:<12} " + '  '.join(deltas))
+    if 'throughput_rps' in previous['summary']:
+        print(f"  Débit: {previous['summary']['throughput_rps']} → {report['summary']['throughput_rps']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de bout en bout")
+    parser.add_argument('--target', choices=['inprocess', 'server_simple', 'mock_api'], default='inprocess')
+    parser.add_argument('--url', help="URL de /chat (cibles HTTP)")
+    parser.add_argument('--rps', type=float, default=5.0, help="débit d'arrivée visé (req/s)")
+    parser.add_argument('--duration', type=float, default=30.0, help="durée de la phase mesurée (s)")
+    parser.add_argument('--requests', type=int, help="nombre de requêtes (remplace --duration)")
+    parser.add_argument('--concurrency', type=int, default=8, help="requêtes simultanées au maximum")
+    parser.add_argument('--warmup', type=int, default=5, help="requêtes de préchauffage non mesurées")
+    parser.add_argument('--timeout', type=float, default=30.0, help="timeout HTTP (s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--real-llm', action='store_true', help="inprocess: vrai Claude au lieu du faux modèle")
+    parser.add_argument('--llm-latency', help="inprocess: latence du faux modèle (ex: lognormal:400:0.4)")
+    parser.add_argument('--verbose', action='store_true', help="garder les logs des agents")
+    parser.add_argument('--output', default='load-report.json', help="rapport JSON")
+    parser.add_argument('--compare', help="rapport JSON d'un run précédent")
+    args = parser.parse_args()
+
+    count = args.requests or max(1, int(args.rps * args.duration))
+    workload = build_workload(args.warmup + count, random.Random(args.seed))
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    if not args.verbose:
+        # Journaux des agents (thread d'écriture, hors redirect_stdout): avertissements seulement
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    print(f"🚀 Cible {args.target}: {count} requêtes à {args.rps} req/s, concurrence {args.concurrency}")
+    with quiet:
+        if args.target == 'inprocess':
+            target = InProcessTarget(args.real_llm, args.llm_latency, args.seed)
+        else:
+            target = HttpTarget(args.target, args.url or DEFAULT_URLS[args.target], args.timeout)
+
+        load = LoadRun(target, args.rps, args.concurrency, args.seed)
+        started_at = datetime.now().isoformat(timespec='seconds')
+        elapsed = load.run(workload, args.warmup)
+
+    report = {
+        'config': {
+            'target': args.target,
+            'rps': args.rps,
+            'requests': count,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'started_at': started_at,
+            'environment': target.config,
+        },
+        **load.report(elapsed)
+    }
+    print()
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print()
+    print(f"💾 Rapport: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Entraînement du classifieur d'intention local
+
+Découpe le corpus (shared/data/intent_corpus.tsv) en entraînement /
+validation / test, rapporte précision, calibration, couverture au seuil et
+latence, puis réentraîne sur tout le corpus et écrit
+shared/data/intent_model.npz.
+
+Avec --llm, compare au classifieur LLM actuel de l'orchestrator sur le même
+jeu de test (nécessite ANTHROPIC_API_KEY).
+
+Usage: python scripts/train-intent-classifier.py [--llm] [--no-save]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'shared'))
+
+from intent_classifier import (
+    IntentClassifier, MODEL_PATH, THRESHOLD, read_corpus, train, fit_temperature, save
+)
+
+
+SEED = 42
+
+
+def stratified_split(texts, labels, fractions):
+    """Découpe chaque intention selon les fractions données (mêmes proportions partout)"""
+    rng = random.Random(SEED)
+    by_label = defaultdict(list)
+    for text, label in zip(texts, labels):
+        by_label[label].append(text)
+
+    parts = [([], []) for _ in fractions]
+    for label, items in sorted(by_label.items()):
+        rng.shuffle(items)
+        start = 0
+        for i, fraction in enumerate(fractions):
+            end = len(items) if i == len(fractions) - 1 else start + round(len(items) * fraction)
+            parts[i][0].extend(items[start:end])
+            parts[i][1].extend([label] * (end - start))
+            start = end
+    return parts
+
+
+def calibration_error(confidences, correct, bins=10):
+    """Erreur de calibration attendue (ECE)"""
+    confidences, correct = np.array(confidences), np.array(correct, dtype=float)
+    ece = 0.0
+    for low in np.linspace(0, 1, bins, endpoint=False):
+        mask = (confidences > low) & (confidences <= low + 1 / bins)
+        if mask.any():
+            ece += mask.mean() * abs(confidences[mask].mean() - correct[mask].mean())
+    return ece
+
+
+def evaluate_local(classifier, texts, labels):
+    predictions, timings = [], []
+    for text in texts:
+        start = time.perf_counter()
+        predictions.append(classifier.classify(text))
+        timings.append((time.perf_counter() - start) * 1_000_000)
+
+    correct = [p[0] == label for p, label in zip(predictions, labels)]
+    covered = [(p[0] == label) for p, label in zip(predictions, labels) if p[2]]
+
+    print(f"  Précision (test): {np.mean(correct):.1%} sur {len(labels)} messages")
+    print(f"  ECE (calibration): {calibration_error([p[1] for p in predictions], correct):.3f}")
+    print(f"  Seuil {THRESHOLD}: {len(covered) / len(labels):.0%} traités localement, "
+          f"précision {np.mean(covered) if covered else 0:.1%} sur ceux-ci")
+    print(f"  Latence: {np.mean(timings):.0f} µs en moyenne, p95 {np.percentile(timings, 95):.0f} µs")
+
+    # Sécurité: urgences tranchées localement comme autre chose
+    missed = [t for t, label, p in zip(texts, labels, predictions)
+              if label == 'emergency' and p[2] and p[0] != 'emergency']
+    print(f"  Urgences écartées localement sans LLM: {len(missed)}")
+    for text in missed:
+        print(f"    ⚠️ {text}")
+
+    errors = [(t, label, p[0], p[1]) for t, label, p in zip(texts, labels, predictions) if p[0] != label]
+    for text, label, predicted, confidence in errors[:10]:
+        print(f"    ✗ {text[:40]:<40} {label} → {predicted} (p={confidence:.2f})")
+
+
+def evaluate_llm(texts, labels):
+    """Classifieur LLM de l'orchestrator (mode classique) sur le même jeu"""
+    os.environ.setdefault('INTENT_CACHE_BACKEND', 'memory')
+    sys.path.insert(0, os.path.join(ROOT, 'lambda', 'orchestrator'))
+    from agent import classify_with_llm, VALID_INTENTS
+
+    correct, timings = [], []
+    for text, label in zip(texts, labels):
+        start = time.perf_counter()
+        try:
+            intent, _ = classify_with_llm(text)
+        except Exception as e:
+            print(f"    Erreur LLM: {e}")
+            intent = 'general'
+        timings.append((time.perf_counter() - start) * 1000)
+        correct.append((intent if intent in VALID_INTENTS else 'general') == label)
+
+    print(f"  Précision LLM (test): {np.mean(correct):.1%}")
+    print(f"  Latence LLM: {np.mean(timings):.0f} ms en moyenne, p95 {np.percentile(timings, 95):.0f} ms")
+
+
+def main():
+    texts, labels = read_corpus()
+    print(f"📊 Classifieur d'intention: {len(texts)} messages, {len(set(labels))} intentions")
+    print()
+
+    (train_x, train_y), (val_x, val_y), (test_x, test_y) = stratified_split(texts, labels, [0.65, 0.15, 0.2])
+
+    start = time.perf_counter()
+    model = train(train_x, train_y)
+    model['temperature'] = fit_temperature(model, val_x, val_y)
+    print(f"  Entraînement: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"température {model['temperature']:.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.npz')
+        save(model, path)
+        start = time.perf_counter()
+        classifier = IntentClassifier(path).load()
+        print(f"  Chargement: {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({os.path.getsize(path) / 1024:.0f} Ko)")
+        evaluate_local(classifier, test_x, test_y)
+
+    if '--llm' in sys.argv:
+        print()
+        evaluate_llm(test_x, test_y)
+
+    if '--no-save' not in sys.argv:
+        final = train(texts, labels)
+        final['temperature'] = model['temperature']
+        save(final, MODEL_PATH)
+        print()
+        print(f"  ✅ Modèle écrit: {os.path.relpath(MODEL_PATH, ROOT)} "
+              f"({os.path.getsize(MODEL_PATH) / 1024:.0f} Ko)")
+
+
+if __name__ == '__main__':
+    main()
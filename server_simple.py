@@ -7,6 +7,7 @@ from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
 import sys
 import os
+import time
 from dotenv import load_dotenv
 
 # Charger .env
@@ -16,47 +17,26 @@ load_dotenv()
 sys.path.insert(0, 'shared')
 sys.path.insert(0, 'lambda/orchestrator')
 
-# Mock AWS avant imports
-os.environ['AWS_REGION'] = 'us-east-1'
-import unittest.mock as mock
-mock_dynamodb = mock.MagicMock()
-with mock.patch('boto3.resource', return_value=mock_dynamodb):
-    import database
-
-# Mock Database
-class MockDB:
-    def get_user(self, user_id):
-        return {
-            'user_id': user_id,
-            'name': 'Muhammad Ehab',
-            'age': 25,
-            'phone': '+33123456789',
-            'medical_conditions': [],
-            'emergency_contacts': ['+33987654321']
-        }
-
-    def get_user_medications(self, user_id, active_only=True):
-        return []
-
-    def get_user_appointments(self, user_id, limit=10):
-        return []
-
-    def save_conversation(self, data):
-        return True
-
-class MockLambda:
-    def invoke_agent(self, name, payload):
-        return {'body': '{"response": "Mock agent response"}'}
-
-# Appliquer mocks
+# Fournisseurs hors-ligne: base en mémoire (données de test), SMS journalisés,
+# agents spécialisés exécutés dans ce processus. LLM_PROVIDER=fake: sans Claude.
+import offline
+offline.enable(fake_llm=False)
+
 import database
-import utils
-database.db = MockDB()
-utils.lambda_helper = MockLambda()
+database.db.create_user({
+    'user_id': 'user_muhammad_ehab',
+    'name': 'Muhammad Ehab',
+    'age': 25,
+    'phone': '+33123456789',
+    'medical_conditions': [],
+    'emergency_contacts': [{'name': 'Contact', 'relation': 'Famille', 'phone': '+33987654321'}]
+})
 
 # Importer orchestrator
 from agent import orchestrator
 from langchain_core.messages import HumanMessage
+from profiling import profiler, new_correlation_id
+from metrics import metrics, REQUESTS, REQUEST_LATENCY, PROMETHEUS_CONTENT_TYPE
 
 class APIHandler(BaseHTTPRequestHandler):
     def log_message(self, format, *args):
@@ -67,9 +47,20 @@ class APIHandler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Profile, X-Correlation-Id')
         self.end_headers()
 
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
     def do_POST(self):
         if self.path == '/chat':
             content_length = int(self.headers['Content-Length'])
@@ -79,26 +70,38 @@ class APIHandler(BaseHTTPRequestHandler):
             user_message = data.get('message', '')
             user_id = data.get('userId', 'user_test')
 
+            # X-Profile: 1 -> profiler cette requête (fichier tagué par l'identifiant de corrélation)
+            correlation_id = self.headers.get('X-Correlation-Id') or new_correlation_id()
+            force_profile = self.headers.get('X-Profile', '').lower() in ('1', 'true', 'yes')
+
             print(f"\nUser: {user_message}")
 
             # Appeler orchestrator
+            start = time.perf_counter()
             try:
                 initial_state = {
                     "messages": [HumanMessage(content=user_message)],
                     "user_id": user_id,
+                    "correlation_id": correlation_id,
                     "intent": "",
                     "context": {},
                     "next_agent": "",
                     "final_response": "",
+                    "response_source": "",
                     "error": ""
                 }
 
-                result = orchestrator.invoke(initial_state)
+                result = profiler.run('orchestrator', correlation_id, orchestrator.invoke, initial_state,
+                                      force=force_profile)
+                REQUESTS.inc(intent=result['intent'], agent=result['next_agent'],
+                             status='error' if result.get('error') else 'ok')
+                REQUEST_LATENCY.observe((time.perf_counter() - start) * 1000, intent=result['intent'])
 
                 response_data = {
                     'response': result['final_response'],
                     'intent': result['intent'],
                     'agent': result['next_agent'],
+                    'correlation_id': correlation_id,
                     'success': True
                 }
 
@@ -108,6 +111,7 @@ class APIHandler(BaseHTTPRequestHandler):
 
             except Exception as e:
                 print(f"Erreur: {str(e)}")
+                REQUESTS.inc(intent='unknown', agent='', status='exception')
                 response_data = {
                     'response': f"Erreur: {str(e)}",
                     'success': False
@@ -117,6 +121,7 @@ class APIHandler(BaseHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('X-Correlation-Id', correlation_id)
             self.end_headers()
             self.wfile.write(json.dumps(response_data).encode('utf-8'))
 
@@ -131,6 +136,7 @@ def run_server(port=3000):
     print("="*70)
     print(f"\nServeur demarre sur: http://localhost:{port}")
     print(f"Endpoint: POST http://localhost:{port}/chat")
+    print(f"Métriques: GET http://localhost:{port}/metrics")
     print("\nPour tester le frontend:")
     print(f"  1. Ouvrir: frontend/index.html")
     print(f"  2. Configurer URL API: http://localhost:{port}")
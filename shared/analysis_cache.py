@@ -0,0 +1,185 @@
+"""
+Cache partagé des analyses LLM par ensemble de médicaments
+
+Les analyses d'interactions et d'effets secondaires ne dépendent que de
+l'ensemble des médicaments (et des symptômes). La clé est un hash du
+contenu canonicalisé: un LRU local devant un store persistant partagé
+entre utilisateurs et conteneurs.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from interactions import fold, interaction_index
+from metrics import metrics, Instrumented, DB_LATENCY, DB_ERRORS
+from logger import get_logger
+
+log = get_logger('cache')
+
+
+# Version des prompts: à incrémenter quand un prompt d'analyse change
+PROMPT_VERSION = '2'
+
+TTL_SECONDS = int(os.environ.get('ANALYSIS_CACHE_TTL', str(7 * 24 * 3600)))
+LOCAL_SIZE = int(os.environ.get('ANALYSIS_CACHE_LOCAL_SIZE', '512'))
+
+
+def knowledge_version() -> str:
+    """Version de la connaissance: prompts + base d'interactions"""
+    try:
+        interaction_index.load()
+        data_version = interaction_index.version
+    except Exception:
+        data_version = 'none'
+    return os.environ.get('KNOWLEDGE_VERSION', f"{PROMPT_VERSION}-{data_version}")
+
+
+def canonical_set(items: Iterable[str]) -> Tuple[str, ...]:
+    """Ensemble trié de termes normalisés (casse, accents, espaces)"""
+    return tuple(sorted({fold(item) for item in items if item and item.strip()}))
+
+
+class SQLiteCacheStore:
+    """Store local (fichier SQLite) pour les tests hors-ligne"""
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS analysis_cache '
+            '(cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at INTEGER NOT NULL)'
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM analysis_cache WHERE cache_key = ? AND expires_at > ?',
+                (key, int(time.time()))
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, expires_at: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO analysis_cache (cache_key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at)
+            )
+
+
+class DynamoDBCacheStore:
+    """Store partagé DynamoDB (expiration via l'attribut TTL expires_at)"""
+
+    def __init__(self, db_helper):
+        self.db = db_helper
+
+    def get(self, key: str) -> Optional[str]:
+        table = self.db.get_table('SmartDoc_AnalysisCache')
+        item = table.get_item(Key={'cache_key': key}).get('Item')
+        # Le TTL DynamoDB supprime avec retard: on revérifie l'expiration
+        if item and int(item.get('expires_at', 0)) > time.time():
+            return item['value']
+        return None
+
+    def put(self, key: str, value: str, expires_at: int) -> None:
+        table = self.db.get_table('SmartDoc_AnalysisCache')
+        table.put_item(Item={'cache_key': key, 'value': value, 'expires_at': expires_at})
+
+
+class AnalysisCache:
+    """LRU local + store persistant, adressé par contenu"""
+
+    def __init__(self, store, local_size: int = LOCAL_SIZE, ttl_seconds: int = TTL_SECONDS):
+        self.store = store
+        self.local_size = local_size
+        self.ttl_seconds = ttl_seconds
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'store_hits': 0, 'misses': 0}
+
+    def key(self, kind: str, medications: Iterable[str], symptoms: Iterable[str] = ()) -> str:
+        """Clé de contenu: type d'analyse, version, médicaments et symptômes canoniques"""
+        payload = json.dumps(
+            [kind, knowledge_version(), canonical_set(medications), canonical_set(symptoms)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[1] > now:
+                self._local.move_to_end(key)
+                self.stats['local_hits'] += 1
+                return entry[0]
+
+        try:
+            value = self.store.get(key)
+        except (BotoCoreError, ClientError, sqlite3.Error) as e:
+            log.warning("Erreur lecture store", error=str(e))
+            value = None
+
+        if value is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['store_hits'] += 1
+        self._remember(key, value, int(now) + self.ttl_seconds)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        expires_at = int(time.time()) + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        try:
+            self.store.put(key, value, expires_at)
+        except (BotoCoreError, ClientError, sqlite3.Error) as e:
+            log.warning("Erreur écriture store", error=str(e))
+
+    def _remember(self, key: str, value: str, expires_at: int) -> None:
+        with self._lock:
+            self._local[key] = (value, expires_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get_or_compute(self, kind: str, medications: Iterable[str], symptoms: Iterable[str],
+                       compute: Callable[[], str]) -> Tuple[str, bool]:
+        """Retourne (analyse, depuis le cache?). Les erreurs de compute ne sont pas mises en cache"""
+        key = self.key(kind, medications, symptoms)
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def hit_ratio(self) -> float:
+        hits = self.stats['local_hits'] + self.stats['store_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+
+def create_analysis_cache() -> AnalysisCache:
+    """Construit le cache selon ANALYSIS_CACHE_BACKEND (dynamodb | sqlite)"""
+    from database import db, default_store_backend
+    backend = os.environ.get('ANALYSIS_CACHE_BACKEND', default_store_backend())
+    if backend == 'sqlite':
+        store = SQLiteCacheStore(os.environ.get('ANALYSIS_CACHE_PATH', ':memory:'))
+    else:
+        store = DynamoDBCacheStore(db)
+
+    return AnalysisCache(Instrumented(store, DB_LATENCY, DB_ERRORS, prefix='analysis_cache.'))
+
+
+# Instance globale
+analysis_cache = create_analysis_cache()
+metrics.register_stats('smartdoc_analysis_cache_total', lambda: analysis_cache.stats, "Cache des analyses")
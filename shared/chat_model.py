@@ -0,0 +1,82 @@
+"""
+Modèle de chat partagé par les agents et les serveurs
+
+LLM_PROVIDER choisit l'implémentation:
+  anthropic (défaut)  ChatAnthropic (claude-3-haiku)
+  fake                FakeChatModel déterministe, hors-ligne (voir fake_llm.py)
+
+LLM_CASSETTE enveloppe le modèle pour enregistrer / rejouer ses réponses
+(voir llm_cassette.py). Chaque appel alimente les métriques smartdoc_llm_*.
+"""
+
+import os
+import time
+
+from metrics import LLM_CALLS, LLM_LATENCY, LLM_TOKENS
+
+
+MODEL = "claude-3-haiku-20240307"
+
+
+class MeteredChatModel:
+    """Compte et chronomètre les appels du modèle (kind: text ou nom du schéma structuré)"""
+
+    def __init__(self, model, kind: str = 'text'):
+        self.model = model
+        self.kind = kind
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        # Réglages (error_rate, latence...) appliqués au modèle enveloppé
+        if name in ('model', 'kind'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.model, name, value)
+
+    def invoke(self, messages, config=None, **kwargs):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.model.invoke(messages, config, **kwargs)
+            status = 'ok'
+        finally:
+            LLM_LATENCY.observe((time.perf_counter() - start) * 1000, kind=self.kind)
+            LLM_CALLS.inc(kind=self.kind, status=status)
+
+        raw = response.get('raw') if isinstance(response, dict) else response
+        usage = getattr(raw, 'usage_metadata', None)
+        if usage:
+            LLM_TOKENS.inc(usage.get('input_tokens', 0), direction='input')
+            LLM_TOKENS.inc(usage.get('output_tokens', 0), direction='output')
+        return response
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs) -> 'MeteredChatModel':
+        structured = self.model.with_structured_output(schema, include_raw=include_raw, **kwargs)
+        return MeteredChatModel(structured, kind=getattr(schema, '__name__', 'structured'))
+
+
+def create_chat_model(temperature: float = 0.3):
+    """Modèle selon LLM_PROVIDER, enveloppé par la cassette si LLM_CASSETTE est défini"""
+    if os.environ.get('LLM_CASSETTE'):
+        from llm_cassette import CassetteChatModel
+        model = CassetteChatModel.from_env(lambda: create_provider_model(temperature))
+    else:
+        model = create_provider_model(temperature)
+    return MeteredChatModel(model)
+
+
+def create_provider_model(temperature: float = 0.3):
+    """Modèle selon LLM_PROVIDER (imports coûteux seulement pour le fournisseur choisi)"""
+    provider = os.environ.get('LLM_PROVIDER', 'anthropic')
+    if provider == 'fake':
+        from fake_llm import FakeChatModel
+        return FakeChatModel.from_env()
+
+    from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic(
+        model=MODEL,
+        temperature=temperature,
+        api_key=os.environ.get('ANTHROPIC_API_KEY')
+    )
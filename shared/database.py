@@ -2,22 +2,48 @@
 Helpers pour DynamoDB
 """
 
-import boto3
+import copy
+import threading
 from typing import Dict, List, Optional, Any
 from botocore.exceptions import ClientError
 import os
 
+from metrics import Instrumented, DB_LATENCY, DB_ERRORS
+from logger import get_logger
+
+log = get_logger('database')
+
 
 class DynamoDBHelper:
     """Helper pour interagir avec DynamoDB"""
 
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
         self.region = os.environ.get('AWS_REGION', 'us-east-1')
+        self._dynamodb = None
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @property
+    def dynamodb(self):
+        """Ressource DynamoDB créée au premier accès (import de boto3 différé)"""
+        if self._dynamodb is None:
+            with self._lock:
+                if self._dynamodb is None:
+                    import boto3
+                    self._dynamodb = boto3.resource('dynamodb')
+        return self._dynamodb
+
+    def load(self) -> 'DynamoDBHelper':
+        """Crée la ressource tout de suite (préchauffage)"""
+        self.dynamodb
+        return self
 
     def get_table(self, table_name: str):
-        """Récupère une table DynamoDB"""
-        return self.dynamodb.Table(table_name)
+        """Récupère une table DynamoDB (objet réutilisé entre requêtes)"""
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = self.dynamodb.Table(table_name)
+        return table
 
     # ===== USERS =====
 
@@ -28,7 +54,7 @@ class DynamoDBHelper:
             response = table.get_item(Key={'user_id': user_id})
             return response.get('Item')
         except ClientError as e:
-            print(f"Erreur get_user: {e}")
+            log.error("Erreur DynamoDB", operation='get_user', error=str(e))
             return None
 
     def create_user(self, user_data: Dict) -> bool:
@@ -38,7 +64,7 @@ class DynamoDBHelper:
             table.put_item(Item=user_data)
             return True
         except ClientError as e:
-            print(f"Erreur create_user: {e}")
+            log.error("Erreur DynamoDB", operation='create_user', error=str(e))
             return False
 
     # ===== MEDICATIONS =====
@@ -65,7 +91,7 @@ class DynamoDBHelper:
                 )
             return response.get('Items', [])
         except ClientError as e:
-            print(f"Erreur get_user_medications: {e}")
+            log.error("Erreur DynamoDB", operation='get_user_medications', error=str(e))
             return []
 
     def add_medication(self, medication_data: Dict) -> bool:
@@ -75,25 +101,33 @@ class DynamoDBHelper:
             table.put_item(Item=medication_data)
             return True
         except ClientError as e:
-            print(f"Erreur add_medication: {e}")
+            log.error("Erreur DynamoDB", operation='add_medication', error=str(e))
             return False
 
     # ===== APPOINTMENTS =====
 
-    def get_user_appointments(self, user_id: str, limit: int = 10) -> List[Dict]:
-        """Récupère les rendez-vous d'un utilisateur"""
+    def get_user_appointments(self, user_id: str, limit: Optional[int] = 10) -> List[Dict]:
+        """Récupère les rendez-vous d'un utilisateur, triés par date (tous si limit=None)"""
         table = self.get_table('SmartDoc_Appointments')
         try:
-            response = table.query(
-                IndexName='UserIdIndex',
-                KeyConditionExpression='user_id = :uid',
-                ExpressionAttributeValues={':uid': user_id},
-                Limit=limit,
-                ScanIndexForward=True  # Tri ascendant par date
-            )
-            return response.get('Items', [])
+            # UserIdIndex n'a pas de clé de tri: lire toutes les pages puis trier,
+            # sinon les `limit` premiers éléments sont arbitraires
+            kwargs = {
+                'IndexName': 'UserIdIndex',
+                'KeyConditionExpression': 'user_id = :uid',
+                'ExpressionAttributeValues': {':uid': user_id}
+            }
+            items = []
+            while True:
+                response = table.query(**kwargs)
+                items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            items.sort(key=lambda a: (a.get('date', ''), a.get('time', '')))
+            return items[:limit]
         except ClientError as e:
-            print(f"Erreur get_user_appointments: {e}")
+            log.error("Erreur DynamoDB", operation='get_user_appointments', error=str(e))
             return []
 
     def add_appointment(self, appointment_data: Dict) -> bool:
@@ -103,7 +137,7 @@ class DynamoDBHelper:
             table.put_item(Item=appointment_data)
             return True
         except ClientError as e:
-            print(f"Erreur add_appointment: {e}")
+            log.error("Erreur DynamoDB", operation='add_appointment', error=str(e))
             return False
 
     # ===== CONVERSATIONS =====
@@ -115,7 +149,7 @@ class DynamoDBHelper:
             table.put_item(Item=conversation_data)
             return True
         except ClientError as e:
-            print(f"Erreur save_conversation: {e}")
+            log.error("Erreur DynamoDB", operation='save_conversation', error=str(e))
             return False
 
     def get_user_conversations(self, user_id: str, limit: int = 20) -> List[Dict]:
@@ -131,7 +165,7 @@ class DynamoDBHelper:
             )
             return response.get('Items', [])
         except ClientError as e:
-            print(f"Erreur get_user_conversations: {e}")
+            log.error("Erreur DynamoDB", operation='get_user_conversations', error=str(e))
             return []
 
     # ===== EMERGENCIES =====
@@ -143,7 +177,7 @@ class DynamoDBHelper:
             table.put_item(Item=emergency_data)
             return True
         except ClientError as e:
-            print(f"Erreur save_emergency: {e}")
+            log.error("Erreur DynamoDB", operation='save_emergency', error=str(e))
             return False
 
     def get_user_emergencies(self, user_id: str) -> List[Dict]:
@@ -158,9 +192,111 @@ class DynamoDBHelper:
             )
             return response.get('Items', [])
         except ClientError as e:
-            print(f"Erreur get_user_emergencies: {e}")
+            log.error("Erreur DynamoDB", operation='get_user_emergencies', error=str(e))
             return []
 
 
-# Instance globale
-db = DynamoDBHelper()
+class InMemoryDatabase:
+    """Même interface que DynamoDBHelper, en mémoire et préremplie (hors-ligne, benchmarks)"""
+
+    def __init__(self, seed: bool = True):
+        self._lock = threading.Lock()
+        self.users: Dict[str, Dict] = {}
+        self.medications: List[Dict] = []
+        self.appointments: List[Dict] = []
+        self.conversations: List[Dict] = []
+        self.emergencies: List[Dict] = []
+        if seed:
+            from test_data import seed_data
+            data = seed_data()
+            for user in data['users']:
+                self.create_user(user)
+            for medication in data['medications']:
+                self.add_medication(medication)
+            for appointment in data['appointments']:
+                self.add_appointment(appointment)
+
+    def load(self) -> 'InMemoryDatabase':
+        return self
+
+    def get_table(self, table_name: str):
+        raise NotImplementedError(
+            f"Table {table_name} indisponible en mémoire: utiliser les stores sqlite (*_BACKEND=sqlite)"
+        )
+
+    def _select(self, items: List[Dict], user_id: str) -> List[Dict]:
+        with self._lock:
+            return [copy.deepcopy(item) for item in items if item.get('user_id') == user_id]
+
+    def _insert(self, items: List[Dict], item: Dict) -> bool:
+        with self._lock:
+            items.append(copy.deepcopy(item))
+        return True
+
+    # ===== USERS =====
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            user = self.users.get(user_id)
+            return copy.deepcopy(user) if user else None
+
+    def create_user(self, user_data: Dict) -> bool:
+        with self._lock:
+            self.users[user_data['user_id']] = copy.deepcopy(user_data)
+        return True
+
+    # ===== MEDICATIONS =====
+
+    def get_user_medications(self, user_id: str, active_only: bool = True) -> List[Dict]:
+        medications = self._select(self.medications, user_id)
+        return [m for m in medications if m.get('active')] if active_only else medications
+
+    def add_medication(self, medication_data: Dict) -> bool:
+        return self._insert(self.medications, medication_data)
+
+    # ===== APPOINTMENTS =====
+
+    def get_user_appointments(self, user_id: str, limit: Optional[int] = 10) -> List[Dict]:
+        appointments = self._select(self.appointments, user_id)
+        return sorted(appointments, key=lambda a: (a.get('date', ''), a.get('time', '')))[:limit]
+
+    def add_appointment(self, appointment_data: Dict) -> bool:
+        return self._insert(self.appointments, appointment_data)
+
+    # ===== CONVERSATIONS =====
+
+    def save_conversation(self, conversation_data: Dict) -> bool:
+        return self._insert(self.conversations, conversation_data)
+
+    def get_user_conversations(self, user_id: str, limit: int = 20) -> List[Dict]:
+        conversations = self._select(self.conversations, user_id)
+        return sorted(conversations, key=lambda c: c.get('timestamp', ''), reverse=True)[:limit]
+
+    # ===== EMERGENCIES =====
+
+    def save_emergency(self, emergency_data: Dict) -> bool:
+        return self._insert(self.emergencies, emergency_data)
+
+    def get_user_emergencies(self, user_id: str) -> List[Dict]:
+        emergencies = self._select(self.emergencies, user_id)
+        return sorted(emergencies, key=lambda e: e.get('timestamp', ''), reverse=True)
+
+
+# Accesseurs sans appel réseau: ne pas les compter comme opérations base de données
+UNTIMED = ('get_table', 'load', 'dynamodb')
+
+
+def create_database():
+    """Construit la base selon DATABASE_BACKEND (dynamodb | memory), chaque opération chronométrée"""
+    if os.environ.get('DATABASE_BACKEND', 'dynamodb') == 'memory':
+        return Instrumented(InMemoryDatabase(), DB_LATENCY, DB_ERRORS, skip=UNTIMED)
+    return Instrumented(DynamoDBHelper(), DB_LATENCY, DB_ERRORS, skip=UNTIMED)
+
+
+def default_store_backend() -> str:
+    """Backend par défaut des stores (caches, outbox, journal): sqlite si la base est en mémoire"""
+    return 'sqlite' if os.environ.get('DATABASE_BACKEND', 'dynamodb') == 'memory' else 'dynamodb'
+
+
+# Instance globale (ressource DynamoDB créée au premier usage)
+db = create_database()
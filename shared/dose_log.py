@@ -0,0 +1,243 @@
+"""
+Journal des prises de médicaments (append-only)
+
+Un événement par médicament et par créneau prévu (taken / skipped / late),
+partitionné par utilisateur et par mois, avec des compteurs d'observance
+journaliers mis à jour à l'écriture. Les questions du type "ai-je oublié
+hier?" se résolvent par une requête sur une plage de dates, sans relire
+tout l'historique.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from metrics import Instrumented, DB_LATENCY, DB_ERRORS
+
+
+TAKEN = 'taken'
+SKIPPED = 'skipped'
+LATE = 'late'
+STATUSES = (TAKEN, SKIPPED, LATE)
+
+
+def month_partition(user_id: str, day: date) -> str:
+    """Clé de partition: utilisateur + mois"""
+    return f"{user_id}#{day.strftime('%Y-%m')}"
+
+
+def months_between(start: date, end: date) -> List[date]:
+    """Premier jour de chaque mois couvert par [start, end]"""
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _empty_counters(day: str) -> Dict:
+    return {'day': day, TAKEN: 0, SKIPPED: 0, LATE: 0}
+
+
+class SQLiteDoseLog:
+    """Backend local (fichier SQLite) pour tests hors-ligne et serveurs locaux"""
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dose_events (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                slot TEXT NOT NULL,
+                medication_id TEXT NOT NULL,
+                medication_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                recorded_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, day, slot, medication_id)
+            );
+            CREATE TABLE IF NOT EXISTS adherence_daily (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                taken INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                late INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day)
+            );
+        """)
+
+    def record(self, user_id: str, medication: Dict, slot: datetime, status: str,
+               recorded_at: Optional[datetime] = None) -> bool:
+        """Ajoute un événement (un seul par médicament et créneau). False si déjà noté"""
+        if status not in STATUSES:
+            raise ValueError(f"Statut de prise invalide: {status}")
+        recorded_at = recorded_at or datetime.now()
+        day = slot.strftime('%Y-%m-%d')
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO dose_events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, day, slot.strftime('%H:%M'), medication['medication_id'],
+                     medication['name'], status, recorded_at.isoformat())
+                )
+                if cursor.rowcount:
+                    self._conn.execute(
+                        'INSERT INTO adherence_daily (user_id, day) VALUES (?, ?) '
+                        'ON CONFLICT (user_id, day) DO NOTHING',
+                        (user_id, day)
+                    )
+                    self._conn.execute(
+                        f'UPDATE adherence_daily SET {status} = {status} + 1 WHERE user_id = ? AND day = ?',
+                        (user_id, day)
+                    )
+                self._conn.execute('COMMIT')
+                return cursor.rowcount == 1
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def events(self, user_id: str, start: date, end: date) -> List[Dict]:
+        """Événements de la plage [start, end], triés par créneau"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, slot, medication_id, medication_name, status, recorded_at FROM dose_events '
+                'WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day, slot',
+                (user_id, start.isoformat(), end.isoformat())
+            ).fetchall()
+        return [
+            {'day': r[0], 'slot': r[1], 'medication_id': r[2], 'medication_name': r[3],
+             'status': r[4], 'recorded_at': r[5]}
+            for r in rows
+        ]
+
+    def daily_adherence(self, user_id: str, start: date, end: date) -> List[Dict]:
+        """Compteurs journaliers précalculés de la plage [start, end]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, taken, skipped, late FROM adherence_daily '
+                'WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day',
+                (user_id, start.isoformat(), end.isoformat())
+            ).fetchall()
+        return [{'day': r[0], TAKEN: r[1], SKIPPED: r[2], LATE: r[3]} for r in rows]
+
+
+class DynamoDBDoseLog:
+    """
+    Backend DynamoDB (table SmartDoc_DoseEvents)
+
+    partition = "user_id#YYYY-MM", sort_key = "EVT#YYYY-MM-DD#HH:MM#medication_id"
+    pour les événements et "DAY#YYYY-MM-DD" pour les compteurs journaliers.
+    """
+
+    TABLE = 'SmartDoc_DoseEvents'
+
+    def __init__(self, db_helper):
+        self.db = db_helper
+
+    def record(self, user_id: str, medication: Dict, slot: datetime, status: str,
+               recorded_at: Optional[datetime] = None) -> bool:
+        """Ajoute un événement (un seul par médicament et créneau). False si déjà noté"""
+        if status not in STATUSES:
+            raise ValueError(f"Statut de prise invalide: {status}")
+        recorded_at = recorded_at or datetime.now()
+        day = slot.strftime('%Y-%m-%d')
+        partition = month_partition(user_id, slot.date())
+        client = self.db.dynamodb.meta.client
+        try:
+            # Événement et compteur écrits ensemble ou pas du tout
+            client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': self.TABLE,
+                    'Item': {
+                        'partition': partition,
+                        'sort_key': f"EVT#{day}#{slot.strftime('%H:%M')}#{medication['medication_id']}",
+                        'user_id': user_id,
+                        'medication_id': medication['medication_id'],
+                        'medication_name': medication['name'],
+                        'status': status,
+                        'recorded_at': recorded_at.isoformat()
+                    },
+                    'ConditionExpression': 'attribute_not_exists(sort_key)'
+                }},
+                {'Update': {
+                    'TableName': self.TABLE,
+                    'Key': {'partition': partition, 'sort_key': f"DAY#{day}"},
+                    'UpdateExpression': 'ADD #status :one',
+                    'ExpressionAttributeNames': {'#status': status},
+                    'ExpressionAttributeValues': {':one': 1}
+                }}
+            ])
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            # Dose déjà notée seulement si la condition a échoué (pas un conflit ou une limite)
+            reasons = e.response.get('CancellationReasons', [])
+            if any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons):
+                return False
+            raise
+
+    def _query(self, user_id: str, start: date, end: date, prefix: str) -> List[Dict]:
+        table = self.db.get_table(self.TABLE)
+        items = []
+        for month in months_between(start, end):
+            kwargs = {
+                'KeyConditionExpression': '#p = :p AND sort_key BETWEEN :a AND :b',
+                'ExpressionAttributeNames': {'#p': 'partition'},
+                'ExpressionAttributeValues': {
+                    ':p': month_partition(user_id, month),
+                    ':a': f"{prefix}#{start.isoformat()}",
+                    ':b': f"{prefix}#{end.isoformat()}~"
+                }
+            }
+            while True:
+                response = table.query(**kwargs)
+                items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return items
+
+    def events(self, user_id: str, start: date, end: date) -> List[Dict]:
+        """Événements de la plage [start, end], triés par créneau"""
+        events = []
+        for item in self._query(user_id, start, end, 'EVT'):
+            _, day, slot, _ = item['sort_key'].split('#', 3)
+            events.append({
+                'day': day, 'slot': slot, 'medication_id': item['medication_id'],
+                'medication_name': item['medication_name'], 'status': item['status'],
+                'recorded_at': item['recorded_at']
+            })
+        return events
+
+    def daily_adherence(self, user_id: str, start: date, end: date) -> List[Dict]:
+        """Compteurs journaliers précalculés de la plage [start, end]"""
+        counters = []
+        for item in self._query(user_id, start, end, 'DAY'):
+            row = _empty_counters(item['sort_key'][len('DAY#'):])
+            for status in STATUSES:
+                row[status] = int(item.get(status, 0))
+            counters.append(row)
+        return counters
+
+
+def create_dose_log():
+    """Construit le journal selon DOSE_LOG_BACKEND (dynamodb | sqlite), chaque appel chronométré"""
+    from database import db, default_store_backend
+    backend = os.environ.get('DOSE_LOG_BACKEND', default_store_backend())
+    if backend == 'sqlite':
+        log_store = SQLiteDoseLog(os.environ.get('DOSE_LOG_PATH', ':memory:'))
+    else:
+        log_store = DynamoDBDoseLog(db)
+
+    return Instrumented(log_store, DB_LATENCY, DB_ERRORS, prefix='dose_log.')
+
+
+# Instance globale
+dose_log = create_dose_log()
@@ -0,0 +1,108 @@
+"""
+Corrélation des urgences par utilisateur (fenêtre glissante)
+
+Un utilisateur en détresse envoie souvent plusieurs messages d'affilée.
+Dans la fenêtre, les messages suivants sont rattachés à l'urgence ouverte
+au lieu d'en créer une nouvelle.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+from outbox import outbox
+from logger import get_logger
+
+log = get_logger('correlator')
+
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+WINDOW_SECONDS = int(os.environ.get('EMERGENCY_WINDOW_SECONDS', '900'))
+
+
+def max_severity(a: str, b: str) -> str:
+    """Retourne la gravité la plus élevée des deux"""
+    return a if SEVERITY_RANK.get(a, 0) >= SEVERITY_RANK.get(b, 0) else b
+
+
+class EmergencyCorrelator:
+    """Cache en mémoire des urgences ouvertes, adossé au store de l'outbox"""
+
+    def __init__(self, store, window_seconds: int = WINDOW_SECONDS):
+        self.store = store
+        self.window_seconds = window_seconds
+        self._open: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def remember(self, record: Dict) -> None:
+        """Met en cache l'urgence ouverte d'un utilisateur"""
+        with self._lock:
+            self._open[record['user_id']] = dict(record)
+
+    def forget(self, user_id: str) -> None:
+        """Invalide le cache d'un utilisateur"""
+        with self._lock:
+            self._open.pop(user_id, None)
+
+    def open_emergency(self, user_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Urgence ouverte de l'utilisateur si son dernier message est dans la fenêtre"""
+        now = time.time() if now is None else now
+
+        with self._lock:
+            record = self._open.get(user_id)
+
+        if record is None:
+            # Conteneur froid: on relit le dernier enregistrement
+            record = self.store.latest_open_emergency(user_id)
+            if record is None:
+                return None
+            self.remember(record)
+
+        if now - int(record.get('last_seen_at', 0)) > self.window_seconds:
+            self.forget(user_id)
+            return None
+
+        return record
+
+    def attach(self, user_id: str, message: str, severity: str,
+               now: Optional[float] = None) -> Tuple[Optional[Dict], bool]:
+        """
+        Rattache un message à l'urgence ouverte (écriture conditionnelle).
+
+        Retourne (urgence mise à jour, escalade?). En cas de conflit de version,
+        l'urgence est relue et l'écriture retentée.
+        """
+        now = int(time.time() if now is None else now)
+
+        for _ in range(3):
+            record = self.open_emergency(user_id, now)
+            if record is None:
+                return None, False
+
+            current = record.get('severity', 'medium')
+            new_severity = max_severity(severity, current)
+            escalated = new_severity != current
+            version = int(record.get('version', 0))
+
+            if self.store.attach_follow_up(record['emergency_id'], version, message, new_severity, now):
+                record = dict(record)
+                record.update({
+                    'severity': new_severity,
+                    'last_seen_at': now,
+                    'version': version + 1,
+                    'follow_ups': list(record.get('follow_ups', [])) + [message]
+                })
+                self.remember(record)
+                return record, escalated
+
+            # Une autre invocation a écrit entre-temps: relire depuis le store
+            log.info("Conflit de version, nouvelle lecture", emergency_id=record['emergency_id'])
+            self.forget(user_id)
+
+        return None, False
+
+
+# Instance globale
+correlator = EmergencyCorrelator(outbox.store)
@@ -0,0 +1,271 @@
+"""
+Faux modèle de chat déterministe (hors-ligne)
+
+Remplace ChatAnthropic quand LLM_PROVIDER=fake: même interface que ce
+qu'utilisent les agents (invoke, with_structured_output(include_raw=True)).
+La réponse ne dépend que du prompt: le type de prompt est reconnu (intention,
+gravité, triage, conseils d'urgence, réponse générale...) et le message est
+analysé par mots-clés. Latence et taux d'erreur sont configurables pour les
+benchmarks et les tests de charge:
+
+  FAKE_LLM_LATENCY     ms: "0", "200", "normal:300:50", "lognormal:300:0.5"...
+                       (voir latency.py)
+  FAKE_LLM_ERROR_RATE  probabilité d'erreur simulée par appel (0 à 1)
+  FAKE_LLM_SEED        graine des tirages (latence, erreurs)
+"""
+
+import os
+import re
+import time
+import random
+import threading
+import typing
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from langchain_core.messages import AIMessage
+
+from keywords import KeywordMatcher
+from latency import parse_latency
+
+
+class FakeLLMError(Exception):
+    """Erreur d'API simulée"""
+
+
+# ===== ANALYSE DU MESSAGE =====
+
+# Ordre = priorité (règle de l'orchestrator: l'urgence l'emporte)
+INTENT_ORDER = ['emergency', 'symptom', 'medication', 'appointment']
+
+INTENT_KEYWORDS = KeywordMatcher({
+    'emergency': ["urgence", "aide", "au secours", "secours", "sos", "tombé", "tombe", "chute",
+                  "douleur intense", "poitrine", "étouffe", "inconscient", "malaise"],
+    'symptom': ["mal", "douleur", "fièvre", "fatigue", "fatigué", "nausée", "vertige", "toux",
+                "tousse", "migraine", "malade", "vomi", "pas bien"],
+    'medication': ["médicament", "medicament", "doliprane", "aspégic", "glucophage", "voltarène",
+                   "cachet", "comprimé", "pilule", "traitement", "posologie", "pris", "prendre",
+                   "dose", "ordonnance", "interaction"],
+    'appointment': ["rendez-vous", "rdv", "docteur", "médecin", "cardiologue", "consultation"],
+})
+
+SEVERITY_KEYWORDS = KeywordMatcher({
+    'critical': ["poitrine", "respirer", "respire plus", "étouffe", "inconscient", "paralys",
+                 "confusion"],
+    'severe': ["douleur intense", "douleur forte", "tombé", "tombe", "chute", "vomi", "sang",
+               "malaise", "coeur"],
+    'moderate': ["mal", "douleur", "fièvre", "nausée", "vertige", "migraine", "toux"],
+})
+
+SYMPTOM_LABELS = KeywordMatcher({
+    'mal de tête': ["mal a la tete", "mal de tete", "migraine"],
+    'fièvre': ["fièvre", "température"],
+    'nausées': ["nausée", "envie de vomir", "vomi"],
+    'vertiges': ["vertige", "tête qui tourne"],
+    'fatigue': ["fatigue", "fatigué", "épuisé"],
+    'toux': ["toux", "tousse"],
+    'douleur thoracique': ["poitrine"],
+    'difficulté à respirer': ["respirer", "étouffe", "souffle"],
+    'douleur': ["douleur", "mal au", "mal aux", "mal a la", "mal au dos"],
+})
+
+# Gravité du triage (symptômes) -> mot attendu par l'agent d'urgence
+EMERGENCY_SEVERITY = {'critical': 'critical', 'severe': 'high', 'moderate': 'medium', 'mild': 'low'}
+
+
+def classify_intent(message: str) -> str:
+    hits = INTENT_KEYWORDS.scan(message)
+    return next((intent for intent in INTENT_ORDER if intent in hits), 'general')
+
+
+def triage_severity(message: str) -> str:
+    hits = SEVERITY_KEYWORDS.scan(message)
+    return next((level for level in ['critical', 'severe', 'moderate'] if level in hits), 'mild')
+
+
+def symptom_labels(message: str) -> List[str]:
+    hits = SYMPTOM_LABELS.scan(message)
+    labels = [label for label in hits if label != 'douleur']
+    return labels or (['douleur'] if 'douleur' in hits else [])
+
+
+# ===== RECONNAISSANCE DU PROMPT =====
+
+# Marqueur présent dans le prompt système -> type de réponse
+PROMPT_KINDS = [
+    ("Réponds UNIQUEMENT avec un mot: critical", 'severity'),
+    ("classificateur d'intention", 'intent'),
+    ("assistant d'urgence médicale", 'guidance'),
+    ("pharmacien expert mais qui parle simplement", 'interactions'),
+    ("pharmacien expert", 'side_effects'),
+    ("Médicaments actuels", 'medication_info'),
+    ("assistant médical bienveillant", 'general'),
+]
+
+MESSAGE_PATTERNS = [
+    re.compile(r"Message du patient: (.+)"),
+    re.compile(r"Situation: (.+)"),
+    re.compile(r"Question de l'utilisateur: (.+)"),
+]
+HUMAN_PREFIXES = ["Message à classifier:", "Message:"]
+
+
+def split_prompt(messages) -> Tuple[str, str]:
+    """(prompt système, message de l'utilisateur)"""
+    if isinstance(messages, str):
+        return '', messages
+    system = '\n'.join(m.content for m in messages if getattr(m, 'type', '') == 'system')
+    human = [m.content for m in messages if getattr(m, 'type', '') == 'human']
+    if human:
+        text = human[-1].strip()
+        for prefix in HUMAN_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):].strip()
+        return system, text
+    for pattern in MESSAGE_PATTERNS:
+        found = pattern.search(system)
+        if found:
+            return system, found.group(1).strip()
+    return system, ''
+
+
+def prompt_kind(system: str) -> str:
+    return next((kind for marker, kind in PROMPT_KINDS if marker in system), 'text')
+
+
+def user_name_in(system: str) -> str:
+    found = re.search(r"(?:pour|à) ([^,\n]+), une personne âgée", system)
+    return found.group(1).strip() if found else ''
+
+
+def general_reply(system: str, message: str) -> str:
+    first_name = user_name_in(system).split(' ')[0] if user_name_in(system) else ''
+    greeting = f"Bonjour {first_name}!" if first_name else "Bonjour!"
+    if 'merci' in message.lower():
+        return f"Avec plaisir{' ' + first_name if first_name else ''}! Je reste là si vous avez besoin. 😊"
+    return f"{greeting} Je suis là pour vous aider. Comment vous sentez-vous aujourd'hui? 😊"
+
+
+def text_reply(kind: str, system: str, message: str) -> str:
+    if kind == 'intent':
+        # Mode classique de l'orchestrator: label suivi de la certitude
+        return f"{classify_intent(message)} 0.95" if 'certitude' in system else classify_intent(message)
+    if kind == 'severity':
+        return EMERGENCY_SEVERITY[triage_severity(message)]
+    if kind == 'guidance':
+        return ("1. Restez calme et ne bougez pas brusquement.\n"
+                "2. Si vous pouvez, asseyez-vous ou allongez-vous.\n"
+                "3. Gardez votre téléphone près de vous.\n"
+                "4. En cas d'aggravation, appelez le 15.")
+    if kind == 'interactions':
+        return ("💊 Je n'ai pas trouvé d'interaction majeure entre vos médicaments. "
+                "Demandez tout de même confirmation à votre pharmacien.")
+    if kind == 'side_effects':
+        return ("Ce symptôme peut être un effet secondaire connu de votre traitement. "
+                "N'arrêtez rien seul et parlez-en à votre médecin ou pharmacien.")
+    if kind == 'medication_info':
+        block = system.split("Médicaments actuels:", 1)[1].split("\n\n")[0]
+        lines = [line.strip('- ').strip() for line in block.strip().splitlines() if line.strip()]
+        listed = '\n'.join(f"💊 {line}" for line in lines) or "💊 Aucun médicament enregistré."
+        return f"Voici vos médicaments:\n{listed}\n\nℹ️ Pour tout doute, demandez à votre médecin."
+    if kind == 'general':
+        return general_reply(system, message)
+    return "D'accord, je suis là pour vous aider."
+
+
+def structured_values(schema, system: str, message: str) -> Dict:
+    """Valeurs des champs connus du schéma (intent, confidence, reply, severity, symptoms...)"""
+    fields = schema.model_fields
+    values = {}
+    intent = classify_intent(message)
+    if 'intent' in fields:
+        allowed = typing.get_args(fields['intent'].annotation)
+        values['intent'] = intent if not allowed or intent in allowed else 'general'
+    if 'confidence' in fields:
+        values['confidence'] = 0.95
+    if 'reply' in fields:
+        values['reply'] = general_reply(system, message) if values.get('intent', 'general') == 'general' else ''
+    if 'severity' in fields:
+        values['severity'] = triage_severity(message)
+    if 'symptoms' in fields:
+        values['symptoms'] = symptom_labels(message)
+    if 'needs_immediate_attention' in fields:
+        values['needs_immediate_attention'] = triage_severity(message) == 'critical'
+    return values
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ===== MODÈLE =====
+
+class FakeChatModel:
+    """Modèle déterministe: même prompt, même réponse; latence et erreurs tirées au sort"""
+
+    def __init__(self, latency: str = '0', error_rate: float = 0.0, seed: int = 0):
+        self.latency_spec = latency
+        self.error_rate = error_rate
+        self._latency = parse_latency(latency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'FakeChatModel':
+        return cls(
+            latency=os.environ.get('FAKE_LLM_LATENCY', '0'),
+            error_rate=float(os.environ.get('FAKE_LLM_ERROR_RATE', '0')),
+            seed=int(os.environ.get('FAKE_LLM_SEED', '0'))
+        )
+
+    def _simulate(self, kind: str) -> None:
+        """Latence et erreur simulées"""
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self._latency(self._rng) / 1000
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise FakeLLMError(f"Erreur simulée ({kind})")
+
+    @staticmethod
+    def _message(content: str, prompt: str, **kwargs) -> AIMessage:
+        usage = {'input_tokens': estimate_tokens(prompt), 'output_tokens': estimate_tokens(content)}
+        usage['total_tokens'] = usage['input_tokens'] + usage['output_tokens']
+        return AIMessage(content=content, usage_metadata=usage,
+                         response_metadata={'model': 'fake'}, **kwargs)
+
+    def invoke(self, messages, config=None, **kwargs) -> AIMessage:
+        system, message = split_prompt(messages)
+        kind = prompt_kind(system)
+        self._simulate(kind)
+        return self._message(text_reply(kind, system, message), system + message)
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs) -> 'FakeStructuredModel':
+        return FakeStructuredModel(self, schema, include_raw)
+
+    def structured(self, schema, messages, include_raw: bool):
+        system, message = split_prompt(messages)
+        self._simulate(f"structured:{schema.__name__}")
+        parsed = schema.model_validate(structured_values(schema, system, message))
+        raw = self._message('', system + message, tool_calls=[
+            {'name': schema.__name__, 'args': parsed.model_dump(), 'id': 'fake_call', 'type': 'tool_call'}
+        ])
+        return {'raw': raw, 'parsed': parsed, 'parsing_error': None} if include_raw else parsed
+
+
+class FakeStructuredModel:
+    """Sortie structurée du faux modèle (comme with_structured_output)"""
+
+    def __init__(self, model: FakeChatModel, schema, include_raw: bool):
+        self.model = model
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, messages, config=None, **kwargs):
+        return self.model.structured(self.schema, messages, self.include_raw)
@@ -0,0 +1,165 @@
+"""
+Cache des intentions par texte de message normalisé
+
+Les mêmes messages courts ("Quels sont mes médicaments?", "Aide!") reviennent
+chez tous les utilisateurs. L'intention classée par le LLM est mémorisée sous
+le texte normalisé (casse, accents, ponctuation, espaces): LRU local avec TTL,
+éventuellement partagé entre conteneurs via le store de analysis_cache.
+Seules les classifications sûres sont mises en cache.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from keywords import normalize
+from analysis_cache import SQLiteCacheStore, DynamoDBCacheStore
+from metrics import metrics, Instrumented, DB_LATENCY, DB_ERRORS
+from logger import get_logger
+
+log = get_logger('intent_cache')
+
+
+# À incrémenter quand le prompt ou les catégories d'intention changent
+PROMPT_VERSION = '1'
+
+TTL_SECONDS = int(os.environ.get('INTENT_CACHE_TTL', str(24 * 3600)))
+LOCAL_SIZE = int(os.environ.get('INTENT_CACHE_SIZE', '2048'))
+MIN_CONFIDENCE = float(os.environ.get('INTENT_CACHE_MIN_CONFIDENCE', '0.8'))
+
+# Les messages longs ne se répètent pas: inutile de les mémoriser
+MAX_WORDS = int(os.environ.get('INTENT_CACHE_MAX_WORDS', '12'))
+
+
+class IntentCache:
+    """LRU local avec TTL + store persistant optionnel"""
+
+    def __init__(self, store=None, local_size: int = LOCAL_SIZE, ttl_seconds: int = TTL_SECONDS,
+                 min_confidence: float = MIN_CONFIDENCE):
+        self.store = store
+        self.local_size = local_size
+        self.ttl_seconds = ttl_seconds
+        self.min_confidence = min_confidence
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._llm_seconds = 0.0
+        self._llm_calls = 0
+        self.stats = {'local_hits': 0, 'store_hits': 0, 'misses': 0, 'stores': 0,
+                      'low_confidence': 0, 'saved_ms': 0.0}
+
+    @staticmethod
+    def normalized(message: str) -> Optional[str]:
+        """Texte normalisé, None si le message est trop long pour être mis en cache"""
+        text = normalize(message)
+        if not text or len(text.split()) > MAX_WORDS:
+            return None
+        return text
+
+    @staticmethod
+    def store_key(text: str) -> str:
+        return 'intent:' + hashlib.sha256(f"{PROMPT_VERSION}|{text}".encode('utf-8')).hexdigest()
+
+    def get(self, message: str) -> Optional[str]:
+        """Intention mémorisée pour ce message, sinon None"""
+        text = self.normalized(message)
+        if text is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(text)
+            if entry and entry[1] > now:
+                self._local.move_to_end(text)
+                self.stats['local_hits'] += 1
+                self._count_saved()
+                return entry[0]
+
+        intent = None
+        if self.store is not None:
+            try:
+                intent = self.store.get(self.store_key(text))
+            except (BotoCoreError, ClientError, sqlite3.Error) as e:
+                log.warning("Erreur lecture store", error=str(e))
+
+        with self._lock:
+            if intent is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['store_hits'] += 1
+            self._count_saved()
+
+        self._remember(text, intent, int(now) + self.ttl_seconds)
+        return intent
+
+    def put(self, message: str, intent: str, confidence: float) -> bool:
+        """Mémorise l'intention si la classification est sûre"""
+        if confidence < self.min_confidence:
+            self.stats['low_confidence'] += 1
+            return False
+
+        text = self.normalized(message)
+        if text is None:
+            return False
+
+        expires_at = int(time.time()) + self.ttl_seconds
+        self._remember(text, intent, expires_at)
+        self.stats['stores'] += 1
+
+        if self.store is not None:
+            try:
+                self.store.put(self.store_key(text), intent, expires_at)
+            except (BotoCoreError, ClientError, sqlite3.Error) as e:
+                log.warning("Erreur écriture store", error=str(e))
+        return True
+
+    def record_latency(self, seconds: float) -> None:
+        """Durée d'une classification LLM (base du temps économisé par hit)"""
+        with self._lock:
+            self._llm_seconds += seconds
+            self._llm_calls += 1
+
+    def _count_saved(self) -> None:
+        if self._llm_calls:
+            self.stats['saved_ms'] += self._llm_seconds / self._llm_calls * 1000
+
+    def _remember(self, text: str, intent: str, expires_at: int) -> None:
+        with self._lock:
+            self._local[text] = (intent, expires_at)
+            self._local.move_to_end(text)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def hit_ratio(self) -> float:
+        hits = self.stats['local_hits'] + self.stats['store_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def report(self) -> Dict:
+        """Statistiques: hits, taux de hit, temps LLM économisé"""
+        return {**self.stats, 'hit_ratio': round(self.hit_ratio(), 3),
+                'saved_ms': round(self.stats['saved_ms'], 1)}
+
+
+def create_intent_cache() -> IntentCache:
+    """Construit le cache selon INTENT_CACHE_BACKEND (dynamodb | sqlite | memory)"""
+    from database import db, default_store_backend
+    backend = os.environ.get('INTENT_CACHE_BACKEND', default_store_backend())
+    if backend == 'memory':
+        return IntentCache()
+    if backend == 'sqlite':
+        store = SQLiteCacheStore(os.environ.get('INTENT_CACHE_PATH', ':memory:'))
+    else:
+        store = DynamoDBCacheStore(db)
+
+    return IntentCache(Instrumented(store, DB_LATENCY, DB_ERRORS, prefix='intent_cache.'))
+
+
+# Instance globale
+intent_cache = create_intent_cache()
+metrics.register_stats('smartdoc_intent_cache_total', lambda: intent_cache.stats, "Cache des intentions")
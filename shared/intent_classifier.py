@@ -0,0 +1,190 @@
+"""
+Classifieur d'intention local (TF-IDF + régression logistique, NumPy)
+
+Entraîné hors-ligne sur shared/data/intent_corpus.tsv par
+scripts/train-intent-classifier.py et sérialisé dans
+shared/data/intent_model.npz (quelques dizaines de Ko, chargé en quelques
+millisecondes). Les probabilités sont calibrées par une température ajustée
+sur un jeu de validation: sous le seuil, l'orchestrator consulte le LLM.
+"""
+
+import os
+import zlib
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from keywords import KeywordMatcher, normalize
+from logger import get_logger
+
+log = get_logger('intent_classifier')
+
+
+MODEL_PATH = os.environ.get(
+    'INTENT_MODEL_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'intent_model.npz')
+)
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'intent_corpus.tsv')
+
+DIM = 4096
+THRESHOLD = float(os.environ.get('INTENT_CLASSIFIER_THRESHOLD', '0.85'))
+
+# Par sécurité, un doute sur une urgence est tranché par le LLM
+EMERGENCY_DOUBT = float(os.environ.get('INTENT_CLASSIFIER_EMERGENCY_DOUBT', '0.15'))
+
+# Termes d'urgence (règle du prompt de l'orchestrator): jamais écartés localement
+EMERGENCY_TERMS = KeywordMatcher({'emergency': [
+    "urgence", "aide", "au secours", "sos", "secours", "tombé", "tombe", "chute", "chuté",
+    "douleur intense", "poitrine", "respire", "étouffe", "inconscient", "évanoui",
+    "saigne", "paralysé", "malaise", "par terre", "relever", "glissé", "crise",
+    "coeur", "peur", "mal à parler", "le 15", "samu", "bras gauche"
+]})
+
+
+def feature_ids(text: str, dim: int = DIM) -> List[int]:
+    """Mots, paires de mots et trigrammes de caractères, hachés sur dim colonnes"""
+    normalized = normalize(text)
+    words = normalized.split()
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {normalized} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return [zlib.crc32(f.encode('utf-8')) % dim for f in features]
+
+
+def term_counts(texts: Sequence[str], dim: int = DIM) -> np.ndarray:
+    """Matrice des fréquences (sous-linéaires) des termes hachés"""
+    counts = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.add.at(counts[row], feature_ids(text, dim), 1.0)
+    return np.log1p(counts)
+
+
+def tfidf(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """Pondération TF-IDF normée (L2) ligne par ligne"""
+    weighted = counts * idf
+    norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+    return weighted / np.where(norms > 0, norms, 1.0)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def read_corpus(path: str = CORPUS_PATH) -> Tuple[List[str], List[str]]:
+    """Corpus étiqueté: une ligne "intent<TAB>message" ('#' = commentaire)"""
+    texts, labels = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            label, text = line.rstrip('\n').split('\t', 1)
+            labels.append(label)
+            texts.append(text)
+    return texts, labels
+
+
+def train(texts: Sequence[str], labels: Sequence[str], dim: int = DIM, epochs: int = 300,
+          learning_rate: float = 2.0, l2: float = 1e-4) -> Dict:
+    """Régression logistique multinomiale (descente de gradient, classes équilibrées)"""
+    classes = sorted(set(labels))
+    y = np.array([classes.index(label) for label in labels])
+
+    counts = term_counts(texts, dim)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+    x = tfidf(counts, idf)
+
+    onehot = np.eye(len(classes), dtype=np.float32)[y]
+    class_weights = len(y) / (len(classes) * np.bincount(y, minlength=len(classes)))
+    sample_weights = class_weights[y][:, None].astype(np.float32)
+
+    weights = np.zeros((dim, len(classes)), dtype=np.float32)
+    bias = np.zeros(len(classes), dtype=np.float32)
+    for _ in range(epochs):
+        error = (softmax(x @ weights + bias) - onehot) * sample_weights / len(y)
+        weights -= learning_rate * (x.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+
+    return {'classes': classes, 'idf': idf, 'weights': weights, 'bias': bias, 'temperature': 1.0}
+
+
+def fit_temperature(model: Dict, texts: Sequence[str], labels: Sequence[str]) -> float:
+    """Température minimisant la log-vraisemblance négative sur la validation"""
+    logits = tfidf(term_counts(texts, len(model['idf'])), model['idf']) @ model['weights'] + model['bias']
+    y = np.array([model['classes'].index(label) for label in labels])
+    best, best_nll = 1.0, float('inf')
+    for temperature in np.arange(0.25, 5.01, 0.05):
+        probabilities = softmax(logits / temperature)
+        nll = -np.log(probabilities[np.arange(len(y)), y] + 1e-9).mean()
+        if nll < best_nll:
+            best, best_nll = float(temperature), nll
+    return best
+
+
+def save(model: Dict, path: str = MODEL_PATH) -> None:
+    """Sérialisation compacte (poids en float16, npz compressé)"""
+    np.savez_compressed(
+        path,
+        classes=np.array(model['classes']),
+        idf=model['idf'].astype(np.float16),
+        weights=model['weights'].astype(np.float16),
+        bias=model['bias'].astype(np.float32),
+        temperature=np.float32(model['temperature'])
+    )
+
+
+class IntentClassifier:
+    """Modèle chargé à la première utilisation"""
+
+    def __init__(self, path: str = MODEL_PATH, threshold: float = THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.classes: List[str] = []
+
+    def load(self) -> 'IntentClassifier':
+        if self._loaded:
+            return self
+
+        with self._lock:
+            if self._loaded:
+                return self
+
+            with np.load(self.path) as data:
+                self.classes = [str(c) for c in data['classes']]
+                self._idf = data['idf'].astype(np.float32)
+                self._weights = data['weights'].astype(np.float32)
+                self._bias = data['bias']
+                self._temperature = float(data['temperature'])
+
+            self._loaded = True
+            log.info("Modèle chargé", intents=len(self.classes), columns=self._weights.shape[0])
+
+        return self
+
+    def predict(self, message: str) -> Dict[str, float]:
+        """Probabilités calibrées par intention"""
+        self.load()
+        x = tfidf(term_counts([message], len(self._idf)), self._idf)
+        probabilities = softmax((x @ self._weights + self._bias) / self._temperature)[0]
+        return {label: float(p) for label, p in zip(self.classes, probabilities)}
+
+    def classify(self, message: str) -> Tuple[str, float, bool]:
+        """(intention, probabilité, décision sûre?) - sinon passer par le LLM"""
+        probabilities = self.predict(message)
+        intent = max(probabilities, key=probabilities.get)
+        confidence = probabilities[intent]
+        confident = confidence >= self.threshold
+        if intent != 'emergency' and (probabilities.get('emergency', 0.0) >= EMERGENCY_DOUBT
+                                      or EMERGENCY_TERMS.scan(message)):
+            confident = False
+        return intent, confidence, confident
+
+
+# Instance globale (chargée à la première utilisation)
+intent_classifier = IntentClassifier()
@@ -0,0 +1,140 @@
+"""
+Base locale d'interactions médicamenteuses
+
+Index par paires sur des identifiants de médicaments normalisés, chargé à la
+première utilisation depuis shared/data/drug_interactions.json.
+"""
+
+import os
+import re
+import json
+import bisect
+import threading
+import unicodedata
+from array import array
+from itertools import combinations
+from typing import Dict, List, Optional
+
+from logger import get_logger
+
+log = get_logger('interactions')
+
+
+DATA_PATH = os.environ.get(
+    'INTERACTIONS_DATA_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'drug_interactions.json')
+)
+
+# Niveaux d'interaction
+NONE = 0
+CAUTION = 1
+MAJOR = 2
+CONTRAINDICATED = 3
+UNKNOWN = -1
+
+LEVEL_LABELS = {
+    NONE: "pas d'interaction connue",
+    CAUTION: "précaution",
+    MAJOR: "interaction importante",
+    CONTRAINDICATED: "association déconseillée",
+    UNKNOWN: "inconnue"
+}
+
+_DOSAGE_RE = re.compile(r"\b\d+([.,]\d+)?\s*(mg|g|µg|mcg|ml|ui)?\b")
+
+
+def fold(text: str) -> str:
+    """Minuscules, sans accents, espaces normalisés"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.replace('œ', 'oe').split())
+
+
+class InteractionIndex:
+    """Index compact des paires (clé i*N+j triée + niveaux et faits parallèles)"""
+
+    def __init__(self, path: str = DATA_PATH):
+        self.path = path
+        self.version = ''
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._ids: Dict[str, int] = {}
+        self._aliases: Dict[str, str] = {}
+        self._facts: List[str] = []
+        self._keys = array('q')
+        self._levels = array('b')
+        self._fact_ids = array('h')
+
+    def load(self) -> 'InteractionIndex':
+        """Charge le fichier de données (une seule fois)"""
+        if self._loaded:
+            return self
+
+        with self._lock:
+            if self._loaded:
+                return self
+
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+
+            self.version = data.get('version', '')
+            self._ids = {fold(name): i for i, name in enumerate(data['drugs'])}
+            self._aliases = {fold(k): fold(v) for k, v in data.get('aliases', {}).items()}
+            self._facts = data.get('facts', [])
+
+            n = len(self._ids)
+            rows = sorted((min(i, j) * n + max(i, j), level, fact) for i, j, level, fact in data['pairs'])
+            self._keys = array('q', (r[0] for r in rows))
+            self._levels = array('b', (r[1] for r in rows))
+            self._fact_ids = array('h', (r[2] for r in rows))
+
+            self._loaded = True
+            log.info("Index chargé", medications_count=n, pairs=len(rows), version=self.version)
+
+        return self
+
+    def normalize(self, name: str) -> Optional[str]:
+        """Identifiant normalisé d'un nom commercial ou DCI ("Doliprane 500mg" -> "paracetamol")"""
+        self.load()
+        folded = ' '.join(_DOSAGE_RE.sub(' ', fold(name)).split())
+        candidates = [folded] + folded.split()
+        for candidate in candidates:
+            candidate = self._aliases.get(candidate, candidate)
+            if candidate in self._ids:
+                return candidate
+        return None
+
+    def pair(self, a: str, b: str) -> Dict:
+        """Niveau et fait connu pour deux identifiants normalisés"""
+        self.load()
+        i, j = self._ids[a], self._ids[b]
+        key = min(i, j) * len(self._ids) + max(i, j)
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            fact_id = self._fact_ids[pos]
+            return {
+                'level': self._levels[pos],
+                'fact': self._facts[fact_id] if 0 <= fact_id < len(self._facts) else ''
+            }
+        return {'level': UNKNOWN, 'fact': ''}
+
+    def check(self, medication_names: List[str]) -> List[Dict]:
+        """Toutes les paires (O(k²)) des médicaments de l'utilisateur avec leur niveau"""
+        normalized = [(name, self.normalize(name)) for name in medication_names]
+        results = []
+
+        for (name_a, id_a), (name_b, id_b) in combinations(normalized, 2):
+            if id_a is None or id_b is None:
+                match = {'level': UNKNOWN, 'fact': ''}
+            elif id_a == id_b:
+                match = {'level': MAJOR, 'fact': "Même substance active en double: risque de surdosage."}
+            else:
+                match = self.pair(id_a, id_b)
+
+            results.append({'a': name_a, 'b': name_b, **match})
+
+        return results
+
+
+# Instance globale (chargée à la première utilisation)
+interaction_index = InteractionIndex()
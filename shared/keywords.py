@@ -0,0 +1,125 @@
+"""
+Détection de mots-clés partagée par les agents
+
+Le texte est normalisé une seule fois (minuscules, accents, œ, apostrophes et
+ponctuation), puis parcouru par une seule expression régulière compilée regroupant tous les
+mots-clés d'un agent: le parcours se fait dans le moteur re (en C), sans
+boucle Python par caractère, et une passe retourne toutes les catégories.
+
+Un mot-clé doit commencer en début de mot ("mal" trouve "malade" mais pas
+"normal"); la fin de mot est libre ("tombe" trouve "tombée").
+"""
+
+import re
+import functools
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+class _FoldTable(dict):
+    """Table str.translate calculée à la demande: caractère -> forme normalisée"""
+
+    def __missing__(self, code: int) -> str:
+        decomposed = unicodedata.normalize('NFKD', chr(code).lower())
+        base = ''.join(c for c in decomposed if not unicodedata.combining(c)).replace('œ', 'oe')
+        folded = ''.join(c if 'a' <= c <= 'z' or '0' <= c <= '9' else ' ' for c in base)
+        self[code] = folded
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+# Un même message est normalisé plusieurs fois par requête (classifieur, caches,
+# mots-clés de l'orchestrator puis de l'agent): les derniers résultats sont gardés
+@functools.lru_cache(maxsize=1024)
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation ("J’ai tombé!" -> "j ai tombe")"""
+    return ' '.join(text.translate(_FOLD_TABLE).split())
+
+
+def _trie_regex(patterns: Iterable[str]) -> str:
+    """
+    Alternative factorisée par préfixes communs ("mal|mal poitrine|malaise" ->
+    "mal(?:aise| poitrine)?"): le moteur re ne suit qu'une branche par caractère
+    et, gourmand, capture le plus long mot-clé présent.
+    """
+    trie: Dict = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return body + '?' if len(branches) == 1 and len(body) == 1 else f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Une expression régulière compilée pour toutes les catégories d'un agent"""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self._categories = {name: list(words) for name, words in categories.items()}
+        self._lock = threading.Lock()
+        self._built = False
+        self._regex: Optional[Pattern] = None
+        self._prefixes: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+
+    def _build(self) -> None:
+        """
+        Compile l'alternative de tous les mots-clés normalisés.
+
+        En début de mot, la regex capture le plus long mot-clé présent; les autres
+        mots-clés trouvés à cette position en sont des préfixes ("mal" pour "mal
+        poitrine"): _prefixes les donne, du plus court au plus long.
+        """
+        entries = []
+        for category, words in self._categories.items():
+            for word in words:
+                pattern = normalize(word)
+                if pattern and (category, pattern) not in entries:
+                    entries.append((category, pattern))
+
+        patterns = sorted({pattern for _, pattern in entries}, key=len, reverse=True)
+        self._prefixes = {
+            longest: tuple(sorted(((c, p) for c, p in entries if longest.startswith(p)),
+                                  key=lambda entry: len(entry[1])))
+            for longest in patterns
+        }
+        if patterns:
+            # Espace littéral (texte préfixé d'un espace): début de mot trouvé par la recherche
+            # rapide de préfixe du moteur re. Lookahead: les mots-clés qui se chevauchent restent visibles
+            self._regex = re.compile(r" (?=(" + _trie_regex(patterns) + "))")
+        self._built = True
+
+    def scan_normalized(self, text: str) -> Dict[str, List[str]]:
+        """Comme scan(), sur un texte déjà passé par normalize()"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+
+        hits: Dict[str, List[str]] = {}
+        if self._regex is None:
+            return hits
+
+        prefixes = self._prefixes
+        for longest in self._regex.findall(' ' + text):
+            for category, pattern in prefixes[longest]:
+                found = hits.setdefault(category, [])
+                if pattern not in found:
+                    found.append(pattern)
+        return hits
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Catégories trouvées dans le texte -> mots-clés (normalisés) correspondants"""
+        return self.scan_normalized(normalize(text))
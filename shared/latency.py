@@ -0,0 +1,37 @@
+"""
+Distributions de latence simulée (faux LLM, serveur mock)
+
+Description en ms:
+  "200"                  constante
+  "uniform:100:400"      uniforme entre deux bornes
+  "normal:300:50"        normale (moyenne, écart-type), bornée à 0
+  "lognormal:300:0.5"    log-normale (médiane, sigma): longue traîne
+  "pareto:200:1.5"       Pareto (minimum, alpha): traîne très lourde
+"""
+
+import math
+import random
+from typing import Callable
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Distribution de latence (ms) à partir de sa description"""
+    kind, _, params = str(spec).strip().partition(':')
+    if not params:
+        constant = float(kind or 0)
+        return lambda rng: constant
+
+    values = [float(v) for v in params.split(':')]
+    if kind == 'uniform':
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'normal':
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if kind == 'pareto':
+        minimum, alpha = values
+        return lambda rng: minimum * rng.paretovariate(alpha)
+    raise ValueError(f"Latence inconnue: {spec}")
@@ -0,0 +1,72 @@
+"""
+Construction différée des objets coûteux (clients LLM, graphes LangGraph)
+
+Importer langchain_anthropic et langgraph puis compiler un graphe coûte
+plusieurs secondes au démarrage à froid d'une Lambda. Lazy(factory) garde le
+nom global attendu par les modules (llm.invoke(...), agent.invoke(...)) mais
+n'appelle factory qu'au premier accès, une seule fois, même en concurrence.
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict
+
+from logger import get_logger
+
+log = get_logger('lazy')
+
+
+class Lazy:
+    """Mandataire: construit l'objet au premier attribut demandé"""
+
+    def __init__(self, factory: Callable[[], Any], name: str = ''):
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'objet')
+        self._lock = threading.Lock()
+        self._instance = None
+        self._built = False
+
+    def get(self) -> Any:
+        """Objet construit (construction au premier appel)"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    start = time.perf_counter()
+                    self._instance = self._factory()
+                    self._built = True
+                    log.info("Ressource prête", name=self._name,
+                             duration_ms=round((time.perf_counter() - start) * 1000))
+        return self._instance
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def invoke(self, *args, **kwargs) -> Any:
+        # Méthode explicite: la compilation LangGraph inspecte llm.invoke dans
+        # les nœuds, ce qui ne doit pas construire le client
+        return self.get().invoke(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        # Les sondes d'introspection (__self__, __wrapped__...) ne construisent rien
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        return f"Lazy({self._name}, {'construit' if self._built else 'différé'})"
+
+
+def preload(*objects: Any) -> Dict:
+    """Ping de préchauffage: construit les objets différés et charge ceux qui ont load()"""
+    start = time.perf_counter()
+    loaded = []
+    for obj in objects:
+        if isinstance(obj, Lazy):
+            obj.get()
+            loaded.append(obj._name)
+        elif hasattr(obj, 'load'):
+            obj.load()
+            loaded.append(type(obj).__name__)
+    return {'warmup': True, 'preloaded': loaded,
+            'duration_ms': round((time.perf_counter() - start) * 1000)}
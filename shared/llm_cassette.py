@@ -0,0 +1,266 @@
+"""
+Enregistrement / rejeu des appels LLM (cassettes)
+
+Pour comparer deux optimisations, il faut les mêmes réponses et les mêmes
+latences à chaque exécution. CassetteChatModel enveloppe le modèle partagé
+(chat_model.create_chat_model):
+
+  LLM_CASSETTE=chemin.json[.gz]   fichier cassette (active l'enveloppe)
+  LLM_CASSETTE_MODE=record        appelle le vrai modèle et enregistre
+  LLM_CASSETTE_MODE=replay        sert les réponses enregistrées (défaut)
+  LLM_CASSETTE_LATENCY=0          facteur de latence au rejeu: 0 = aucune,
+                                  1 = latences observées, 0.5 = moitié...
+
+Une entrée par empreinte de prompt (sha256 des messages + schéma): réponse,
+usage de tokens et latence observée. Un même prompt enregistré plusieurs fois
+garde ses réponses successives, rejouées dans l'ordre puis en boucle.
+"""
+
+import os
+import gzip
+import json
+import time
+import atexit
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+from logger import get_logger
+
+log = get_logger('cassette')
+
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(KeyError):
+    """Prompt absent de la cassette (mode replay)"""
+
+
+class RecordedError(Exception):
+    """Erreur du modèle enregistrée, relevée au rejeu"""
+
+
+def prompt_key(messages, schema=None) -> str:
+    """Empreinte courte du prompt (type et contenu des messages, schéma structuré)"""
+    if isinstance(messages, str):
+        parts = [['human', messages]]
+    else:
+        parts = [[getattr(m, 'type', ''), m.content] for m in messages]
+    payload = json.dumps({'m': parts, 's': schema.__name__ if schema else None},
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# ===== CASSETTE =====
+
+class Cassette:
+    """Fichier cassette: {empreinte: [interactions]}, partagé par tous les modèles du processus"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: Dict[str, List[Dict]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.stats = {'hits': 0, 'misses': 0, 'recorded': 0}
+        self.load()
+
+    def _open(self, mode: str):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode + 't', encoding='utf-8')
+        return open(self.path, mode, encoding='utf-8')
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with self._open('r') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Version de cassette non supportée: {data.get('version')}")
+        self.interactions = data.get('interactions', {})
+        log.info("Cassette chargée", path=self.path, interactions=sum(len(v) for v in self.interactions.values()))
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._open('w') as f:
+                json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions}, f,
+                          ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+            self._dirty = False
+        log.info("Cassette sauvegardée", path=self.path, recorded=self.stats['recorded'])
+
+    def record(self, key: str, entry: Dict) -> None:
+        with self._lock:
+            self.interactions.setdefault(key, []).append(entry)
+            self.stats['recorded'] += 1
+            self._dirty = True
+
+    def next(self, key: str) -> Dict:
+        """Prochaine interaction enregistrée pour ce prompt"""
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                self.stats['misses'] += 1
+                raise CassetteMiss(key)
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.stats['hits'] += 1
+            return entries[cursor % len(entries)]
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str) -> Cassette:
+    """Une seule cassette par fichier, sauvegardée à la sortie du processus"""
+    with _cassettes_lock:
+        if path not in _cassettes:
+            cassette = Cassette(path)
+            atexit.register(cassette.save)
+            _cassettes[path] = cassette
+        return _cassettes[path]
+
+
+# ===== SÉRIALISATION =====
+
+def _usage(message) -> Optional[Dict]:
+    usage = getattr(message, 'usage_metadata', None)
+    return dict(usage) if usage else None
+
+
+def _dump_message(message) -> Dict:
+    entry = {'content': message.content, 'usage': _usage(message)}
+    if getattr(message, 'tool_calls', None):
+        entry['tool_calls'] = [{'name': c['name'], 'args': c['args'], 'id': c.get('id')}
+                               for c in message.tool_calls]
+    return entry
+
+
+def _load_message(entry: Dict) -> AIMessage:
+    tool_calls = [{'name': c['name'], 'args': c['args'], 'id': c.get('id'), 'type': 'tool_call'}
+                  for c in entry.get('tool_calls', [])]
+    return AIMessage(content=entry['content'], usage_metadata=entry.get('usage'),
+                     tool_calls=tool_calls, response_metadata={'cassette': True})
+
+
+def _dump_structured(result, include_raw: bool) -> Dict:
+    if not include_raw:
+        parsed = result.model_dump() if hasattr(result, 'model_dump') else result
+        return {'parsed': parsed}
+    parsed = result.get('parsed')
+    error = result.get('parsing_error')
+    return {
+        'raw': _dump_message(result['raw']) if result.get('raw') is not None else None,
+        'parsed': parsed.model_dump() if hasattr(parsed, 'model_dump') else parsed,
+        'parsing_error': str(error) if error else None
+    }
+
+
+def _load_structured(entry: Dict, schema, include_raw: bool):
+    parsed = entry['parsed']
+    if parsed is not None and hasattr(schema, 'model_validate'):
+        parsed = schema.model_validate(parsed)
+    if not include_raw:
+        return parsed
+    raw = _load_message(entry['raw']) if entry.get('raw') else None
+    error = entry.get('parsing_error')
+    return {'raw': raw, 'parsed': parsed, 'parsing_error': ValueError(error) if error else None}
+
+
+# ===== MODÈLE =====
+
+class CassetteChatModel:
+    """Enveloppe d'un modèle de chat: enregistre (record) ou rejoue (replay) ses réponses"""
+
+    def __init__(self, model_factory, cassette: Cassette, mode: str = 'replay',
+                 latency_factor: float = 0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Mode de cassette inconnu: {mode}")
+        self._model_factory = model_factory
+        self._model = None
+        self._lock = threading.Lock()
+        self.cassette = cassette
+        self.mode = mode
+        self.latency_factor = latency_factor
+
+    @classmethod
+    def from_env(cls, model_factory) -> 'CassetteChatModel':
+        return cls(
+            model_factory,
+            get_cassette(os.environ['LLM_CASSETTE']),
+            mode=os.environ.get('LLM_CASSETTE_MODE', 'replay'),
+            latency_factor=float(os.environ.get('LLM_CASSETTE_LATENCY', '0'))
+        )
+
+    @property
+    def model(self):
+        """Vrai modèle, construit seulement en mode record"""
+        with self._lock:
+            if self._model is None:
+                self._model = self._model_factory()
+            return self._model
+
+    def _call(self, key: str, call, dump, load):
+        if self.mode == 'replay':
+            entry = self.cassette.next(key)
+            if self.latency_factor and entry.get('latency_ms'):
+                time.sleep(entry['latency_ms'] * self.latency_factor / 1000)
+            if 'error' in entry:
+                raise RecordedError(entry['error'])
+            return load(entry)
+
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            self.cassette.record(key, {'error': f"{type(e).__name__}: {e}",
+                                       'latency_ms': round((time.perf_counter() - start) * 1000, 1)})
+            raise
+        entry = dump(result)
+        entry['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self.cassette.record(key, entry)
+        return result
+
+    def invoke(self, messages, config=None, **kwargs):
+        return self._call(
+            prompt_key(messages),
+            lambda: self.model.invoke(messages, config, **kwargs),
+            _dump_message,
+            _load_message
+        )
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs) -> 'CassetteStructuredModel':
+        return CassetteStructuredModel(self, schema, include_raw, kwargs)
+
+
+class CassetteStructuredModel:
+    """Sortie structurée enregistrée / rejouée (comme with_structured_output)"""
+
+    def __init__(self, parent: CassetteChatModel, schema, include_raw: bool, options: Dict):
+        self.parent = parent
+        self.schema = schema
+        self.include_raw = include_raw
+        self.options = options
+        self._runnable = None
+
+    def _structured(self):
+        if self._runnable is None:
+            self._runnable = self.parent.model.with_structured_output(
+                self.schema, include_raw=self.include_raw, **self.options)
+        return self._runnable
+
+    def invoke(self, messages, config=None, **kwargs):
+        return self.parent._call(
+            prompt_key(messages, self.schema),
+            lambda: self._structured().invoke(messages, config, **kwargs),
+            lambda result: _dump_structured(result, self.include_raw),
+            lambda entry: _load_structured(entry, self.schema, self.include_raw)
+        )
@@ -0,0 +1,279 @@
+"""
+Journalisation structurée: niveaux, échantillonnage, écriture asynchrone, masquage
+
+Remplace les print("[TAG] ...") des agents et des modules partagés:
+    log = get_logger('orchestrator')
+    log.info("Intent détecté", intent=intent, message=message)
+
+Le message est fixe, les valeurs passent en champs: rien n'est sérialisé si le
+niveau est désactivé ou l'enregistrement écarté par l'échantillonnage. L'écriture
+sur stdout se fait dans un thread dédié (file bornée, enregistrements en trop
+abandonnés et comptés): la requête n'attend jamais les entrées/sorties.
+
+Configuration:
+  LOG_LEVEL=INFO                      niveau global (DEBUG, INFO, WARNING, ERROR)
+  LOG_LEVELS=orchestrator=DEBUG,...   niveau par logger (préfixe de nom)
+  LOG_SAMPLE=orchestrator=0.1,...     part des DEBUG/INFO conservés par logger
+                                      (WARNING et au-delà toujours écrits)
+  LOG_FORMAT=json|text                json par défaut dans Lambda, text en local
+  LOG_REDACT=0                        afficher les contenus (messages, réponses...)
+  LOG_ASYNC=0                         écriture synchrone (débogage)
+
+Les champs de REDACTED_FIELDS (textes du patient, réponses, téléphones) sont
+remplacés par leur taille. Les lignes EMF de metrics.py restent des print.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+ROOT_LOGGER = 'smartdoc'
+
+# Champs au contenu médical ou personnel: seule leur taille est journalisée
+REDACTED_FIELDS = frozenset({
+    'message', 'messages', 'body', 'content', 'prompt', 'response', 'final_response',
+    'reply', 'guidance', 'symptoms', 'user_message', 'assistant_response',
+    'phone', 'phone_number', 'email', 'medical_conditions', 'medications',
+    'appointments', 'notes', 'instructions'
+})
+
+QUEUE_SIZE = 10000
+
+# Champs ajoutés à chaque enregistrement de la requête en cours (correlation_id...)
+_context: contextvars.ContextVar = contextvars.ContextVar('log_context', default={})
+
+
+def _env_map(name: str) -> Dict[str, str]:
+    """"a=1,b=2" -> {'a': '1', 'b': '2'}"""
+    pairs = (item.split('=', 1) for item in os.environ.get(name, '').split(',') if '=' in item)
+    return {key.strip(): value.strip() for key, value in pairs}
+
+
+def _for_name(settings: Dict[str, str], name: str) -> Optional[str]:
+    """Réglage du plus long préfixe correspondant (orchestrator couvre orchestrator.handler)"""
+    matches = [key for key in settings if name == key or name.startswith(key + '.')]
+    return settings[max(matches, key=len)] if matches else None
+
+
+def redact(value: Any, key: Optional[str] = None) -> Any:
+    """Remplace les champs sensibles par leur taille, récursivement"""
+    if key in REDACTED_FIELDS and value:
+        if isinstance(value, (str, list, tuple, dict)):
+            return f"<masqué: {len(value)}>"
+        return '<masqué>'
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def snapshot(value: Any) -> Any:
+    """Copie des conteneurs: l'appelant peut les modifier avant l'écriture asynchrone"""
+    if isinstance(value, dict):
+        return {k: snapshot(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [snapshot(v) for v in value]
+    return value
+
+
+def bind(**fields) -> contextvars.Token:
+    """Champs communs aux enregistrements suivants (contexte courant et branches du graph)"""
+    return _context.set({**_context.get(), **fields})
+
+
+def unbind(token: contextvars.Token) -> None:
+    _context.reset(token)
+
+
+# ===== FORMATS =====
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement (requêtable dans CloudWatch Logs Insights)"""
+
+    def __init__(self, redacted: bool = True):
+        super().__init__()
+        self.redacted = redacted
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name[len(ROOT_LOGGER) + 1:],
+            'msg': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(redact(fields) if self.redacted else fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """"[TAG] message clé=valeur", comme les anciens print"""
+
+    def __init__(self, redacted: bool = True):
+        super().__init__()
+        self.redacted = redacted
+
+    def format(self, record: logging.LogRecord) -> str:
+        tag = record.name[len(ROOT_LOGGER) + 1:].replace('.', ' ').replace('_', ' ').upper()
+        line = f"[{tag}] {record.getMessage()}"
+        if record.levelno >= logging.WARNING:
+            line = f"[{tag}] {record.levelname}: {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            values = redact(fields) if self.redacted else fields
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in values.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+# ===== ÉCRITURE ASYNCHRONE =====
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """File bornée: si l'écriture prend du retard, l'enregistrement est abandonné (jamais d'attente)"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Même processus: formatage laissé au thread d'écriture, sur une copie des champs
+        # (une liste ou un dict modifié après l'appel ne change pas l'enregistrement)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = snapshot(fields)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogConfig:
+    """Handlers du logger racine smartdoc, configurés une fois à l'import"""
+
+    def __init__(self):
+        in_lambda = bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+        fmt = os.environ.get('LOG_FORMAT', 'json' if in_lambda else 'text')
+        redacted = os.environ.get('LOG_REDACT', '1').lower() not in ('0', 'false', 'no')
+        formatter = JsonFormatter(redacted) if fmt == 'json' else TextFormatter(redacted)
+
+        self.levels = _env_map('LOG_LEVELS')
+        self.samples = _env_map('LOG_SAMPLE')
+        self.stream = logging.StreamHandler(sys.stdout)
+        self.stream.setFormatter(formatter)
+
+        self.root = logging.getLogger(ROOT_LOGGER)
+        self.root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        # Le runtime Lambda configure le logger racine: pas de double écriture
+        self.root.propagate = False
+
+        self.queue = None
+        self.listener = None
+        if os.environ.get('LOG_ASYNC', '1').lower() in ('0', 'false', 'no'):
+            self.handler = self.stream
+        else:
+            self.queue = queue.Queue(QUEUE_SIZE)
+            self.handler = DroppingQueueHandler(self.queue)
+            self.listener = logging.handlers.QueueListener(self.queue, self.stream)
+            self.listener.start()
+            atexit.register(self.close)
+        self.root.addHandler(self.handler)
+
+    def flush(self, timeout: float = 1.0) -> None:
+        """Attend l'écriture des enregistrements en file (fin de requête Lambda, avant gel)"""
+        if self.queue is not None:
+            with self.queue.all_tasks_done:
+                if self.queue.unfinished_tasks:
+                    self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Vide la file puis arrête le thread d'écriture (fin du processus)"""
+        if self.listener is None or self.listener._thread is None:
+            return
+        self.flush(timeout=5.0)
+        try:
+            self.listener.stop()
+        except queue.Full:
+            print(f"[LOG] File pleine à l'arrêt, {self.queue.qsize()} enregistrement(s) perdus", file=sys.stderr)
+
+    @property
+    def dropped(self) -> int:
+        return getattr(self.handler, 'dropped', 0)
+
+
+# ===== LOGGER =====
+
+class StructuredLogger:
+    """Logger à champs nommés: log.info("Message fixe", clé=valeur)"""
+
+    def __init__(self, name: str, config: LogConfig):
+        self.name = name
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+        level = _for_name(config.levels, name)
+        if level:
+            self.logger.setLevel(level.upper())
+        self.sample_rate = float(_for_name(config.samples, name) or 1)
+        self._rng = random.Random()
+
+    def _log(self, level: int, msg: str, fields: Dict, exc_info=None) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self.sample_rate < 1 and self._rng.random() >= self.sample_rate:
+            return
+        context = _context.get()
+        if context:
+            fields = {**context, **fields}
+        if exc_info:
+            exc_info = sys.exc_info()
+        # Sans findCaller (fichier/ligne non journalisés): enregistrement construit directement
+        record = self.logger.makeRecord(self.logger.name, level, '', 0, msg, (), exc_info,
+                                        extra={'fields': fields})
+        self.logger.handle(record)
+
+    def enabled(self, level: int = logging.DEBUG) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, msg: str, **fields) -> None:
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields) -> None:
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg: str, **fields) -> None:
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg: str, **fields) -> None:
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg: str, **fields) -> None:
+        """ERROR avec la trace de l'exception en cours"""
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name, config)
+
+
+def flush_logs(timeout: float = 1.0) -> None:
+    config.flush(timeout)
+
+
+# Instance globale
+config = LogConfig()
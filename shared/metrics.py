@@ -0,0 +1,357 @@
+"""
+Métriques en mémoire: compteurs et histogrammes à seaux fixes
+
+Chemin chaud sans verrou: chaque thread incrémente ses propres cellules, la
+lecture (export) fait la somme. Deux exports, sans dépendance ni réseau:
+  - texte Prometheus (endpoint /metrics des serveurs locaux),
+  - lignes CloudWatch Embedded Metric Format (EMF) écrites sur stdout par les
+    handlers Lambda: CloudWatch Logs les convertit en métriques. Actif par
+    défaut dans Lambda, forcé avec METRICS_EMF=1 / désactivé avec METRICS_EMF=0.
+
+Les dictionnaires de statistiques existants (caches, triage...) sont exportés
+tels quels via register_stats, sans toucher à leur code.
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from logger import get_logger
+
+log = get_logger('metrics')
+
+
+# Seaux de latence (ms)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Observations conservées par série entre deux flush EMF (limite EMF: 100 valeurs)
+EMF_MAX_VALUES = 100
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _label_key(label_names: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, '')) for name in label_names)
+
+
+def _format_labels(label_names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Metric:
+    """Base: cellules par thread et par combinaison de labels"""
+
+    kind = ''
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), unit: str = 'Count'):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.unit = unit
+        self._local = threading.local()
+        self._cells: List[Tuple[threading.Thread, Dict]] = []  # Une table {labels: cellule} par thread
+        self._retired: Dict = {}  # Cellules des threads terminés, fusionnées
+        self._lock = threading.Lock()
+
+    def _thread_cells(self) -> Dict:
+        cells = getattr(self._local, 'cells', None)
+        if cells is None:
+            cells = {}
+            with self._lock:
+                self._cells.append((threading.current_thread(), cells))
+            self._local.cells = cells
+        return cells
+
+    def _merge(self, into: Dict, key: Tuple[str, ...], cell) -> None:
+        raise NotImplementedError
+
+    def _snapshot_cells(self) -> List[Dict]:
+        """Tables de tous les threads; celles des threads terminés sont fusionnées (un thread par requête)"""
+        with self._lock:
+            alive = []
+            for thread, cells in self._cells:
+                if thread.is_alive():
+                    alive.append((thread, cells))
+                else:
+                    for key, cell in cells.items():
+                        self._merge(self._retired, key, cell)
+            self._cells = alive
+            return [dict(self._retired)] + [dict(cells) for _, cells in alive]
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        cells = self._thread_cells()
+        key = _label_key(self.label_names, labels)
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0]
+        cell[0] += amount
+
+    def _merge(self, into: Dict, key: Tuple[str, ...], cell) -> None:
+        into.setdefault(key, [0])[0] += cell[0]
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        totals = {}
+        for cells in self._snapshot_cells():
+            for key, cell in cells.items():
+                totals[key] = totals.get(key, 0) + cell[0]
+        return totals
+
+
+class Histogram(_Metric):
+    """Histogramme à seaux fixes (bornes supérieures incluses, +Inf implicite)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS, unit: str = 'Milliseconds'):
+        super().__init__(name, description, labels, unit)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        cells = self._thread_cells()
+        key = _label_key(self.label_names, labels)
+        cell = cells.get(key)
+        if cell is None:
+            # [compte par seau (+Inf en dernier), somme, nombre, valeurs pour EMF]
+            cell = cells[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, []]
+        cell[0][bisect.bisect_left(self.buckets, value)] += 1
+        cell[1] += value
+        cell[2] += 1
+        if len(cell[3]) < EMF_MAX_VALUES:
+            cell[3].append(value)
+
+    def _merge(self, into: Dict, key: Tuple[str, ...], cell) -> None:
+        target = into.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0, []])
+        for i, count in enumerate(cell[0]):
+            target[0][i] += count
+        target[1] += cell[1]
+        target[2] += cell[2]
+        target[3].extend(cell[3][:EMF_MAX_VALUES - len(target[3])])
+
+    def values(self) -> Dict[Tuple[str, ...], Dict]:
+        totals = {}
+        for cells in self._snapshot_cells():
+            for key, cell in cells.items():
+                total = totals.setdefault(key, {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0})
+                for i, count in enumerate(cell[0]):
+                    total['buckets'][i] += count
+                total['sum'] += cell[1]
+                total['count'] += cell[2]
+        return totals
+
+    def drain_values(self) -> Dict[Tuple[str, ...], List[float]]:
+        """Observations depuis le dernier appel (export EMF, au mieux: une valeur concurrente peut manquer)"""
+        drained = {}
+        for cells in self._snapshot_cells():
+            for key, cell in cells.items():
+                values, cell[3] = cell[3], []
+                if values:
+                    drained.setdefault(key, []).extend(values)
+        return drained
+
+
+class MetricsRegistry:
+    """Registre des métriques du processus et des dictionnaires de statistiques"""
+
+    def __init__(self, namespace: str = 'SmartDoc'):
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self._stats: Dict[str, Tuple[Callable[[], Dict], str, str]] = {}
+        self._emf_last: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def register_stats(self, name: str, source, description: str = '', label: str = 'event') -> None:
+        """Exporte un dict de statistiques existant ({clé: nombre}) comme compteur à un label"""
+        getter = source if callable(source) else (lambda: source)
+        with self._lock:
+            self._stats[name] = (getter, description or name, label)
+
+    def _stats_counters(self) -> List[Tuple[str, str, str, Dict[Tuple[str, ...], float]]]:
+        with self._lock:
+            stats = list(self._stats.items())
+        exported = []
+        for name, (getter, description, label) in stats:
+            try:
+                values = {(str(key),): value for key, value in dict(getter()).items()
+                          if isinstance(value, (int, float)) and not isinstance(value, bool)}
+            except Exception as e:
+                log.warning("Statistiques illisibles", stats=name, error=str(e))
+                continue
+            exported.append((name, description, label, values))
+        return exported
+
+    # ===== EXPORT PROMETHEUS =====
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Counter):
+                for key, value in sorted(metric.values().items()):
+                    lines.append(f"{metric.name}{_format_labels(metric.label_names, key)} {value:g}")
+                continue
+            for key, total in sorted(metric.values().items()):
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + ['+Inf'], total['buckets']):
+                    cumulative += count
+                    le = f'le="{bound:g}"' if bound != '+Inf' else 'le="+Inf"'
+                    lines.append(f"{metric.name}_bucket{_format_labels(metric.label_names, key, le)} {cumulative}")
+                labels = _format_labels(metric.label_names, key)
+                lines.append(f"{metric.name}_sum{labels} {total['sum']:g}")
+                lines.append(f"{metric.name}_count{labels} {total['count']}")
+
+        for name, description, label, values in self._stats_counters():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels((label,), key)} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+    # ===== EXPORT EMF (LAMBDA) =====
+
+    @staticmethod
+    def emf_enabled() -> bool:
+        setting = os.environ.get('METRICS_EMF')
+        if setting is not None:
+            return setting.lower() in ('1', 'true', 'yes')
+        return bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+
+    def _delta(self, name: str, key: Tuple[str, ...], value: float) -> float:
+        """Écart depuis le dernier flush (le conteneur Lambda garde les compteurs)"""
+        last = self._emf_last.get((name, key), 0)
+        self._emf_last[(name, key)] = value
+        return value - last
+
+    def emf_records(self, dimensions: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Une entrée EMF par métrique et combinaison de labels ayant changé"""
+        dimensions = dimensions or {}
+        timestamp = int(time.time() * 1000)
+        records = []
+
+        def record(name: str, unit: str, label_names: Tuple[str, ...], key: Tuple[str, ...], value):
+            labels = dict(zip(label_names, key))
+            record_dimensions = {**dimensions, **labels}
+            records.append({
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [list(record_dimensions)],
+                        'Metrics': [{'Name': name, 'Unit': unit}]
+                    }]
+                },
+                **record_dimensions,
+                name: value
+            })
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+            for metric in metrics:
+                if isinstance(metric, Counter):
+                    for key, value in sorted(metric.values().items()):
+                        delta = self._delta(metric.name, key, value)
+                        if delta:
+                            record(metric.name, metric.unit, metric.label_names, key, delta)
+                else:
+                    for key, values in sorted(metric.drain_values().items()):
+                        record(metric.name, metric.unit, metric.label_names, key, values)
+
+        for name, _, label, values in self._stats_counters():
+            with self._lock:
+                for key, value in sorted(values.items()):
+                    delta = self._delta(name, key, value)
+                    if delta:
+                        record(name, 'Count', (label,), key, delta)
+        return records
+
+    def flush_emf(self, **dimensions) -> int:
+        """Écrit les lignes EMF (si actif), retourne leur nombre"""
+        if not self.emf_enabled():
+            return 0
+        records = self.emf_records(dimensions)
+        # Une écriture par ligne: pas d'entrelacement avec le thread des journaux
+        for entry in records:
+            sys.stdout.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        return len(records)
+
+
+class Instrumented:
+    """
+    Mandataire qui chronomètre chaque méthode appelée (label operation=prefix + nom).
+
+    Les méthodes de `skip` (accesseurs sans I/O) sont transmises sans mesure.
+    """
+
+    def __init__(self, target, histogram: Histogram, errors: Optional[Counter] = None,
+                 prefix: str = '', skip: Tuple[str, ...] = ()):
+        self._target = target
+        self._histogram = histogram
+        self._errors = errors
+        self._prefix = prefix
+        self._skip = frozenset(skip)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if name.startswith('_') or name in self._skip or not callable(attribute):
+            return attribute
+
+        histogram, errors, operation = self._histogram, self._errors, self._prefix + name
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(operation=operation)
+                raise
+            finally:
+                histogram.observe((time.perf_counter() - start) * 1000, operation=operation)
+
+        # Mis en cache: les appels suivants ne repassent pas par __getattr__
+        self.__dict__[name] = timed
+        return timed
+
+
+# Instance globale et métriques communes
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter('smartdoc_requests_total', "Requêtes traitées", ('intent', 'agent', 'status'))
+REQUEST_LATENCY = metrics.histogram('smartdoc_request_latency_ms', "Durée de traitement d'une requête (ms)",
+                                    ('intent',))
+AGENT_REQUESTS = metrics.counter('smartdoc_agent_requests_total', "Invocations des agents spécialisés",
+                                 ('agent', 'status'))
+LLM_CALLS = metrics.counter('smartdoc_llm_calls_total', "Appels LLM", ('kind', 'status'))
+LLM_LATENCY = metrics.histogram('smartdoc_llm_latency_ms', "Latence des appels LLM (ms)", ('kind',))
+LLM_TOKENS = metrics.counter('smartdoc_llm_tokens_total', "Tokens consommés", ('direction',))
+DB_LATENCY = metrics.histogram('smartdoc_db_latency_ms', "Latence des opérations base de données (ms)",
+                               ('operation',))
+DB_ERRORS = metrics.counter('smartdoc_db_errors_total', "Erreurs base de données", ('operation',))
+SMS_SENT = metrics.counter('smartdoc_sms_total', "SMS d'alerte envoyés", ('status',))
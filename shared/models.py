@@ -2,7 +2,7 @@
 Data models pour SmartDoc Assistant
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -73,3 +73,24 @@ class Emergency(BaseModel):
     message: str
     actions_taken: List[str] = Field(default_factory=list)
     resolved: bool = False
+
+
+class SymptomTriage(BaseModel):
+    """Résultat structuré du triage des symptômes"""
+    severity: Literal["mild", "moderate", "severe", "critical"] = Field(
+        description="Gravité: mild, moderate, severe ou critical"
+    )
+    symptoms: List[str] = Field(default_factory=list, description="Symptômes identifiés")
+    needs_immediate_attention: bool = False
+
+
+class IntentReply(BaseModel):
+    """Intention du message et, pour la conversation générale, la réponse"""
+    intent: Literal["medication", "symptom", "appointment", "emergency", "general"] = Field(
+        description="Catégorie du message"
+    )
+    confidence: float = Field(default=0.0, ge=0.0, le=1.0, description="Certitude de la catégorie (0 à 1)")
+    reply: Optional[str] = Field(
+        default=None,
+        description="Réponse au patient, uniquement si intent = general"
+    )
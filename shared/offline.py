@@ -0,0 +1,45 @@
+"""
+Mode hors-ligne: tous les fournisseurs simulés, sans AWS ni réseau
+
+  LLM_PROVIDER=fake        faux modèle déterministe (fake_llm.py)
+  DATABASE_BACKEND=memory  base en mémoire, préremplie avec test_data.py
+  SNS_BACKEND=log          SMS journalisés
+  LAMBDA_BACKEND=local     agents spécialisés appelés dans ce processus
+  stores (caches, outbox, journal des prises): sqlite en mémoire
+
+Les backends sont choisis à l'import des modules: appeler enable() avant
+d'importer les agents. Les variables déjà définies sont respectées.
+"""
+
+import os
+from typing import Dict, Optional
+
+
+OFFLINE_ENV = {
+    'AWS_REGION': 'us-east-1',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'LLM_PROVIDER': 'fake',
+    'DATABASE_BACKEND': 'memory',
+    'SNS_BACKEND': 'log',
+    'LAMBDA_BACKEND': 'local',
+    'INTENT_CACHE_BACKEND': 'memory',
+}
+
+
+def enable(fake_llm: bool = True, latency: Optional[str] = None, error_rate: Optional[float] = None,
+           seed: Optional[int] = None) -> Dict[str, str]:
+    """Active le mode hors-ligne (fake_llm=False garde le vrai LLM), retourne la configuration"""
+    for key, value in OFFLINE_ENV.items():
+        if key == 'LLM_PROVIDER' and not fake_llm:
+            continue
+        os.environ.setdefault(key, value)
+
+    if latency is not None:
+        os.environ['FAKE_LLM_LATENCY'] = str(latency)
+    if error_rate is not None:
+        os.environ['FAKE_LLM_ERROR_RATE'] = str(error_rate)
+    if seed is not None:
+        os.environ['FAKE_LLM_SEED'] = str(seed)
+
+    return {key: os.environ[key] for key in list(OFFLINE_ENV) + ['FAKE_LLM_LATENCY', 'FAKE_LLM_ERROR_RATE']
+            if key in os.environ}
@@ -0,0 +1,451 @@
+"""
+Outbox durable pour les effets de bord des urgences
+
+L'urgence est enregistrée d'abord (clé d'idempotence), puis les notifications
+sont mises en file. Un drainer les délivre et marque chacune comme faite:
+un retry client ne renvoie jamais un SMS déjà délivré. Les entrées laissées
+en attente (Lambda tuée, échec SNS) sont reprises par un balayage planifié.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Callable, Tuple
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from metrics import Instrumented, DB_LATENCY, DB_ERRORS
+from logger import get_logger
+
+log = get_logger('outbox')
+
+
+# Statuts d'une entrée d'outbox
+PENDING = 'pending'
+SENDING = 'sending'
+DONE = 'done'
+FAILED = 'failed'
+
+# Durée après laquelle une entrée "sending" abandonnée (Lambda timeout) est reprise
+LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '60'))
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+
+# Fenêtre utilisée pour dériver une clé quand le client n'en fournit pas
+IDEMPOTENCY_WINDOW_SECONDS = int(os.environ.get('OUTBOX_IDEMPOTENCY_WINDOW', '300'))
+
+
+def make_idempotency_key(user_id: str, message: str, now: Optional[float] = None) -> str:
+    """Dérive une clé d'idempotence stable pour un même message dans la fenêtre"""
+    now = time.time() if now is None else now
+    bucket = int(now // IDEMPOTENCY_WINDOW_SECONDS)
+    raw = f"{user_id}|{' '.join(message.lower().split())}|{bucket}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def emergency_id_for(idempotency_key: str) -> str:
+    """ID d'urgence déterministe: la même clé donne toujours la même urgence"""
+    return f"emg_{idempotency_key[:20]}"
+
+
+def sms_entry_id(idempotency_key: str, phone: str, severity: str) -> str:
+    """ID d'entrée déterministe: un seul SMS par contact, urgence et niveau de gravité"""
+    return f"{idempotency_key}:sms:{severity}:{phone}"
+
+
+class SQLiteOutboxStore:
+    """Backend local (fichier SQLite) pour tests hors-ligne et serveurs locaux"""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS emergencies (
+                emergency_id TEXT PRIMARY KEY,
+                idempotency_key TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                last_seen_at INTEGER NOT NULL DEFAULT 0,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS emergencies_user ON emergencies (user_id, last_seen_at);
+            CREATE TABLE IF NOT EXISTS outbox (
+                entry_id TEXT PRIMARY KEY,
+                idempotency_key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                created_at TEXT NOT NULL,
+                delivered_at TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS outbox_key ON outbox (idempotency_key);
+            CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, claimed_at);
+        """)
+
+    def save_emergency_once(self, emergency_data: Dict) -> Tuple[Dict, bool]:
+        """Enregistre l'urgence si absente. Retourne (urgence, créée?)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO emergencies (emergency_id, idempotency_key, user_id, last_seen_at, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (emergency_data['emergency_id'], emergency_data['idempotency_key'],
+                 emergency_data['user_id'], emergency_data.get('last_seen_at', 0),
+                 json.dumps(emergency_data, ensure_ascii=False))
+            )
+            if cursor.rowcount:
+                return emergency_data, True
+            row = self._conn.execute(
+                'SELECT data FROM emergencies WHERE emergency_id = ?',
+                (emergency_data['emergency_id'],)
+            ).fetchone()
+            return json.loads(row[0]), False
+
+    def latest_open_emergency(self, user_id: str) -> Optional[Dict]:
+        """Dernière urgence non résolue d'un utilisateur"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT data FROM emergencies WHERE user_id = ? ORDER BY last_seen_at DESC LIMIT 5',
+                (user_id,)
+            ).fetchall()
+        for row in rows:
+            record = json.loads(row[0])
+            if not record.get('resolved'):
+                return record
+        return None
+
+    def attach_follow_up(self, emergency_id: str, expected_version: int, message: str,
+                         severity: str, last_seen_at: int) -> bool:
+        """Rattache un message à l'urgence si la version n'a pas changé"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM emergencies WHERE emergency_id = ?', (emergency_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            record = json.loads(row[0])
+            if int(record.get('version', 0)) != expected_version:
+                return False
+            record['follow_ups'] = record.get('follow_ups', []) + [message]
+            record['severity'] = severity
+            record['last_seen_at'] = last_seen_at
+            record['version'] = expected_version + 1
+            self._conn.execute(
+                'UPDATE emergencies SET data = ?, last_seen_at = ? WHERE emergency_id = ?',
+                (json.dumps(record, ensure_ascii=False), last_seen_at, emergency_id)
+            )
+            return True
+
+    def enqueue(self, entries: List[Dict]) -> int:
+        """Ajoute des entrées en file (ignore celles déjà présentes)"""
+        now = datetime.utcnow().isoformat()
+        added = 0
+        with self._lock:
+            for entry in entries:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO outbox (entry_id, idempotency_key, kind, payload, status, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (entry['entry_id'], entry['idempotency_key'], entry['kind'],
+                     json.dumps(entry['payload'], ensure_ascii=False), PENDING, now)
+                )
+                added += cursor.rowcount
+        return added
+
+    def claim(self, entry: Dict) -> bool:
+        """Prend le bail d'une entrée (pending, ou sending expiré)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE outbox SET status = ?, claimed_at = ? WHERE entry_id = ? '
+                'AND (status = ? OR (status = ? AND claimed_at < ?))',
+                (SENDING, now, entry['entry_id'], PENDING, SENDING, now - LEASE_SECONDS)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, entry: Dict) -> None:
+        """Marque une entrée comme délivrée"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE outbox SET status = ?, delivered_at = ? WHERE entry_id = ?',
+                (DONE, datetime.utcnow().isoformat(), entry['entry_id'])
+            )
+
+    def fail(self, entry: Dict, error: str) -> None:
+        """Remet une entrée en file, ou l'abandonne après MAX_ATTEMPTS"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE outbox SET attempts = attempts + 1, last_error = ?, '
+                'status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE entry_id = ?',
+                (error, MAX_ATTEMPTS, FAILED, PENDING, entry['entry_id'])
+            )
+
+    _COLUMNS = 'entry_id, idempotency_key, kind, payload, status, attempts, last_error, delivered_at'
+
+    def _rows(self, where: str, params: Tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {self._COLUMNS} FROM outbox WHERE {where}', params).fetchall()
+        return [
+            {
+                'entry_id': r[0], 'idempotency_key': r[1], 'kind': r[2],
+                'payload': json.loads(r[3]), 'status': r[4], 'attempts': r[5],
+                'last_error': r[6], 'delivered_at': r[7]
+            }
+            for r in rows
+        ]
+
+    def entries(self, idempotency_key: str) -> List[Dict]:
+        """Liste les entrées d'une urgence"""
+        return self._rows('idempotency_key = ? ORDER BY entry_id', (idempotency_key,))
+
+    def open_entries(self, limit: int = 100) -> List[Dict]:
+        """Entrées restant à délivrer, toutes urgences confondues (pending, ou sending expiré)"""
+        return self._rows(
+            'status = ? OR (status = ? AND claimed_at < ?) ORDER BY created_at LIMIT ?',
+            (PENDING, SENDING, time.time() - LEASE_SECONDS, limit)
+        )
+
+
+class DynamoDBOutboxStore:
+    """Backend DynamoDB: écritures conditionnelles sur Emergencies et Outbox"""
+
+    def __init__(self, db_helper):
+        self.db = db_helper
+
+    def save_emergency_once(self, emergency_data: Dict) -> Tuple[Dict, bool]:
+        """Enregistre l'urgence si absente. Retourne (urgence, créée?)"""
+        table = self.db.get_table('SmartDoc_Emergencies')
+        try:
+            table.put_item(
+                Item=emergency_data,
+                ConditionExpression='attribute_not_exists(emergency_id)'
+            )
+            return emergency_data, True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            response = table.get_item(Key={'emergency_id': emergency_data['emergency_id']})
+            return response.get('Item', emergency_data), False
+
+    def latest_open_emergency(self, user_id: str) -> Optional[Dict]:
+        """Dernière urgence non résolue d'un utilisateur"""
+        records = [r for r in self.db.get_user_emergencies(user_id) if not r.get('resolved')]
+        if not records:
+            return None
+        return max(records, key=lambda r: int(r.get('last_seen_at', 0)))
+
+    def attach_follow_up(self, emergency_id: str, expected_version: int, message: str,
+                         severity: str, last_seen_at: int) -> bool:
+        """Rattache un message à l'urgence si la version n'a pas changé"""
+        table = self.db.get_table('SmartDoc_Emergencies')
+        try:
+            table.update_item(
+                Key={'emergency_id': emergency_id},
+                UpdateExpression=(
+                    'SET follow_ups = list_append(if_not_exists(follow_ups, :empty), :msg), '
+                    'severity = :sev, last_seen_at = :now, version = :next'
+                ),
+                ConditionExpression='version = :expected',
+                ExpressionAttributeValues={
+                    ':empty': [], ':msg': [message], ':sev': severity, ':now': last_seen_at,
+                    ':expected': expected_version, ':next': expected_version + 1
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def enqueue(self, entries: List[Dict]) -> int:
+        """Ajoute des entrées en file (ignore celles déjà présentes)"""
+        table = self.db.get_table('SmartDoc_Outbox')
+        now = datetime.utcnow().isoformat()
+        added = 0
+        for entry in entries:
+            try:
+                table.put_item(
+                    Item={
+                        'idempotency_key': entry['idempotency_key'],
+                        'entry_id': entry['entry_id'],
+                        'kind': entry['kind'],
+                        'payload': entry['payload'],
+                        'status': PENDING,
+                        'attempts': 0,
+                        'claimed_at': 0,
+                        'last_error': '',
+                        'created_at': now,
+                        'delivered_at': ''
+                    },
+                    ConditionExpression='attribute_not_exists(entry_id)'
+                )
+                added += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        return added
+
+    def _update(self, entry: Dict, update: str, values: Dict, condition: Optional[str] = None) -> bool:
+        table = self.db.get_table('SmartDoc_Outbox')
+        kwargs = {
+            'Key': {'idempotency_key': entry['idempotency_key'], 'entry_id': entry['entry_id']},
+            'UpdateExpression': update,
+            'ExpressionAttributeNames': {'#s': 'status'},
+            'ExpressionAttributeValues': values
+        }
+        if condition:
+            kwargs['ConditionExpression'] = condition
+        try:
+            table.update_item(**kwargs)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def claim(self, entry: Dict) -> bool:
+        """Prend le bail d'une entrée (pending, ou sending expiré)"""
+        now = int(time.time())
+        return self._update(
+            entry,
+            'SET #s = :sending, claimed_at = :now',
+            {':sending': SENDING, ':pending': PENDING, ':now': now, ':expired': now - LEASE_SECONDS},
+            '#s = :pending OR (#s = :sending AND claimed_at < :expired)'
+        )
+
+    def complete(self, entry: Dict) -> None:
+        """Marque une entrée comme délivrée"""
+        self._update(entry, 'SET #s = :done, delivered_at = :at',
+                     {':done': DONE, ':at': datetime.utcnow().isoformat()})
+
+    def fail(self, entry: Dict, error: str) -> None:
+        """Remet une entrée en file, ou l'abandonne après MAX_ATTEMPTS"""
+        status = FAILED if int(entry.get('attempts', 0)) + 1 >= MAX_ATTEMPTS else PENDING
+        self._update(entry, 'SET #s = :status, last_error = :err ADD attempts :one',
+                     {':status': status, ':err': error, ':one': 1})
+
+    def entries(self, idempotency_key: str) -> List[Dict]:
+        """Liste les entrées d'une urgence"""
+        table = self.db.get_table('SmartDoc_Outbox')
+        response = table.query(
+            KeyConditionExpression='idempotency_key = :k',
+            ExpressionAttributeValues={':k': idempotency_key},
+            ConsistentRead=True
+        )
+        return response.get('Items', [])
+
+    def open_entries(self, limit: int = 100) -> List[Dict]:
+        """Entrées restant à délivrer, toutes urgences confondues (index StatusIndex)"""
+        table = self.db.get_table('SmartDoc_Outbox')
+        expired = int(time.time()) - LEASE_SECONDS
+        items = []
+        for status, condition, values in [
+            (PENDING, '#s = :status', {}),
+            (SENDING, '#s = :status AND claimed_at < :expired', {':expired': expired}),
+        ]:
+            kwargs = {
+                'IndexName': 'StatusIndex',
+                'KeyConditionExpression': condition,
+                'ExpressionAttributeNames': {'#s': 'status'},
+                'ExpressionAttributeValues': {':status': status, **values},
+            }
+            while len(items) < limit:
+                response = table.query(Limit=limit - len(items), **kwargs)
+                items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return items[:limit]
+
+
+class EmergencyOutbox:
+    """Persistance de l'urgence, mise en file et drainage des notifications"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def record_emergency(self, emergency_data: Dict) -> Tuple[Dict, bool]:
+        """Enregistre l'urgence en premier, une seule fois par clé d'idempotence"""
+        return self.store.save_emergency_once(emergency_data)
+
+    def enqueue_sms(self, idempotency_key: str, contacts: List[Dict], message: str, severity: str) -> int:
+        """Met en file un SMS par contact (le texte est figé pour les retries)"""
+        entries = [
+            {
+                'entry_id': sms_entry_id(idempotency_key, contact['phone'], severity),
+                'idempotency_key': idempotency_key,
+                'kind': 'sms',
+                'payload': {
+                    'contact': contact.get('name', contact['phone']),
+                    'phone': contact['phone'],
+                    'message': message,
+                    'severity': severity
+                }
+            }
+            for contact in contacts
+        ]
+        return self.store.enqueue(entries)
+
+    def drain(self, idempotency_key: str, deliver: Callable[[Dict], bool]) -> List[Dict]:
+        """
+        Délivre les entrées en attente et marque chacune comme faite.
+
+        Retourne le statut final de chaque entrée de l'urgence (y compris
+        celles délivrées lors d'une invocation précédente).
+        """
+        for entry in self.store.entries(idempotency_key):
+            if entry['status'] not in (DONE, FAILED):
+                self._deliver(entry, deliver)
+
+        return self.store.entries(idempotency_key)
+
+    def drain_open(self, deliver: Callable[[Dict], bool], limit: int = 100) -> Dict[str, int]:
+        """
+        Balayage planifié: délivre les entrées restées en attente, toutes urgences
+        confondues (invocation tuée avant le drainage, échec SNS à retenter).
+        """
+        counts = {'delivered': 0, 'failed': 0, 'skipped': 0}
+        for entry in self.store.open_entries(limit):
+            outcome = self._deliver(entry, deliver)
+            counts[outcome] += 1
+        return counts
+
+    def _deliver(self, entry: Dict, deliver: Callable[[Dict], bool]) -> str:
+        """Prend le bail puis délivre une entrée. Retourne delivered | failed | skipped"""
+        if not self.store.claim(entry):
+            return 'skipped'
+
+        try:
+            delivered = deliver(entry['payload'])
+            error = '' if delivered else 'échec de livraison'
+        except Exception as e:
+            delivered, error = False, str(e)
+
+        if delivered:
+            self.store.complete(entry)
+            return 'delivered'
+
+        log.error("Échec d'envoi", entry_id=entry['entry_id'], error=error)
+        self.store.fail(entry, error)
+        return 'failed'
+
+
+def create_outbox() -> EmergencyOutbox:
+    """Construit l'outbox selon OUTBOX_BACKEND (dynamodb | sqlite), chaque appel au store chronométré"""
+    from database import db, default_store_backend
+    backend = os.environ.get('OUTBOX_BACKEND', default_store_backend())
+    if backend == 'sqlite':
+        store = SQLiteOutboxStore(os.environ.get('OUTBOX_PATH', ':memory:'))
+    else:
+        store = DynamoDBOutboxStore(db)
+
+    return EmergencyOutbox(Instrumented(store, DB_LATENCY, DB_ERRORS, prefix='outbox.'))
+
+
+# Instance globale
+outbox = create_outbox()
@@ -0,0 +1,190 @@
+"""
+Profilage à la demande d'une requête (orchestrator ou agent)
+
+Désactivé par défaut: profiler.run(...) appelle alors directement la fonction.
+Activation:
+  PROFILE_REQUESTS=1         profiler les requêtes (Lambda et serveurs locaux)
+  PROFILE_SAMPLE_RATE=0.01   proportion de requêtes profilées (défaut: 1)
+  PROFILE_MODE=cprofile      cprofile: fichier .pstats (thread de la requête)
+                             sample: échantillonnage de tous les threads, fichier
+                             .collapsed (flamegraph.pl, speedscope)
+  PROFILE_INTERVAL_MS=5      période d'échantillonnage (mode sample)
+  PROFILE_DIR=/tmp/...       dossier des fichiers (défaut: <tmp>/smartdoc-profiles)
+
+Serveurs locaux: l'en-tête "X-Profile: 1" force le profilage d'une requête.
+Les fichiers portent l'identifiant de corrélation de la requête.
+
+Avec cprofile, les branches parallèles de LangGraph (threads du pool) ne sont
+pas détaillées: elles apparaissent comme de l'attente. Le mode sample les couvre.
+"""
+
+import os
+import sys
+import time
+import uuid
+import re
+import random
+import cProfile
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from logger import get_logger
+
+log = get_logger('profile')
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# L'identifiant vient du client (payload, en-tête X-Correlation-Id): nom de fichier sûr
+UNSAFE_FILE_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+MAX_FILE_ID_LENGTH = 64
+
+
+def file_safe_id(correlation_id: str) -> str:
+    """Identifiant réduit à [A-Za-z0-9_-] et MAX_FILE_ID_LENGTH caractères (jamais vide)"""
+    return UNSAFE_FILE_CHARS.sub('_', str(correlation_id))[:MAX_FILE_ID_LENGTH] or new_correlation_id()
+
+
+def correlation_id_for(body: Dict, context=None) -> str:
+    """Identifiant de corrélation: celui du payload, sinon celui de la Lambda, sinon nouveau"""
+    return body.get('correlation_id') or getattr(context, 'aws_request_id', None) or new_correlation_id()
+
+
+# ===== ÉCHANTILLONNEUR =====
+
+# Feuilles de pile d'un thread inactif (pool en attente, serveur en attente)
+IDLE_FUNCTIONS = {'wait', 'get', 'select', 'poll', 'accept', '_wait_for_tstate_lock', 'serve_forever'}
+
+
+class StackSampler:
+    """Échantillonne les piles de tous les threads (format collapsed: "a;b;c N")"""
+
+    def __init__(self, interval_s: float, target_thread: int):
+        self.interval_s = interval_s
+        self.target_thread = target_thread
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                # Threads inactifs ignorés, sauf celui de la requête (attente = temps réel)
+                if ident != self.target_thread and frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ===== PROFILEUR =====
+
+class RequestProfiler:
+    """Profile une invocation sur demande (en-tête) ou par échantillonnage (variables d'environnement)"""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, mode: str = 'cprofile',
+                 directory: Optional[str] = None, interval_ms: float = 5.0):
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError(f"Mode de profilage inconnu: {mode}")
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'smartdoc-profiles')
+        self.interval_ms = interval_ms
+        self._active = threading.local()
+        self._rng = random.Random()
+        self.stats = {'profiled': 0, 'skipped_nested': 0}
+
+    @classmethod
+    def from_env(cls) -> 'RequestProfiler':
+        return cls(
+            enabled=os.environ.get('PROFILE_REQUESTS', '0').lower() in ('1', 'true', 'yes'),
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '1')),
+            mode=os.environ.get('PROFILE_MODE', 'cprofile'),
+            directory=os.environ.get('PROFILE_DIR'),
+            interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+        )
+
+    def run(self, name: str, correlation_id: str, func: Callable, *args, force: bool = False, **kwargs) -> Any:
+        """func(*args, **kwargs), profilé si demandé ou tiré au sort"""
+        if not (force or self.enabled):
+            return func(*args, **kwargs)
+        if not force and self.sample_rate < 1 and self._rng.random() >= self.sample_rate:
+            return func(*args, **kwargs)
+        if getattr(self._active, 'name', None):
+            # Agent appelé dans le processus (LAMBDA_BACKEND=local): déjà couvert
+            self.stats['skipped_nested'] += 1
+            return func(*args, **kwargs)
+        return self._profile(name, correlation_id, func, args, kwargs)
+
+    def _path(self, name: str, correlation_id: str, extension: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        return os.path.join(self.directory, f"{name}_{file_safe_id(correlation_id)}_{stamp}.{extension}")
+
+    def _profile(self, name: str, correlation_id: str, func: Callable, args, kwargs) -> Any:
+        self._active.name = name
+        start = time.perf_counter()
+        profile = sampler = None
+        if self.mode == 'sample':
+            sampler = StackSampler(self.interval_ms / 1000, threading.get_ident()).start()
+        else:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Un autre profileur est déjà actif (Python 3.12+): requête non profilée
+                log.warning("Profilage impossible", error=str(e))
+                self._active.name = None
+                return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self._active.name = None
+            try:
+                if sampler:
+                    sampler.stop()
+                    path = self._path(name, correlation_id, 'collapsed')
+                    sampler.write(path)
+                else:
+                    profile.disable()
+                    path = self._path(name, correlation_id, 'pstats')
+                    profile.dump_stats(path)
+                self.stats['profiled'] += 1
+                log.info("Profil écrit", function=name, correlation_id=correlation_id,
+                         duration_ms=round(duration_ms), path=path)
+            except Exception as e:
+                log.error("Erreur écriture du profil", function=name, correlation_id=correlation_id, error=str(e))
+
+
+# Instance globale
+profiler = RequestProfiler.from_env()
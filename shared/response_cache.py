@@ -0,0 +1,178 @@
+"""
+Cache sémantique des réponses de conversation générale
+
+Les salutations et remerciements ("Bonjour", "Merci beaucoup", "Comment ça
+va?") reviennent sans cesse. Chaque message est représenté par un vecteur de
+n-grammes de caractères hachés (NumPy, sans modèle externe); si un message
+déjà traité est assez proche, sa réponse est réutilisée avec le nom de
+l'utilisateur courant. Taille bornée (éviction LRU), activation par intention.
+
+Deux messages proches au sens des n-grammes peuvent dire le contraire ("Je
+vais bien merci" / "Je vais pas bien merci"): une entrée n'est réutilisée que
+si les négations sont les mêmes, et jamais pour un message aux termes d'urgence.
+"""
+
+import os
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from keywords import normalize
+from intent_classifier import EMERGENCY_TERMS
+from metrics import metrics
+
+
+DIM = 512
+NGRAM = 3
+
+CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '512'))
+THRESHOLD = float(os.environ.get('RESPONSE_CACHE_THRESHOLD', '0.9'))
+CACHE_INTENTS = [i for i in os.environ.get('RESPONSE_CACHE_INTENTS', 'general').split(',') if i.strip()]
+
+# Au-delà, deux messages sont considérés identiques (même entrée)
+DUPLICATE_SIMILARITY = 0.99
+
+# Mots de négation ("n'est" -> "n est" après normalisation)
+NEGATIONS = frozenset({'ne', 'n', 'pas', 'plus', 'jamais', 'rien', 'aucun', 'aucune', 'sans'})
+
+# Marqueurs du nom dans les réponses mises en cache
+FULL_NAME_TOKEN = '{nom}'
+FIRST_NAME_TOKEN = '{prenom}'
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Vecteur normé de n-grammes de caractères et de mots, hachés sur dim composantes"""
+    normalized = normalize(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    if not normalized:
+        return vector
+
+    padded = f" {normalized} "
+    features = [padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)]
+    features += [f"w:{word}" for word in normalized.split()]
+    for feature in features:
+        vector[zlib.crc32(feature.encode('utf-8')) % dim] += 1.0
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def negations(text: str) -> frozenset:
+    """Mots de négation présents dans le message"""
+    return NEGATIONS.intersection(normalize(text).split())
+
+
+def to_template(reply: str, user_name: str) -> str:
+    """Remplace le nom de l'utilisateur par des marqueurs"""
+    if not user_name:
+        return reply
+    template = reply.replace(user_name, FULL_NAME_TOKEN)
+    first_name = user_name.split()[0]
+    if len(first_name) >= 3:
+        template = template.replace(first_name, FIRST_NAME_TOKEN)
+    return template
+
+
+def fill_template(template: str, user_name: str) -> str:
+    """Réinsère le nom de l'utilisateur courant"""
+    first_name = user_name.split()[0] if user_name else ''
+    return template.replace(FULL_NAME_TOKEN, user_name).replace(FIRST_NAME_TOKEN, first_name)
+
+
+class SemanticResponseCache:
+    """Plus proche voisin (cosinus) sur une matrice de taille fixe, éviction LRU"""
+
+    def __init__(self, capacity: int = CACHE_SIZE, threshold: float = THRESHOLD,
+                 intents: Iterable[str] = CACHE_INTENTS, dim: int = DIM):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.intents = set(intents)
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._entries: list = [None] * capacity
+        self._recency: OrderedDict = OrderedDict()
+        self._used = 0
+        self.stats = {'lookups': 0, 'hits': 0, 'stores': 0, 'evictions': 0}
+
+    def enabled(self, intent: str) -> bool:
+        return intent in self.intents
+
+    def lookup(self, message: str, user_name: str = '') -> Optional[Dict]:
+        """Réponse d'un message proche déjà traité: {intent, reply, similarity}, sinon None"""
+        if not self.intents or EMERGENCY_TERMS.scan(message):
+            return None
+
+        vector = embed(message, self.dim)
+        with self._lock:
+            self.stats['lookups'] += 1
+            if not self._used or not vector.any():
+                return None
+
+            similarities = self._vectors[:self._used] @ vector
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            entry = self._entries[slot]
+            if similarity < self.threshold or not self.enabled(entry['intent']):
+                return None
+            if entry['negations'] != negations(message):
+                return None
+
+            self._recency.move_to_end(slot)
+            self.stats['hits'] += 1
+
+        return {
+            'intent': entry['intent'],
+            'reply': fill_template(entry['template'], user_name),
+            'similarity': similarity
+        }
+
+    def store(self, intent: str, message: str, reply: str, user_name: str = '') -> bool:
+        """Mémorise la réponse si l'intention est activée"""
+        if not self.enabled(intent) or not reply:
+            return False
+
+        vector = embed(message, self.dim)
+        if not vector.any():
+            return False
+
+        entry = {'intent': intent, 'template': to_template(reply, user_name),
+                 'negations': negations(message)}
+        with self._lock:
+            slot = None
+            if self._used:
+                similarities = self._vectors[:self._used] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= DUPLICATE_SIMILARITY:
+                    slot = best
+
+            if slot is None:
+                if self._used < self.capacity:
+                    slot = self._used
+                    self._used += 1
+                else:
+                    slot, _ = self._recency.popitem(last=False)
+                    self.stats['evictions'] += 1
+
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+            self._recency[slot] = None
+            self._recency.move_to_end(slot)
+            self.stats['stores'] += 1
+
+        return True
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats['lookups']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return self._used
+
+
+# Instance globale (par conteneur)
+response_cache = SemanticResponseCache()
+metrics.register_stats('smartdoc_response_cache_total', lambda: response_cache.stats, "Cache sémantique des réponses")
@@ -0,0 +1,158 @@
+"""
+Index inversé des effets secondaires (symptôme -> médicaments)
+
+Chargé à la première utilisation depuis shared/data/side_effects.json.
+Les listes de médicaments par symptôme sont stockées à plat (format CSR):
+l'intersection avec les médicaments de l'utilisateur se fait sans LLM.
+"""
+
+import os
+import re
+import json
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from interactions import fold, interaction_index
+from logger import get_logger
+
+log = get_logger('side_effects')
+
+
+DATA_PATH = os.environ.get(
+    'SIDE_EFFECTS_DATA_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'side_effects.json')
+)
+
+# Fréquences
+RARE = 1
+FREQUENT = 2
+VERY_FREQUENT = 3
+
+FREQUENCY_LABELS = {
+    RARE: "rare",
+    FREQUENT: "fréquent",
+    VERY_FREQUENT: "très fréquent"
+}
+
+# Expressions de plus de 5 mots ignorées
+MAX_PHRASE_WORDS = 5
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def terms(text: str) -> List[str]:
+    """Mots normalisés (sans accents, pluriel en -s retiré)"""
+    return [w[:-1] if len(w) > 3 and w.endswith('s') else w for w in _WORD_RE.findall(fold(text))]
+
+
+class SideEffectIndex:
+    """Index compact: expression -> symptôme, symptôme -> (médicaments, fréquences)"""
+
+    def __init__(self, path: str = DATA_PATH):
+        self.path = path
+        self.version = ''
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._drug_ids: Dict[str, int] = {}
+        self._symptoms: List[str] = []
+        self._phrases: Dict[str, int] = {}
+        self._offsets = array('i')
+        self._drugs = array('h')
+        self._frequencies = array('b')
+
+    def load(self) -> 'SideEffectIndex':
+        """Charge le fichier de données (une seule fois)"""
+        if self._loaded:
+            return self
+
+        with self._lock:
+            if self._loaded:
+                return self
+
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+
+            self.version = data.get('version', '')
+            self._drug_ids = {fold(name): i for i, name in enumerate(data['drugs'])}
+            self._symptoms = data['symptoms']
+
+            symptom_ids = {label: i for i, label in enumerate(self._symptoms)}
+            phrases = {' '.join(terms(label)): i for label, i in symptom_ids.items()}
+            for phrase, label in data.get('synonyms', {}).items():
+                phrases[' '.join(terms(phrase))] = symptom_ids[label]
+            self._phrases = phrases
+
+            offsets, drugs, frequencies = [0], [], []
+            for posting in data['postings']:
+                for drug, frequency in posting:
+                    drugs.append(drug)
+                    frequencies.append(frequency)
+                offsets.append(len(drugs))
+            self._offsets = array('i', offsets)
+            self._drugs = array('h', drugs)
+            self._frequencies = array('b', frequencies)
+
+            self._loaded = True
+            log.info("Index chargé", symptoms_count=len(self._symptoms), associations=len(drugs),
+                     version=self.version)
+
+        return self
+
+    def symptoms_in(self, texts: Iterable[str]) -> List[int]:
+        """Symptômes connus mentionnés dans les textes (expressions de 1 à 5 mots)"""
+        self.load()
+        found = []
+        for text in texts:
+            words = terms(text)
+            start = 0
+            while start < len(words):
+                # Plus longue expression d'abord, les mots reconnus sont consommés
+                for end in range(min(len(words), start + MAX_PHRASE_WORDS), start, -1):
+                    symptom = self._phrases.get(' '.join(words[start:end]))
+                    if symptom is not None:
+                        if symptom not in found:
+                            found.append(symptom)
+                        start = end
+                        break
+                else:
+                    start += 1
+        return found
+
+    def drug_id(self, medication_name: str) -> Optional[int]:
+        """Identifiant d'un médicament ("Glucophage 850mg" -> metformine)"""
+        self.load()
+        normalized = interaction_index.normalize(medication_name)
+        return self._drug_ids.get(normalized) if normalized else None
+
+    def match(self, texts: Iterable[str], medication_names: List[str]) -> Dict:
+        """
+        Croise les symptômes mentionnés avec les médicaments de l'utilisateur.
+
+        Retourne {'matches': [{symptom, medication, frequency}], 'unknown': [noms hors base]}
+        """
+        user_drugs = {}
+        unknown = []
+        for name in medication_names:
+            drug = self.drug_id(name)
+            if drug is None:
+                unknown.append(name)
+            else:
+                user_drugs.setdefault(drug, name)
+
+        matches = []
+        for symptom in self.symptoms_in(texts):
+            for pos in range(self._offsets[symptom], self._offsets[symptom + 1]):
+                name = user_drugs.get(self._drugs[pos])
+                if name is not None:
+                    matches.append({
+                        'symptom': self._symptoms[symptom],
+                        'medication': name,
+                        'frequency': FREQUENCY_LABELS.get(self._frequencies[pos], '')
+                    })
+
+        return {'matches': matches, 'unknown': unknown}
+
+
+# Instance globale (chargée à la première utilisation)
+side_effect_index = SideEffectIndex()
@@ -0,0 +1,123 @@
+"""
+Lecture robuste des sorties structurées du LLM
+
+Le chemin normal passe par with_structured_output (tool calling, validé par
+un schéma Pydantic). Si le modèle renvoie malgré tout du texte (prose,
+bloc ```json, JSON tronqué), extract_json récupère l'objet ou sa partie
+exploitable avant de recourir à un fallback.
+"""
+
+import re
+import json
+from typing import Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+
+def _close(prefix: str, stack: list) -> str:
+    """Ferme les accolades/crochets restés ouverts"""
+    closed = prefix.rstrip().rstrip(',').rstrip()
+    if closed.endswith(':'):
+        closed += ' null'
+    return closed + ''.join(reversed(stack))
+
+
+def _repair_partial(text: str) -> Optional[Dict]:
+    """Complète un objet JSON tronqué, en reculant jusqu'au dernier élément complet"""
+    stack = []
+    in_string = False
+    escaped = False
+    cut_points = []
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                text = text[:i + 1]
+                break
+        elif ch == ',':
+            cut_points.append((i, list(stack)))
+
+    # Une chaîne coupée ("vomisse...) est abandonnée plutôt que gardée tronquée
+    candidates = [] if in_string else [_close(text, stack)]
+    candidates += [_close(text[:pos], snapshot) for pos, snapshot in reversed(cut_points)]
+
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def extract_json(text: str) -> Optional[Dict]:
+    """Premier objet JSON d'un texte (prose, blocs de code, texte final, JSON tronqué)"""
+    if not text:
+        return None
+
+    cleaned = _FENCE_RE.sub('', text)
+    start = cleaned.find('{')
+    if start < 0:
+        return None
+    cleaned = cleaned[start:]
+
+    try:
+        data, _ = json.JSONDecoder().raw_decode(cleaned)
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+
+    return _repair_partial(cleaned)
+
+
+def read_structured(result, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], str, Optional[Dict]]:
+    """
+    Lit le résultat de with_structured_output(schema, include_raw=True).
+
+    Retourne (objet validé ou None, méthode, données brutes récupérées).
+    Méthodes: "structured", "tool_args", "extracted", "invalid", "empty".
+    """
+    if isinstance(result, dict) and result.get('parsed') is not None:
+        return result['parsed'], 'structured', None
+
+    raw = result.get('raw') if isinstance(result, dict) else result
+    data = None
+    method = 'empty'
+
+    tool_calls = getattr(raw, 'tool_calls', None) or []
+    if tool_calls and isinstance(tool_calls[0].get('args'), dict):
+        data, method = tool_calls[0]['args'], 'tool_args'
+    else:
+        content = getattr(raw, 'content', raw)
+        if isinstance(content, list):
+            content = ''.join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+        if isinstance(content, str):
+            data = extract_json(content)
+            method = 'extracted' if data is not None else 'empty'
+
+    if data is None:
+        return None, method, None
+
+    try:
+        return schema.model_validate(data), method, data
+    except ValidationError:
+        return None, 'invalid', data
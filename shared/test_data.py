@@ -0,0 +1,155 @@
+"""
+Données de test partagées
+
+Utilisateurs, médicaments et rendez-vous écrits dans DynamoDB par
+scripts/setup-test-data.py, et chargés par la base en mémoire
+(DATABASE_BACKEND=memory) pour les tests hors-ligne et les benchmarks.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+def seed_data(now: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+    """Jeu de test (dates des rendez-vous relatives à now)"""
+    now = now or datetime.now()
+    created_at = datetime.utcnow().isoformat()
+    tomorrow = now + timedelta(days=1)
+    in_three_days = now + timedelta(days=3)
+    next_week = now + timedelta(days=7)
+
+    users = [
+        {
+            'user_id': 'user_marie_123',
+            'name': 'Marie Dupont',
+            'age': 72,
+            'phone': '+33612345678',
+            'email': 'marie.dupont@example.com',
+            'emergency_contacts': [
+                {
+                    'name': 'Sophie Dupont',
+                    'relation': 'Fille',
+                    'phone': '+33698765432'
+                },
+                {
+                    'name': 'Pierre Dupont',
+                    'relation': 'Fils',
+                    'phone': '+33687654321'
+                }
+            ],
+            'medical_conditions': ['Hypertension', 'Diabète type 2'],
+            'created_at': created_at
+        },
+        {
+            'user_id': 'user_jean_456',
+            'name': 'Jean Martin',
+            'age': 68,
+            'phone': '+33623456789',
+            'email': 'jean.martin@example.com',
+            'emergency_contacts': [
+                {
+                    'name': 'Claire Martin',
+                    'relation': 'Épouse',
+                    'phone': '+33634567890'
+                }
+            ],
+            'medical_conditions': ['Arthrose'],
+            'created_at': created_at
+        }
+    ]
+
+    medications = [
+        {
+            'medication_id': 'med_marie_001',
+            'user_id': 'user_marie_123',
+            'name': 'Aspégic 100mg',
+            'dosage': '1 sachet',
+            'frequency': '1x/jour',
+            'schedules': [
+                {'time': '08:00', 'hour': 8}
+            ],
+            'instructions': 'À prendre avec un grand verre d\'eau le matin',
+            'start_date': '2025-01-01',
+            'active': True
+        },
+        {
+            'medication_id': 'med_marie_002',
+            'user_id': 'user_marie_123',
+            'name': 'Doliprane 500mg',
+            'dosage': '1 comprimé',
+            'frequency': '2x/jour',
+            'schedules': [
+                {'time': '12:00', 'hour': 12},
+                {'time': '20:00', 'hour': 20}
+            ],
+            'instructions': 'À prendre pendant les repas',
+            'start_date': '2025-01-01',
+            'active': True
+        },
+        {
+            'medication_id': 'med_marie_003',
+            'user_id': 'user_marie_123',
+            'name': 'Glucophage 850mg',
+            'dosage': '1 comprimé',
+            'frequency': '2x/jour',
+            'schedules': [
+                {'time': '08:00', 'hour': 8},
+                {'time': '20:00', 'hour': 20}
+            ],
+            'instructions': 'Pour le diabète, à prendre pendant les repas',
+            'start_date': '2024-06-01',
+            'active': True
+        },
+        {
+            'medication_id': 'med_jean_001',
+            'user_id': 'user_jean_456',
+            'name': 'Voltarène 50mg',
+            'dosage': '1 comprimé',
+            'frequency': '2x/jour',
+            'schedules': [
+                {'time': '09:00', 'hour': 9},
+                {'time': '21:00', 'hour': 21}
+            ],
+            'instructions': 'Pour les douleurs articulaires',
+            'start_date': '2025-01-01',
+            'active': True
+        }
+    ]
+
+    appointments = [
+        {
+            'appointment_id': 'appt_marie_001',
+            'user_id': 'user_marie_123',
+            'title': 'Cardiologue - Dr. Martin',
+            'date': tomorrow.strftime('%Y-%m-%d'),
+            'time': '14:30',
+            'location': 'Hôpital Saint-Louis, 3ème étage',
+            'doctor_name': 'Dr. Martin',
+            'notes': 'Consultation de suivi pour l\'hypertension',
+            'reminder_sent': False
+        },
+        {
+            'appointment_id': 'appt_marie_002',
+            'user_id': 'user_marie_123',
+            'title': 'Diabétologue - Dr. Rousseau',
+            'date': next_week.strftime('%Y-%m-%d'),
+            'time': '10:00',
+            'location': 'Cabinet Dr. Rousseau, 15 rue de la Paix',
+            'doctor_name': 'Dr. Rousseau',
+            'notes': 'Bilan diabète trimestriel',
+            'reminder_sent': False
+        },
+        {
+            'appointment_id': 'appt_jean_001',
+            'user_id': 'user_jean_456',
+            'title': 'Rhumatologue - Dr. Leroux',
+            'date': in_three_days.strftime('%Y-%m-%d'),
+            'time': '15:00',
+            'location': 'Clinique des Lilas',
+            'doctor_name': 'Dr. Leroux',
+            'notes': 'Suivi arthrose',
+            'reminder_sent': False
+        }
+    ]
+
+    return {'users': users, 'medications': medications, 'appointments': appointments}
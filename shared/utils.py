@@ -5,15 +5,36 @@ Utilitaires partagés
 import os
 import json
 from typing import Dict, Any
+import threading
 from datetime import datetime, timedelta
-import boto3
+
+from metrics import SMS_SENT
+from logger import get_logger
+
+log = get_logger('utils')
 
 
 class SNSHelper:
     """Helper pour envoyer des SMS via SNS"""
 
     def __init__(self):
-        self.sns_client = boto3.client('sns')
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def sns_client(self):
+        """Client SNS créé au premier SMS (import de boto3 différé)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('sns')
+        return self._client
+
+    def load(self) -> 'SNSHelper':
+        """Crée le client tout de suite (préchauffage)"""
+        self.sns_client
+        return self
 
     def send_sms(self, phone_number: str, message: str) -> bool:
         """Envoie un SMS"""
@@ -28,17 +49,18 @@ class SNSHelper:
                     }
                 }
             )
-            print(f"SMS envoyé à {phone_number}")
+            log.info("SMS envoyé", phone=phone_number)
+            SMS_SENT.inc(status='ok')
             return True
         except Exception as e:
-            print(f"Erreur envoi SMS: {e}")
+            log.error("Erreur envoi SMS", phone=phone_number, error=str(e))
+            SMS_SENT.inc(status='error')
             return False
 
-    def send_emergency_sms(self, contacts: list, user_name: str, message: str, severity: str) -> list:
-        """Envoie des SMS d'urgence à plusieurs contacts"""
-        results = []
-
-        emergency_message = f"""
+    @staticmethod
+    def format_emergency_message(user_name: str, message: str, severity: str) -> str:
+        """Construit le texte du SMS d'alerte"""
+        return f"""
 🚨 ALERTE SMARTDOC
 
 {user_name} a besoin d'aide!
@@ -51,6 +73,12 @@ Heure: {datetime.now().strftime('%H:%M')}
 Veuillez contacter immédiatement.
         """.strip()
 
+    def send_emergency_sms(self, contacts: list, user_name: str, message: str, severity: str) -> list:
+        """Envoie des SMS d'urgence à plusieurs contacts"""
+        results = []
+
+        emergency_message = self.format_emergency_message(user_name, message, severity)
+
         for contact in contacts:
             success = self.send_sms(contact['phone'], emergency_message)
             results.append({
@@ -66,7 +94,23 @@ class LambdaHelper:
     """Helper pour invoquer d'autres Lambdas"""
 
     def __init__(self):
-        self.lambda_client = boto3.client('lambda')
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def lambda_client(self):
+        """Client Lambda créé à la première invocation (import de boto3 différé)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('lambda')
+        return self._client
+
+    def load(self) -> 'LambdaHelper':
+        """Crée le client tout de suite (préchauffage)"""
+        self.lambda_client
+        return self
 
     def invoke_agent(self, agent_name: str, payload: Dict) -> Dict[str, Any]:
         """Invoque un agent Lambda"""
@@ -80,7 +124,77 @@ class LambdaHelper:
             result = json.loads(response['Payload'].read())
             return result
         except Exception as e:
-            print(f"Erreur invocation Lambda {agent_name}: {e}")
+            log.error("Erreur invocation Lambda", agent=agent_name, error=str(e))
+            return {'error': str(e)}
+
+
+class LogSNSHelper(SNSHelper):
+    """SMS simulés: journalisés et conservés dans sent (SNS_BACKEND=log)"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def load(self) -> 'LogSNSHelper':
+        return self
+
+    def send_sms(self, phone_number: str, message: str) -> bool:
+        self.sent.append({'phone': phone_number, 'message': message})
+        log.info("SMS simulé", phone=phone_number)
+        SMS_SENT.inc(status='simulated')
+        return True
+
+
+class LocalLambdaHelper:
+    """Appelle les handlers des agents dans ce processus (LAMBDA_BACKEND=local)"""
+
+    LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> 'LocalLambdaHelper':
+        return self
+
+    def _load_handler(self, agent_name: str):
+        """Charge lambda/<agent>/handler.py sous un nom unique (chaque agent a son module agent)"""
+        import sys
+        import importlib.util
+
+        prefix = agent_name.replace('-', '_')
+        folder = os.path.join(self.LAMBDA_DIR, agent_name)
+        modules = {}
+        previous = sys.modules.get('agent')
+        try:
+            for name in ('agent', 'handler'):
+                spec = importlib.util.spec_from_file_location(
+                    f"{prefix}_{name}", os.path.join(folder, f"{name}.py")
+                )
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[spec.name] = module
+                if name == 'handler':
+                    # Le handler fait "from agent import ...": lui donner l'agent de son dossier
+                    sys.modules['agent'] = modules['agent']
+                spec.loader.exec_module(module)
+                modules[name] = module
+        finally:
+            if previous is not None:
+                sys.modules['agent'] = previous
+            else:
+                sys.modules.pop('agent', None)
+        return modules['handler']
+
+    def invoke_agent(self, agent_name: str, payload: Dict) -> Dict[str, Any]:
+        """Comme LambdaHelper.invoke_agent, sans réseau (payload sérialisé comme par Lambda)"""
+        try:
+            with self._lock:
+                if agent_name not in self._handlers:
+                    self._handlers[agent_name] = self._load_handler(agent_name)
+            event = json.loads(json.dumps(payload, default=str))
+            return self._handlers[agent_name].lambda_handler(event, None)
+        except Exception as e:
+            log.error("Erreur invocation locale", agent=agent_name, error=str(e))
             return {'error': str(e)}
 
 
@@ -102,6 +216,66 @@ def format_datetime(dt: datetime) -> str:
     return f"{day_name} {dt.day} {month_name} {dt.year} à {dt.hour:02d}h{dt.minute:02d}"
 
 
+def appointment_datetime(appointment: Dict) -> datetime:
+    """Date et heure d'un rendez-vous (champs date YYYY-MM-DD et time HH:MM)"""
+    return datetime.strptime(
+        f"{appointment.get('date', '')} {appointment.get('time', '00:00') or '00:00'}",
+        '%Y-%m-%d %H:%M'
+    )
+
+
+def upcoming_appointments(appointments: list, now: datetime = None) -> list:
+    """Rendez-vous à venir triés par date (les entrées mal datées sont ignorées)"""
+    now = now or datetime.now()
+    upcoming = []
+    for appointment in appointments:
+        try:
+            when = appointment_datetime(appointment)
+        except ValueError:
+            continue
+        if when >= now:
+            upcoming.append((when, appointment))
+    upcoming.sort(key=lambda x: x[0])
+    return upcoming
+
+
+def format_appointments_response(appointments: list, user_name: str, now: datetime = None) -> str:
+    """Réponse en français sur les prochains rendez-vous, sans LLM"""
+    now = now or datetime.now()
+    upcoming = upcoming_appointments(appointments, now)
+
+    if not upcoming:
+        return f"📅 {user_name}, vous n'avez aucun rendez-vous à venir.\n\nVoulez-vous que je vous aide à en noter un?"
+
+    when, next_appt = upcoming[0]
+    days = (when.date() - now.date()).days
+    if days == 0:
+        relative = "aujourd'hui"
+    elif days == 1:
+        relative = "demain"
+    else:
+        relative = f"dans {days} jours"
+
+    lines = [
+        f"📅 {user_name}, votre prochain rendez-vous:",
+        "",
+        f"🏥 {next_appt.get('title', 'Rendez-vous')}",
+        f"📆 {format_datetime(when)} ({relative})"
+    ]
+    if next_appt.get('location'):
+        lines.append(f"📍 {next_appt['location']}")
+    if next_appt.get('notes'):
+        lines.append(f"📝 {next_appt['notes']}")
+
+    if len(upcoming) > 1:
+        lines.extend(["", "📋 Ensuite:"])
+        for when, appt in upcoming[1:3]:
+            lines.append(f"• {appt.get('title', 'Rendez-vous')}: {format_datetime(when)}")
+
+    lines.extend(["", "Je vous rappellerai la veille de chaque rendez-vous! 😊"])
+    return "\n".join(lines)
+
+
 def parse_time(time_str: str) -> datetime:
     """Parse une heure au format HH:MM"""
     return datetime.strptime(time_str, '%H:%M')
@@ -154,6 +328,40 @@ def create_lambda_response(status_code: int, body: Dict, cors: bool = True) -> D
     return response
 
 
-# Instances globales
-sns_helper = SNSHelper()
-lambda_helper = LambdaHelper()
+def parse_request_body(event: Dict) -> Dict:
+    """Corps de la requête: JSON (API Gateway) ou payload direct (invoke_agent)"""
+    if isinstance(event.get('body'), str):
+        return json.loads(event['body'])
+    # Invocation directe: le payload est l'événement lui-même
+    return event.get('body', event)
+
+
+def is_warmup_event(event: Dict) -> bool:
+    """Ping de préchauffage (règle EventBridge {"warmup": true} ou serverless-plugin-warmup)"""
+    return isinstance(event, dict) and (
+        bool(event.get('warmup')) or event.get('source') == 'serverless-plugin-warmup'
+    )
+
+
+def is_outbox_drain_event(event: Dict) -> bool:
+    """Balayage planifié de l'outbox (règle EventBridge {"drain_outbox": true})"""
+    return isinstance(event, dict) and bool(event.get('drain_outbox'))
+
+
+def create_sns_helper() -> SNSHelper:
+    """SMS selon SNS_BACKEND (sns | log)"""
+    if os.environ.get('SNS_BACKEND', 'sns') == 'log':
+        return LogSNSHelper()
+    return SNSHelper()
+
+
+def create_lambda_helper():
+    """Invocation des agents selon LAMBDA_BACKEND (aws | local)"""
+    if os.environ.get('LAMBDA_BACKEND', 'aws') == 'local':
+        return LocalLambdaHelper()
+    return LambdaHelper()
+
+
+# Instances globales (clients AWS créés au premier usage)
+sns_helper = create_sns_helper()
+lambda_helper = create_lambda_helper()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test hors-ligne - Urgences: un seul SMS par contact
+
+Vérifie, sans AWS ni clé API (LLM factice, base en mémoire, SMS simulés):
+  1. la même requête d'urgence envoyée deux fois (clé fournie ou dérivée)
+     ne prévient chaque contact qu'une fois;
+  2. un drainage interrompu au milieu de la boucle (Lambda tuée) puis
+     relancé ne renvoie aucun SMS déjà délivré;
+  3. sans retry client, le balayage planifié (événement {"drain_outbox": true})
+     délivre le SMS resté en attente, une seule fois.
+
+Usage: python test_emergency_outbox.py
+"""
+
+import sys
+import os
+import json
+from collections import Counter
+
+sys.path.insert(0, 'shared')
+
+import offline
+offline.enable()
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import outbox as outbox_module
+from outbox import outbox
+from utils import lambda_helper, sns_helper
+from database import db
+
+
+class Interrupted(BaseException):
+    """Arrêt brutal de l'invocation (timeout Lambda): non intercepté par les handlers"""
+
+
+failures = []
+
+
+def check(label: str, condition: bool) -> None:
+    print(f"  {'✅' if condition else '❌'} {label}")
+    if not condition:
+        failures.append(label)
+
+
+def send_emergency(user_id: str, message: str, context: dict, idempotency_key: str = '') -> dict:
+    response = lambda_helper.invoke_agent('emergency-agent', {
+        'user_id': user_id,
+        'message': message,
+        'context': context,
+        'idempotency_key': idempotency_key
+    })
+    return json.loads(response['body'])
+
+
+def sms_per_phone(phones) -> Counter:
+    counts = Counter(sms['phone'] for sms in sns_helper.sent)
+    return Counter({phone: counts.get(phone, 0) for phone in phones})
+
+
+profile = db.get_user('user_marie_123')
+context = {'user_profile': profile}
+phones = [c['phone'] for c in profile.get('emergency_contacts', [])]
+if len(phones) < 2:
+    print("ERREUR: il faut au moins deux contacts d'urgence dans les données de test")
+    sys.exit(1)
+
+message = "Aide! Je suis tombée dans la cuisine"
+
+
+print("\n1. Même requête envoyée deux fois (retry client)")
+
+for user_id, key in [('user_retry_key', 'retry-k1'), ('user_retry_derived', '')]:
+    sns_helper.sent.clear()
+    first = send_emergency(user_id, message, context, key)
+    second = send_emergency(user_id, message, context, key)
+    label = "clé fournie" if key else "clé dérivée"
+    check(f"{label}: même urgence ({first['emergency_id']})",
+          bool(first['emergency_id']) and first['emergency_id'] == second['emergency_id'])
+    check(f"{label}: un SMS par contact {dict(sms_per_phone(phones))}",
+          all(count == 1 for count in sms_per_phone(phones).values()))
+
+
+print("\n2. Drainage interrompu puis relancé")
+
+sns_helper.sent.clear()
+send_sms = sns_helper.send_sms
+calls = []
+
+
+def interrupted_after_first(phone_number: str, text: str) -> bool:
+    # Premier contact délivré, l'invocation est tuée avant le second
+    calls.append(phone_number)
+    if len(calls) > 1:
+        raise Interrupted()
+    return send_sms(phone_number, text)
+
+
+sns_helper.send_sms = interrupted_after_first
+try:
+    send_emergency('user_interrupted', message, context, 'interrupted-k1')
+    check("invocation interrompue", False)
+except Interrupted:
+    check("invocation interrompue au second contact", True)
+finally:
+    sns_helper.send_sms = send_sms
+
+statuses = Counter(entry['status'] for entry in outbox.store.entries('interrupted-k1'))
+check(f"un SMS délivré, un en cours d'envoi {dict(statuses)}",
+      statuses[outbox_module.DONE] == 1 and statuses[outbox_module.SENDING] == 1)
+
+# Retry immédiat: le bail de l'invocation tuée court encore, rien n'est renvoyé
+send_emergency('user_interrupted', message, context, 'interrupted-k1')
+check(f"retry pendant le bail: aucun doublon {dict(sms_per_phone(phones))}",
+      all(count <= 1 for count in sms_per_phone(phones).values()))
+
+# Bail expiré (OUTBOX_LEASE_SECONDS écoulé): le contact restant est prévenu, une seule fois
+lease = outbox_module.LEASE_SECONDS
+outbox_module.LEASE_SECONDS = 0
+try:
+    send_emergency('user_interrupted', message, context, 'interrupted-k1')
+    send_emergency('user_interrupted', message, context, 'interrupted-k1')
+finally:
+    outbox_module.LEASE_SECONDS = lease
+check(f"retry après le bail: un SMS par contact {dict(sms_per_phone(phones))}",
+      all(count == 1 for count in sms_per_phone(phones).values()))
+
+
+print("\n3. Drainage interrompu, sans retry: balayage planifié")
+
+sns_helper.sent.clear()
+calls.clear()
+sns_helper.send_sms = interrupted_after_first
+try:
+    send_emergency('user_swept', message, context, 'swept-k1')
+except Interrupted:
+    pass
+finally:
+    sns_helper.send_sms = send_sms
+
+
+def sweep() -> dict:
+    response = lambda_helper.invoke_agent('emergency-agent', {'drain_outbox': True})
+    return json.loads(response['body'])
+
+
+check(f"balayage pendant le bail: rien d'envoyé {sweep()}",
+      sum(sms_per_phone(phones).values()) == 1)
+
+lease = outbox_module.LEASE_SECONDS
+outbox_module.LEASE_SECONDS = 0
+try:
+    swept = sweep()
+    again = sweep()
+finally:
+    outbox_module.LEASE_SECONDS = lease
+check(f"balayage après le bail: SMS restant délivré {swept}, puis rien {again}",
+      swept['delivered'] >= 1 and again['delivered'] == 0)
+check(f"balayage: un SMS par contact {dict(sms_per_phone(phones))}",
+      all(count == 1 for count in sms_per_phone(phones).values()))
+check("balayage: plus aucune entrée ouverte", not outbox.store.open_entries())
+
+
+print()
+if failures:
+    print(f"❌ {len(failures)} vérification(s) en échec")
+    sys.exit(1)
+print("✅ Un seul SMS par contact dans tous les cas")